@@ -0,0 +1,152 @@
+"""
+Module containing the BookkeepingJournal class.
+"""
+import collections
+import threading
+
+from sqlalchemy.orm.attributes import set_committed_value
+
+from wopmars.SQLManager import SQLManager
+from wopmars.utils.Logger import Logger
+from wopmars.utils.WopMarsException import WopMarsException
+
+
+class BookkeepingJournal(threading.Thread):
+    """
+    The class BookkeepingJournal keeps in memory the updates of the wom_* tables done by the WorkflowManager during
+    the execution of the workflow and writes them in the database from its own thread.
+
+    The updates are recorded by groups, one group for each rule boundary (start or end of a rule). The values are set
+    at once on the objects of the WorkflowManager, without making them dirty in its session: the session of the
+    WorkflowManager never holds the database while tools are running. The writer thread takes all the groups recorded
+    since its last write and commits them in one transaction, so that a group is either completely written or not at
+    all. After a crash, the rules whose end has not been written are still "NOT_EXECUTED" in the database and are
+    cleaned up at the next execution.
+    """
+
+    def __init__(self):
+        """
+        The pending list contains the groups of updates not written yet. Each update is a tuple
+        (table, id of the row, dict(column name: value)).
+        The count_recorded and count_written are the number of groups recorded and written since the beginning, used
+        by "flush()" to wait for the groups recorded before it has been called.
+        """
+        threading.Thread.__init__(self, name="wopmars-journal", daemon=True)
+        self.__condition = threading.Condition()
+        self.__pending = []
+        self.__count_recorded = 0
+        self.__count_written = 0
+        self.__closed = False
+        # the error raised by the writer thread, raised again in the thread of the WorkflowManager
+        self.__exception = None
+
+    def record(self, list_updates):
+        """
+        Record a group of updates, which will be written in the same transaction.
+
+        :param list_updates: The objects to update with their new values
+        :type list_updates: list(tuple(Base, dict(str: object)))
+        :raises WopMarsException: The writer thread has failed
+        """
+        group = []
+        for obj, values in list_updates:
+            for column_name, value in values.items():
+                set_committed_value(obj, column_name, value)
+            group.append((obj.__table__, obj.id, dict(values)))
+        with self.__condition:
+            self.raise_exception()
+            self.__pending.append(group)
+            self.__count_recorded += 1
+            self.__condition.notify_all()
+
+    def flush(self):
+        """
+        Wait until every group recorded before this call is committed in the database.
+
+        If the writer thread has not been started, the groups are written by the current thread.
+
+        :raises WopMarsException: The writer thread has failed
+        """
+        if not self.is_alive():
+            with self.__condition:
+                list_groups, self.__pending = self.__pending, []
+            if list_groups:
+                self.write(list_groups)
+                self.__count_written += len(list_groups)
+            return
+        with self.__condition:
+            count_to_write = self.__count_recorded
+            while self.__count_written < count_to_write and self.__exception is None:
+                self.__condition.wait()
+            self.raise_exception()
+
+    def close(self):
+        """
+        Write every group recorded and stop the writer thread.
+
+        :raises WopMarsException: The writer thread has failed
+        """
+        self.flush()
+        if self.is_alive():
+            with self.__condition:
+                self.__closed = True
+                self.__condition.notify_all()
+            self.join()
+
+    def run(self):
+        """
+        Write the pending groups in the database, in batches, until the journal is closed.
+        """
+        try:
+            while True:
+                with self.__condition:
+                    while not self.__pending and not self.__closed:
+                        self.__condition.wait()
+                    if not self.__pending:
+                        return
+                    list_groups, self.__pending = self.__pending, []
+                try:
+                    self.write(list_groups)
+                except Exception as e:
+                    with self.__condition:
+                        self.__exception = WopMarsException("Error while writing the bookkeeping of the workflow",
+                                                            str(e))
+                        self.__condition.notify_all()
+                    return
+                with self.__condition:
+                    self.__count_written += len(list_groups)
+                    self.__condition.notify_all()
+        finally:
+            SQLManager.instance().get_session().close()
+
+    @staticmethod
+    def write(list_groups):
+        """
+        Commit the given groups of updates in one transaction.
+
+        The successive updates of the same row are merged in one statement.
+
+        :param list_groups: The groups of updates
+        :type list_groups: list(list(tuple(Table, int, dict(str: object))))
+        """
+        session = SQLManager.instance().get_session()
+        row_to_values = collections.OrderedDict()
+        for group in list_groups:
+            for table, row_id, values in group:
+                row_to_values.setdefault((table, row_id), {}).update(values)
+        Logger.instance().debug("Writing the bookkeeping of {} rule boundaries: {} rows."
+                                .format(len(list_groups), len(row_to_values)))
+        try:
+            for (table, row_id), values in row_to_values.items():
+                session.execute(table.update().where(table.c.id == row_id).values(**values))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    def raise_exception(self):
+        """
+        Raise the error of the writer thread, if any. Must be called with the condition acquired.
+        """
+        if self.__exception is not None:
+            raise self.__exception
@@ -12,49 +12,78 @@ class DAG(nx.DiGraph):
     This class inherits from networkx.DiGraph class and is able to represent a DAG of tool nodes. It takes a set of
     :class:`~.wopmars.framework.database.tables.ToolWrapper` and analyse it to extract dependencies between them.
     """    
-    def __init__(self, tool_wrapper_set=None):
+    def __init__(self, tool_wrapper_set=None, list_rule_name_edges=None):
         """
         The DAG can be build from a set of tools, analyzing the successors of each of them.
 
-        ToolWrappers has a method "follows()" wich allow to know if one tool has a dependency for one other. The tools
-        of the set_tools are compared each other to extract the dependencies.
-        
+        A tool follows the tools producing one of its inputs (see "ToolWrapper.follows()"). The outputs of the tools of
+        the set_tools are indexed by path for the files and by model for the tables, then the inputs of each tool are
+        looked up in this index: the DAG is built in a time linear in the number of inputs and outputs.
+
+        The edges can also be given by the names of the rules, as stored in the plan cache.
+
         :param tool_wrapper_set: A set of tools
+        :param list_rule_name_edges: The pairs of rule names (predecessor, successor) of the DAG
+        :type list_rule_name_edges: list(list(str))
         """
+        # the sets of nodes reachable from each node, computed on demand and forgotten when the graph changes
+        self.__reachability = {}
         # the DAG is a DiGraph
         super().__init__()
-        # A nx digraph to store the dot graph
-        self.dot_digraph = nx.DiGraph()
         Logger.instance().info("Building the execution DAG...")
-        if tool_wrapper_set:
-            # for each tool
-            for tool_wrapper1 in tool_wrapper_set:
-                self.add_node(tool_wrapper1)
-                # for each other tool
-                for tool_wrapper2 in tool_wrapper_set.difference(set([tool_wrapper1])):
-                    # is there a dependency between tool1 and tool2?
-                    if tool_wrapper1.follows(tool_wrapper2):
-                        self.add_edge(tool_wrapper2, tool_wrapper1)
-        if tool_wrapper_set:
-            # for each tool
-            for tool_wrapper1 in tool_wrapper_set:
-                self.dot_digraph.add_node(tool_wrapper1.dot_label())
-                # for each other tool
-                for tool_wrapper2 in tool_wrapper_set.difference(set([tool_wrapper1])):
-                    # is there a dependency between tool1 and tool2?
-                    if tool_wrapper1.follows(tool_wrapper2):
-                        self.dot_digraph.add_edge(tool_wrapper2.dot_label(), tool_wrapper1.dot_label())
+        if tool_wrapper_set and list_rule_name_edges is not None:
+            rule_name_to_tool_wrapper = {tool_wrapper.rule_name: tool_wrapper for tool_wrapper in tool_wrapper_set}
+            self.add_nodes_from(tool_wrapper_set)
+            self.add_edges_from((rule_name_to_tool_wrapper[rule_name1], rule_name_to_tool_wrapper[rule_name2])
+                                for rule_name1, rule_name2 in list_rule_name_edges)
+        elif tool_wrapper_set:
+            # the tools producing each output file path and each output table model
+            path_to_producers = {}
+            model_to_producers = {}
+            for tool_wrapper in tool_wrapper_set:
+                self.add_node(tool_wrapper)
+                for f in tool_wrapper.relation_toolwrapper_to_fileioinfo:
+                    if f.relation_file_or_tableioinfo_to_typeio.is_input == 0:
+                        path_to_producers.setdefault(f.path, set()).add(tool_wrapper)
+                for t in tool_wrapper.relation_toolwrapper_to_tableioinfo:
+                    if t.relation_file_or_tableioinfo_to_typeio.is_input == 0:
+                        model_to_producers.setdefault(t.model_py_path, set()).add(tool_wrapper)
+            for tool_wrapper in tool_wrapper_set:
+                set_producers = set()
+                for f in tool_wrapper.relation_toolwrapper_to_fileioinfo:
+                    if f.relation_file_or_tableioinfo_to_typeio.is_input == 1:
+                        set_producers.update(path_to_producers.get(f.path, ()))
+                for t in tool_wrapper.relation_toolwrapper_to_tableioinfo:
+                    if t.relation_file_or_tableioinfo_to_typeio.is_input == 1:
+                        set_producers.update(model_to_producers.get(t.model_py_path, ()))
+                # a tool doesn't follow itself
+                set_producers.discard(tool_wrapper)
+                for producer in set_producers:
+                    self.add_edge(producer, tool_wrapper)
         Logger.instance().debug("DAG built.")
 
+    def get_dot_digraph(self):
+        """
+        Build the graph of the dot file, whose nodes are the labels of the tools.
+
+        :return: nx.DiGraph
+        """
+        dot_digraph = nx.DiGraph()
+        dot_digraph.add_nodes_from(tool_wrapper.dot_label() for tool_wrapper in self.nodes())
+        dot_digraph.add_edges_from((tool_wrapper1.dot_label(), tool_wrapper2.dot_label())
+                                   for tool_wrapper1, tool_wrapper2 in self.edges())
+        return dot_digraph
+
     def write_dot(self, path):
         """
         Build the dot file.
 
         The .ps can be built from the dot file with the command line: "dot -Tps {filename}.dot - o {filename}.ps"
         """
+        dot_digraph = self.get_dot_digraph()
         # To build .ps : dot -Tps {filename}.dot - o {filename}.ps
-        nx.draw(self.dot_digraph)
-        write_dot(self.dot_digraph, path)
+        nx.draw(dot_digraph)
+        write_dot(dot_digraph, path)
         # building the openable file:
         list_popen = ["dot", "-Tps", path, "-o", path.rsplit("/", 1)[0] + "/" + path.rsplit("/", 1)[1].split(".")[-2] + ".ps"]
         Logger.instance().debug("SubProcess command line for .ps file: " + str(list_popen))
@@ -83,15 +112,16 @@ class DAG(nx.DiGraph):
         """
         Return the set of all successors nodes from a given node in the DAG (node included).
 
+        If the node is None, every node of the DAG is returned, with None.
+
         :param node: a node of the DAG or None.
         :type node: :class:`~.wopmars.framework.database.tables.ToolWrapper.ToolWrapper`
 
         :return: set(node): all the successors of a given node.
         """
-        list_successors = [node]
-        for N in self.successors(node):
-            list_successors.extend(self.get_all_successors(N))
-        return set(list_successors)
+        if node is None:
+            return set(self.nodes()) | {None}
+        return self.get_reachable_nodes(node, "successors")
 
     def get_all_predecessors(self, node):
         """
@@ -102,10 +132,110 @@ class DAG(nx.DiGraph):
 
         :return: set(node): all the predecessors of a given node.
         """
-        list_predecessors = [node]
-        for N in self.predecessors(node):
-            list_predecessors.extend(self.get_all_predecessors(N))
-        return set(list_predecessors)
+        return self.get_reachable_nodes(node, "predecessors")
+
+    def get_reachable_nodes(self, node, direction):
+        """
+        Return the set of the nodes reachable from a given node in the given direction (node included).
+
+        The reachable nodes of every node are computed at once, the first time they are needed, as bitsets: the nodes
+        are visited in topological order so that each edge is seen once. They are forgotten when the graph changes.
+
+        :param node: a node of the DAG
+        :type node: :class:`~.wopmars.framework.database.tables.ToolWrapper.ToolWrapper`
+        :param direction: "successors" or "predecessors"
+        :type direction: str
+
+        :return: set(node): the nodes reachable from the given node.
+        """
+        if direction not in self.__reachability:
+            list_nodes = list(nx.topological_sort(self))
+            node_to_bit = {n: 1 << i for i, n in enumerate(list_nodes)}
+            node_to_bitset = {}
+            if direction == "successors":
+                for n in reversed(list_nodes):
+                    bitset = node_to_bit[n]
+                    for successor in super().successors(n):
+                        bitset |= node_to_bitset[successor]
+                    node_to_bitset[n] = bitset
+            else:
+                for n in list_nodes:
+                    bitset = node_to_bit[n]
+                    for predecessor in self.predecessors(n):
+                        bitset |= node_to_bitset[predecessor]
+                    node_to_bitset[n] = bitset
+            self.__reachability[direction] = (list_nodes, node_to_bitset)
+        list_nodes, node_to_bitset = self.__reachability[direction]
+        set_nodes = set()
+        bitset = node_to_bitset[node]
+        while bitset:
+            lowest_bit = bitset & -bitset
+            set_nodes.add(list_nodes[lowest_bit.bit_length() - 1])
+            bitset ^= lowest_bit
+        return set_nodes
+
+    ####################################################################################################################
+    #
+    # The methods modifying the graph forget the reachable nodes
+    #
+    ####################################################################################################################
+
+    def add_node(self, node_for_adding, **attr):
+        self.__reachability.clear()
+        super().add_node(node_for_adding, **attr)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        self.__reachability.clear()
+        super().add_nodes_from(nodes_for_adding, **attr)
+
+    def remove_node(self, n):
+        self.__reachability.clear()
+        super().remove_node(n)
+
+    def remove_nodes_from(self, nodes):
+        self.__reachability.clear()
+        super().remove_nodes_from(nodes)
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        self.__reachability.clear()
+        super().add_edge(u_of_edge, v_of_edge, **attr)
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        self.__reachability.clear()
+        super().add_edges_from(ebunch_to_add, **attr)
+
+    def remove_edge(self, u, v):
+        self.__reachability.clear()
+        super().remove_edge(u, v)
+
+    def remove_edges_from(self, ebunch):
+        self.__reachability.clear()
+        super().remove_edges_from(ebunch)
+
+    def clear(self):
+        self.__reachability.clear()
+        super().clear()
+
+    def clear_edges(self):
+        self.__reachability.clear()
+        super().clear_edges()
+
+    def get_critical_path_lengths(self, weights):
+        """
+        Return for each node the length of the longest path going from this node to a leaf of the DAG (node included).
+
+        The length of a path is the sum of the weights of its nodes. The nodes are visited from the leaves to the roots,
+        so that each edge is seen once.
+
+        :param weights: The weight of each node, 0 if the node is not in the dict.
+        :type weights: dict(node: float)
+
+        :return: dict(node: float): the length of the critical path of each node.
+        """
+        path_lengths = {}
+        for node in reversed(list(nx.topological_sort(self))):
+            path_lengths[node] = weights.get(node, 0) + max([path_lengths[n] for n in self.successors(node)], default=0)
+        return path_lengths
 
     def __eq__(self, other):
         """
@@ -42,7 +42,8 @@ class Parser:
 
         Then, the toolwrappers of the last execution are got back before calling the dag to build itself from the set of tools.
 
-        The DAG is checked to actually being a Directed Acyclic Graph.
+        The DAG is checked to actually being a Directed Acyclic Graph. The definition file and the DAG are then stored in
+        the plan cache: if the definition file is found there, the DAG is built from the stored edges without any check.
 
         If The "--dot" option is set, the dot and ps file are wrote here.
 
@@ -58,11 +59,17 @@ class Parser:
                                                OptionManager.instance()["--params"])
         # Get back the set of toolwrappers of the workflow before executing them.
         set_toolwrappers = self.get_set_toolwrappers()
-        dag_tools = DAG(set_toolwrappers)
-        if not is_directed_acyclic_graph(dag_tools):
-            # totodo LucG find out the loop to specify it in the error message
-            raise WopMarsException("Error while parsing the configuration file: \n\tThe workflow is malformed:",
-                                   "The specified Workflow cannot be represented as a DAG.")
+        plan = self.__reader.get_plan()
+        if plan is not None:
+            # the DAG has already been validated
+            dag_tools = DAG(set_toolwrappers, list_rule_name_edges=plan["edges"])
+        else:
+            dag_tools = DAG(set_toolwrappers)
+            if not is_directed_acyclic_graph(dag_tools):
+                # totodo LucG find out the loop to specify it in the error message
+                raise WopMarsException("Error while parsing the configuration file: \n\tThe workflow is malformed:",
+                                       "The specified Workflow cannot be represented as a DAG.")
+            self.__reader.save_plan(set_toolwrappers, dag_tools)
         s_dot_option = OptionManager.instance()["--dot"]
         if s_dot_option:
             Logger.instance().info("Writing the dot and ps files representing the workflow at " + str(s_dot_option))
@@ -0,0 +1,142 @@
+"""
+Module containing the PlanCache class.
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import os
+
+from wopmars.models.ToolWrapper import ToolWrapper
+from wopmars.utils.Logger import Logger
+
+
+class PlanCache:
+    """
+    The class PlanCache stores on disk the workflow definition files already read and validated, with the edges of
+    their DAG, so that the next executions of the same workflow do not parse and check them again.
+
+    A plan is stored in the directory "wopmars/plans" of the user cache directory ($XDG_CACHE_HOME or ~/.cache), in a
+    file named after the sha256 of the content of the definition file. It also contains the sha256 of the source files
+    of the wrappers and models used by the workflow, and of their base classes, and of the modules of WopMars reading
+    it: the plan is not used if one of them has changed. Only the max_plans plans used last are kept.
+    """
+
+    # the modules of WopMars whose changes may change the plans
+    wopmars_module_names = ["wopmars.Reader", "wopmars.DAG", "wopmars.models.ToolWrapper"]
+    max_plans = 100
+
+    def __init__(self, wopfile_content_str):
+        """
+        :param wopfile_content_str: The content of the definition file
+        :type wopfile_content_str: str
+        """
+        self.__key = hashlib.sha256(wopfile_content_str.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_cache_dir():
+        """
+        :return: str: The directory containing the plans
+        """
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cache_home, "wopmars", "plans")
+
+    def get_path(self):
+        return os.path.join(PlanCache.get_cache_dir(), self.__key + ".json")
+
+    @staticmethod
+    def get_module_names(cls):
+        """
+        :param cls: A wrapper or a model
+        :type cls: type
+        :return: list(str): The names of the modules defining the class and its base classes
+        """
+        return [base.__module__ for base in inspect.getmro(cls) if base.__module__ != "builtins"]
+
+    @staticmethod
+    def evict():
+        """
+        Delete the plans not used for the longest time, so that only max_plans plans are kept.
+        """
+        cache_dir = PlanCache.get_cache_dir()
+        try:
+            list_plan_paths = [os.path.join(cache_dir, file_name) for file_name in os.listdir(cache_dir)
+                               if file_name.endswith(".json")]
+            if len(list_plan_paths) <= PlanCache.max_plans:
+                return
+            list_plan_paths.sort(key=os.path.getmtime, reverse=True)
+            for plan_path in list_plan_paths[PlanCache.max_plans:]:
+                os.remove(plan_path)
+        except OSError as e:
+            Logger.instance().debug("The plan cache cannot be cleaned: " + str(e))
+
+    def load(self):
+        """
+        Load the plan of the definition file, if it has been stored and if the source files it depends on have not
+        changed.
+
+        :return: dict or None: the plan with the keys "wopfile" (the content of the definition file loaded as a dict)
+            and "edges" (the pairs of rule names of the DAG)
+        """
+        try:
+            with open(self.get_path(), "r") as plan_file:
+                plan = json.load(plan_file)
+        except (OSError, ValueError):
+            return None
+        for module_name, source_hash in plan["source_hashes"].items():
+            if ToolWrapper.get_source_file_hash(module_name) != source_hash:
+                Logger.instance().debug("The plan cache is outdated: {} has changed.".format(module_name))
+                return None
+        # the plans used last are kept by evict()
+        try:
+            os.utime(self.get_path())
+        except OSError:
+            pass
+        return plan
+
+    def save(self, wopfile_yml_dict, set_toolwrappers, dag_tools):
+        """
+        Store the plan of the definition file. Nothing is stored if the definition file cannot be represented as JSON.
+
+        :param wopfile_yml_dict: The content of the definition file loaded as a dict, already validated
+        :type wopfile_yml_dict: dict
+        :param set_toolwrappers: The ToolWrappers of the workflow
+        :type set_toolwrappers: set(:class:`~.wopmars.models.ToolWrapper.ToolWrapper`)
+        :param dag_tools: The DAG of the ToolWrappers
+        :type dag_tools: :class:`~.wopmars.DAG.DAG`
+        """
+        list_module_names = list(PlanCache.wopmars_module_names)
+        for tool_wrapper in set_toolwrappers:
+            list_module_names.extend(PlanCache.get_module_names(type(tool_wrapper)))
+            for model_py_path in set(t.model_py_path for t in tool_wrapper.relation_toolwrapper_to_tableioinfo):
+                list_module_names.append(model_py_path)
+                # the model is the class of the module having its name
+                model = getattr(importlib.import_module(model_py_path), model_py_path.split(".")[-1], None)
+                if isinstance(model, type):
+                    list_module_names.extend(PlanCache.get_module_names(model))
+        plan = {
+            "wopfile": wopfile_yml_dict,
+            "source_hashes": {module_name: ToolWrapper.get_source_file_hash(module_name)
+                              for module_name in sorted(set(list_module_names))},
+            "edges": sorted([tool_wrapper1.rule_name, tool_wrapper2.rule_name]
+                            for tool_wrapper1, tool_wrapper2 in dag_tools.edges()),
+        }
+        try:
+            plan_str = json.dumps(plan)
+            if json.loads(plan_str)["wopfile"] != wopfile_yml_dict:
+                return
+        except (TypeError, ValueError):
+            return
+        # the plan is written in a temporary file then renamed, so that it is never read partially written
+        plan_path = self.get_path()
+        plan_tmp_path = "{}.{}.tmp".format(plan_path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(plan_path), exist_ok=True)
+            with open(plan_tmp_path, "w") as plan_file:
+                plan_file.write(plan_str)
+            os.replace(plan_tmp_path, plan_path)
+            Logger.instance().debug("The plan of the workflow has been stored in " + plan_path)
+        except OSError as e:
+            Logger.instance().debug("The plan of the workflow cannot be stored: " + str(e))
+            return
+        PlanCache.evict()
@@ -14,12 +14,14 @@ except ImportError:
 
 from sqlalchemy.orm.exc import NoResultFound, ObjectDeletedError
 
+from wopmars.PlanCache import PlanCache
 from wopmars.SQLManager import SQLManager
 from wopmars.models.Execution import Execution
 from wopmars.models.TableInputOutputInformation import TableInputOutputInformation
 from wopmars.models.FileInputOutputInformation import FileInputOutputInformation
 from wopmars.models.TableModificationTime import TableModificationTime
 from wopmars.models.Option import Option
+from wopmars.models.Resource import Resource
 from wopmars.models.TypeInputOrOutput import TypeInputOrOutput
 from wopmars.utils.DictUtils import DictUtils
 from wopmars.utils.Logger import Logger
@@ -42,6 +44,9 @@ class Reader:
     """
     def __init__(self):
         self.__wopfile_yml_dict = None
+        # the plan cache of the definition file and the plan found in it, if any
+        self.__plan_cache = None
+        self.__plan = None
 
     def load_wopfile_as_yml_dic(self, wopfile_path):
         """
@@ -60,9 +65,16 @@ class Reader:
         try:
             with open(wopfile_path, 'r') as def_file:
                 wopfile_content_str = def_file.read()
+            Logger.instance().info("Reading the Wopfile.yml: " + str(wopfile_path))
+            self.__plan_cache = PlanCache(wopfile_content_str)
+            self.__plan = self.__plan_cache.load()
+            if self.__plan is not None:
+                # the definition file has already been read and validated
+                Logger.instance().debug("The workflow definition has been found in the plan cache.")
+                self.__wopfile_yml_dict = self.__plan["wopfile"]
+                return
             try:
                 # The workflow definition file is loaded as-it in memory by the pyyaml library
-                Logger.instance().info("Reading the Wopfile.yml: " + str(wopfile_path))
                 # Replace jinja2 variables with environment variable values
                 #s_def_file_content = jinja2.Environment().from_string(s_def_file_content).render(os.environ)
                 # Parse the file to find duplicates rule names (it is a double check with the following step)
@@ -162,7 +174,7 @@ class Reader:
             identifier    = String
             ni            = NEWLINE INDENT
             rule          = "rule" identifier ":" ruleparams
-            ruleparams    = [ni tool] [ni input] [ni output] [ni params]
+            ruleparams    = [ni tool] [ni input] [ni output] [ni params] [ni resources] [ni retries] [ni backoff] [ni timeout]
             filesortables = (ni files|ni models){0-2}
             files         = "file"  ":" (ni identifier ”:” stringliteral)+
             models        = "table"  ":" (ni identifier ”:” stringliteral)+
@@ -170,6 +182,10 @@ class Reader:
             input         = "input"  ":" ni filesortables
             output        = "output" ":" ni filesortables
             params        = "params" ":" (ni identifier ”:” stringliteral)+
+            resources     = "resources" ":" (ni identifier ”:” number)+
+            retries       = "retries" ":" integer
+            backoff       = "backoff" ":" number
+            timeout       = "timeout" ":" number
             (NEWLINE WoPMaRS)+
 
         :raises WopMarsException: The grammar is not respected
@@ -189,6 +205,11 @@ class Reader:
                 - path.to.table
         params:
             OPTIONNAME: OPTIONVALUE
+        resources:
+            RESOURCENAME: QUANTITY
+        retries: NUMBEROFRETRIES
+        backoff: SECONDS
+        timeout: SECONDS
 
     rule ...etc...
         """
@@ -196,7 +217,7 @@ class Reader:
         regex_step1 = re.compile(r"(^rule [^\s]+$)")
 
         # recognize the elements of the rule
-        regex_step2 = re.compile(r"(^params$)|(^tool$)|(^input$)|(^output$)")
+        regex_step2 = re.compile(r"(^params$)|(^tool$)|(^input$)|(^output$)|(^resources$)|(^retries$)|(^backoff$)|(^timeout$)")
 
         # recognize the file/table blocks
         regex_step3 = re.compile(r"(^file$)|(^table$)")
@@ -222,7 +243,7 @@ class Reader:
                                            "The line containing:'" + str(s_key_step2) + "'" +
                                            " for rule '" + str(s_key_step1) + "'" +
                                            " doesn't match the grammar: it should be " +
-                                           "'tool', 'params', 'input' or 'output'" +
+                                           "'tool', 'params', 'input', 'output', 'resources', 'retries', 'backoff' or 'timeout'" +
                                            "\nexemple:" + exemple_file_def)
                 elif s_key_step2 == "input" or s_key_step2 == "output":
                     for s_key_step3 in self.__wopfile_yml_dict[s_key_step1][s_key_step2]:
@@ -253,6 +274,39 @@ class Reader:
                                                            " doesn't match the grammar: it should be the string containing the is_input of the Model."
                                                            "\nexemple:" + exemple_file_def)
 
+                elif s_key_step2 == "resources":
+                    for s_resource_name in self.__wopfile_yml_dict[s_key_step1][s_key_step2]:
+                        resource_value = self.__wopfile_yml_dict[s_key_step1][s_key_step2][s_resource_name]
+                        if type(resource_value) not in (int, float):
+                            raise WopMarsException("Error while parsing the configuration file: \n\t" +
+                                                   "The grammar of the WopMars's definition file is not respected:",
+                                                   "The line containing:'" + str(s_resource_name) + "'" +
+                                                   " for rule '" + str(s_key_step1) + "'" +
+                                                   " doesn't match the grammar: it should be the quantity of the resource."
+                                                   "\nexemple:" + exemple_file_def)
+
+                elif s_key_step2 == "retries" or s_key_step2 == "backoff":
+                    value = self.__wopfile_yml_dict[s_key_step1][s_key_step2]
+                    # the number of retries is an integer, the backoff may be a float
+                    allowed_types = (int,) if s_key_step2 == "retries" else (int, float)
+                    if type(value) not in allowed_types or value < 0:
+                        raise WopMarsException("Error while parsing the configuration file: \n\t" +
+                                               "The grammar of the WopMars's definition file is not respected:",
+                                               "The line containing:'" + str(s_key_step2) + "'" +
+                                               " for rule '" + str(s_key_step1) + "'" +
+                                               " doesn't match the grammar: it should be a positive number."
+                                               "\nexemple:" + exemple_file_def)
+
+                elif s_key_step2 == "timeout":
+                    value = self.__wopfile_yml_dict[s_key_step1][s_key_step2]
+                    if type(value) not in (int, float) or value <= 0:
+                        raise WopMarsException("Error while parsing the configuration file: \n\t" +
+                                               "The grammar of the WopMars's definition file is not respected:",
+                                               "The line containing:'" + str(s_key_step2) + "'" +
+                                               " for rule '" + str(s_key_step1) + "'" +
+                                               " doesn't match the grammar: it should be a number of seconds greater than 0."
+                                               "\nexemple:" + exemple_file_def)
+
                 # There should be one tool at max in each rule
                 elif s_key_step2 == "tool":
                     if bool_toolwrapper == False:
@@ -285,6 +339,9 @@ class Reader:
 
         :raise WopMarsException: There is an error while accessing the database
         """
+        # the tool command has no definition file to cache
+        self.__plan_cache = None
+        self.__plan = None
         session = SQLManager.instance().get_session()
         dict_inputs = dict(eval(s_dict_inputs))
         dict_outputs = dict(eval(s_dict_outputs))
@@ -339,23 +396,11 @@ class Reader:
 
             # Instantiate the refered class
             wrapper_entry = self.create_tool_wrapper_inst("rule_" + s_toolwrapper, s_toolwrapper,
-                                                          dict_dict_dict_elm, input_entry, output_entry)
+                                                          dict_dict_dict_elm, input_entry, output_entry,
+                                                          Reader.get_modification_table_entries())
             wrapper_entry.relation_toolwrapper_to_execution = execution
             Logger.instance().debug("Object tool_python_path: " + s_toolwrapper + " created.")
-            session.add(wrapper_entry)
-            session.commit()
-            session.rollback()
-            TableInputOutputInformation.set_tables_properties(TableInputOutputInformation.get_execution_tables())
-            # commit /rollback trick to clean the session
-            # totodo LucG ask lionel est-ce-que tu as deja eu ce problème à ne pas pouvoir faire des queries et des ajouts
-            # dans la meme session?
-            session.commit()
-            session.rollback()
-            # if not SQLManager.instance().d_database_config['db_connection'] == 'postgresql':
-            # This command will create all the triggers that will create timestamp after modification
-            TableModificationTime.create_triggers()
-            # This create_all will create all models that have been found in the tool_python_path
-            SQLManager.instance().create_all()
+            Reader.register_tool_wrappers({wrapper_entry})
             wrapper_entry.is_content_respected()
         except NoResultFound as e:
             session.rollback()
@@ -386,6 +431,7 @@ class Reader:
             input_entry = session.query(TypeInputOrOutput).filter(TypeInputOrOutput.is_input == True).one()
             output_entry = session.query(TypeInputOrOutput).filter(TypeInputOrOutput.is_input == False).one()
             tool_wrapper_set = set()
+            dict_modification_table_entries = Reader.get_modification_table_entries()
             # Encounter a rule block
             for yml_key_level1 in self.__wopfile_yml_dict:
                 tool_wrapper_py_path = None
@@ -394,11 +440,20 @@ class Reader:
                 Logger.instance().debug("Encounter rule " + rule_name_str + ": \n" +
                                         str(DictUtils.pretty_repr(self.__wopfile_yml_dict[yml_key_level1])))
                 # The dict of "input"s, "output"s and "params" is re-initialized for each tool wrapper
-                tool_wrapper_inst_dic = dict(dict_input={"file": {}, "table": {}}, dict_params={}, dict_output={"file": {}, "table": {}})
+                tool_wrapper_inst_dic = dict(dict_input={"file": {}, "table": {}}, dict_params={}, dict_output={"file": {}, "table": {}},
+                                             dict_resources={}, retries=0, backoff=1.0, timeout=None)
                 for yml_key_level2 in self.__wopfile_yml_dict[yml_key_level1]:
-                    # key_second_step is supposed to be "tool", "input", "output" or "params"
+                    # key_second_step is supposed to be "tool", "input", "output", "params", "resources", "retries",
+                    # "backoff" or "timeout"
                     # if type(self.__wopfile_yml_dict[rule_header][yml_key_level_2nd]) == dict:
-                    if yml_key_level2 in {"input", "output", "params"}:
+                    if yml_key_level2 == "resources":
+                        for yml_key_level3 in self.__wopfile_yml_dict[yml_key_level1][yml_key_level2]:
+                            value = self.__wopfile_yml_dict[yml_key_level1][yml_key_level2][yml_key_level3]
+                            tool_wrapper_inst_dic["dict_resources"][yml_key_level3] = Resource(name=yml_key_level3,
+                                                                                               value=value)
+                    elif yml_key_level2 in {"retries", "backoff", "timeout"}:
+                        tool_wrapper_inst_dic[yml_key_level2] = self.__wopfile_yml_dict[yml_key_level1][yml_key_level2]
+                    elif yml_key_level2 in {"input", "output", "params"}:
                         # if it is a dict, then inputs, outputs or params are coming
                         for yml_key_level3 in self.__wopfile_yml_dict[yml_key_level1][yml_key_level2]:
                             if yml_key_level2 == "params":
@@ -454,57 +509,117 @@ class Reader:
 
                 # Instantiate the referred class and add it to the set of objects
                 tool_wrapper_inst = self.create_tool_wrapper_inst(rule_name_str, tool_wrapper_py_path, tool_wrapper_inst_dic,
-                                                              input_entry, output_entry)
+                                                              input_entry, output_entry, dict_modification_table_entries)
                 # Associating a tool_python_path to an execution
                 tool_wrapper_inst.relation_toolwrapper_to_execution = execution
                 tool_wrapper_set.add(tool_wrapper_inst)
                 Logger.instance().debug("Instance tool_python_path: " + tool_wrapper_py_path + " created.")
-                # commit/rollback trick to clean the session - SQLAchemy bug suspected
-                session.commit()
-                session.rollback()
-                # totodo LucG set_table_properties outside the rules loop to take into account all the models at once
-                # (error if one tool has a foreign key refering to a table that is not in its I/O put
-            TableInputOutputInformation.set_tables_properties(TableInputOutputInformation.get_execution_tables())
-            session.commit()
-            session.rollback()
-            # This command is creating the triggers that will update the modification
-            TableModificationTime.create_triggers()
-            # This create_all will create all models that have been found in the tool_python_path
-            SQLManager.instance().create_all()
-            session.add_all(tool_wrapper_set)
-            # save all operations done so far.
-            session.commit()
-            for tool_wrapper in tool_wrapper_set:
-                tool_wrapper.is_content_respected()
+            Reader.register_tool_wrappers(tool_wrapper_set)
+            if self.__plan is None:
+                for tool_wrapper in tool_wrapper_set:
+                    tool_wrapper.is_content_respected()
 
         except NoResultFound as e:
             session.rollback()
             raise WopMarsException("Error while parsing the configuration file. The database has not been setUp Correctly.",
                                    str(e))
 
-    def create_tool_wrapper_inst(self, rule_name, tool_python_path, dict_dict_dict_elm, input_entry, output_entry):
+    def get_plan(self):
+        """
+        :return: dict or None: the plan of the definition file found in the plan cache, see
+            :meth:`~.wopmars.PlanCache.PlanCache.load`
+        """
+        return self.__plan
+
+    def save_plan(self, set_toolwrappers, dag_tools):
+        """
+        Store the plan of the definition file read by this Reader, once the DAG has been validated.
+
+        :param set_toolwrappers: The ToolWrappers of the workflow
+        :type set_toolwrappers: set(:class:`~.wopmars.models.ToolWrapper.ToolWrapper`)
+        :param dag_tools: The DAG of the ToolWrappers
+        :type dag_tools: :class:`~.wopmars.DAG.DAG`
+        """
+        if self.__plan_cache is not None and self.__plan is None:
+            self.__plan_cache.save(self.__wopfile_yml_dict, set_toolwrappers, dag_tools)
+
+    @staticmethod
+    def get_modification_table_entries():
+        """
+        Get all the TableModificationTime entries with one query.
+
+        :return: dict(str: :class:`~.wopmars.models.TableModificationTime.TableModificationTime`) the entries by
+            table_name
+        """
+        session = SQLManager.instance().get_session()
+        return {entry.table_name: entry for entry in session.query(TableModificationTime).all()}
+
+    @staticmethod
+    def register_tool_wrappers(tool_wrapper_set):
+        """
+        Insert the given ToolWrappers in the database, with their inputs, outputs, options and resources, in one
+        transaction.
+
+        The models of the tables of the ToolWrappers are imported and created first: the session must not be flushed
+        before, the tables are created through another connection.
+
+        :param tool_wrapper_set: The ToolWrappers of the execution, not flushed yet
+        :type tool_wrapper_set: set(:class:`~.wopmars.models.ToolWrapper.ToolWrapper`)
+        """
+        session = SQLManager.instance().get_session()
+        TableInputOutputInformation.set_tables_properties(
+            [t for tool_wrapper in tool_wrapper_set for t in tool_wrapper.relation_toolwrapper_to_tableioinfo])
+        # This create_all will create all models that have been found in the tool_python_path
+        SQLManager.instance().create_all()
+        session.add_all(tool_wrapper_set)
+        session.commit()
+
+    @staticmethod
+    def get_or_create_modification_table_entry(dict_modification_table_entries, table_name):
+        """
+        Get the TableModificationTime entry of the given table or create it, with the current time.
+
+        :param dict_modification_table_entries: The TableModificationTime entries by table_name, see
+            :meth:`~.wopmars.Reader.Reader.get_modification_table_entries`. The created entry is added to it.
+        :type dict_modification_table_entries: dict(str: :class:`wopmars.models.TableModificationTime.TableModificationTime`)
+        :param table_name: The name of the table
+        :type table_name: str
+        :return: :class:`wopmars.models.TableModificationTime.TableModificationTime`
+        """
+        modification_table_entry = dict_modification_table_entries.get(table_name)
+        if modification_table_entry is None:
+            time_unix_ms, time_human = get_current_time()
+            modification_table_entry = TableModificationTime(table_name=table_name, mtime_epoch_millis=time_unix_ms,
+                                                             mtime_human=time_human)
+            dict_modification_table_entries[table_name] = modification_table_entry
+        return modification_table_entry
+
+    def create_tool_wrapper_inst(self, rule_name, tool_python_path, dict_dict_dict_elm, input_entry, output_entry,
+                                 dict_modification_table_entries):
         """
         Actual creating of the Toolwrapper object.
 
         The tool_python_path object is an entry of the table rule in the resulting database.
 
-        If the scoped_session has current modification, they probably will be commited during this method:
-        models are created and this can only be done with clean session.
+        Nothing is written in the database here: the ToolWrappers of the execution are inserted together by
+        :meth:`~.wopmars.Reader.Reader.register_tool_wrappers`.
 
         :param rule_name: Contains the is_input of the rule in which the tool_python_path will be used.
         :type rule_name: str
         :param tool_python_path: Contains the is_input of the tool_python_path. It will be used for importing the correct module and then for creating the class
         :type tool_python_path: str
-        :param dict_dict_dict_elm: "input"s "output"s and "params" and will be used to make relations between options / input / output and the tool_python_path.
+        :param dict_dict_dict_elm: "input"s "output"s "params" and "resources" and will be used to make relations between options / input / output / resources and the tool_python_path. "retries", "backoff" and "timeout" are set on the tool_python_path.
         :type dict_dict_dict_elm: dict(dict(dict()))
         :param input_entry: input entry
         :type input_entry: :class:`wopmars.framework.bdd.models.TypeInputOrOutput.TypeInputOrOutput`
         :param output_entry: output entry
         :type output_entry: :class:`wopmars.framework.bdd.models.TypeInputOrOutput.TypeInputOrOutput`
+        :param dict_modification_table_entries: The TableModificationTime entries by table_name, completed with the
+            entries created for the tables of the tool_python_path
+        :type dict_modification_table_entries: dict(str: :class:`wopmars.models.TableModificationTime.TableModificationTime`)
 
         :return: TooLWrapper instance
         """
-        session = SQLManager.instance().get_session()
         # Importing the module in the mod variable
         try:
             mod = importlib.import_module(tool_python_path)
@@ -540,21 +655,13 @@ class Reader:
             elif elm == "table":
                 for input_t in dict_dict_dict_elm["dict_input"][elm]:
                     # input_t is the is_input of the table (not the model)
-                    # this is a preventing commit because next statement will create a new table and the session has to
-                    # be clean. I think it is a bug in SQLAlchemy which not allows queries then insert statements in
-                    # the same session
-                    session.commit()
                     iodbput_entry = dict_dict_dict_elm["dict_input"][elm][input_t]
                     # the user-side models are created during the reading of the definition file
                     # table_entry = TableInputOutputInformation(is_input=dict_dict_dict_elm["dict_input"][elm][input_t], tablename=input_t)
                     # insert in the database the mtime_epoch_millis of last modification of a developper-side table
-                    time_unix_ms, time_human = get_current_time()
                     model_py_path_suffix = dict_dict_dict_elm["dict_input"][elm][input_t].model_py_path.split('.')[-1]
-                    modification_table_entry, created = session.get_or_create(TableModificationTime,
-                                                                              defaults={
-                                                                                  "mtime_epoch_millis": time_unix_ms,
-                                                                                  "mtime_human": time_human},
-                                                                              table_name=model_py_path_suffix)
+                    modification_table_entry = Reader.get_or_create_modification_table_entry(
+                        dict_modification_table_entries, model_py_path_suffix)
                     iodbput_entry.relation_tableioinfo_to_tablemodiftime = modification_table_entry
                     iodbput_entry.relation_file_or_tableioinfo_to_typeio = input_entry
                     try:
@@ -578,16 +685,11 @@ class Reader:
             elif elm == "table":
                 for output_t in dict_dict_dict_elm["dict_output"][elm]:
                     # output_t is the table is_input (not the model)
-                    session.commit()
                     iodbput_entry = dict_dict_dict_elm["dict_output"][elm][output_t]
-                    time_unix_ms, time_human = get_current_time()
-                    # This corresponds the __tablename__ of the database in the database
+                    # This corresponds the __tablename__ of the database in the database
                     model_py_path_suffix = dict_dict_dict_elm["dict_output"][elm][output_t].model_py_path.split('.')[-1]
-                    modification_table_entry, created = session.get_or_create(TableModificationTime,
-                                                                              defaults={
-                                                                                  "mtime_epoch_millis": time_unix_ms,
-                                                                                  "mtime_human": time_human},
-                                                                              table_name=model_py_path_suffix)
+                    modification_table_entry = Reader.get_or_create_modification_table_entry(
+                        dict_modification_table_entries, model_py_path_suffix)
                     iodbput_entry.relation_tableioinfo_to_tablemodiftime = modification_table_entry
                     iodbput_entry.relation_file_or_tableioinfo_to_typeio = output_entry
                     try:
@@ -603,5 +705,15 @@ class Reader:
             # associating option and tool_python_path
             tool_wrapper_inst.relation_toolwrapper_to_option.append(dict_dict_dict_elm["dict_params"][opt])
 
+        for resource in dict_dict_dict_elm.get("dict_resources", {}):
+            # associating resource and tool_python_path
+            tool_wrapper_inst.relation_toolwrapper_to_resource.append(dict_dict_dict_elm["dict_resources"][resource])
+
+        tool_wrapper_inst.retries = dict_dict_dict_elm.get("retries", 0)
+        tool_wrapper_inst.backoff_secs = dict_dict_dict_elm.get("backoff", 1.0)
+        tool_wrapper_inst.timeout_secs = dict_dict_dict_elm.get("timeout")
+        tool_wrapper_inst.signature = tool_wrapper_inst.get_signature()
+        tool_wrapper_inst.source_hash = tool_wrapper_inst.get_source_hash()
+
         # toolwrapper_wrapper.is_content_respected()
         return tool_wrapper_inst
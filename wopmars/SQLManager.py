@@ -1,12 +1,20 @@
 """
 Module containing the SQLManager class.
 """
+import datetime
+import multiprocessing
+import os
+import re
+import threading
+
 import sqlalchemy
 
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, select, func
 from sqlalchemy.schema import sort_tables
-from sqlalchemy import event
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
 
 from wopmars.Base import Base
 from wopmars.WopmarsSession import WopmarsSession
@@ -14,7 +22,9 @@ from wopmars.utils.Logger import Logger
 from wopmars.utils.OptionManager import OptionManager
 from wopmars.utils.RWLock import RWLock
 from wopmars.utils.Singleton import SingletonMixin
+from wopmars.utils.TableFingerprint import TableFingerprint
 from wopmars.utils.WopMarsException import WopMarsException
+from wopmars.utils.various import get_current_time
 
 
 class SQLManager(SingletonMixin):
@@ -39,9 +49,14 @@ class SQLManager(SingletonMixin):
         "wom_ToolWrapper",
         "wom_TableInputOutputInformation",
         "wom_FileInputOutputInformation",
-        "wom_Option"
+        "wom_Option",
+        "wom_Resource"
     ]
 
+    # the table written by a raw SQL statement
+    written_table_regex = re.compile(r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|"
+                                     r"DELETE\s+FROM)\s+[\"`\[]?(\w+)", re.IGNORECASE)
+
     def __init__(self):
         """
         The constructor of the SQLManager is supposed to be called once in the whole execution, thanks to the
@@ -50,13 +65,24 @@ class SQLManager(SingletonMixin):
         The constructor create the engine at the localization provided by the user. The option "connect_args" is set to
         False.
 
-        The "PRAGMA foreign_keys=ON" statement is executed here and allows to enforce foreign_keys constraints.
+        The "PRAGMA foreign_keys=ON" statement is executed here and allows to enforce foreign_keys constraints. The
+        TableFingerprint aggregate function is registered in the SQLite connections.
 
         The Session attribute is a object of class "Type" and allows to make a scoped session bound to the engine on demand.
         The autocommit is set to False and the autoflush, to True.
 
         The lock is initialized here thanks to the RW lock class and will be used to overide the behaviour of sqlite
         to assess the access to the databse without using the queue of SQLite, bound at 4 sec wait before error.
+
+        SQLite allows only one write transaction at a time. The write_transaction_lock is taken by a session before it
+        writes anything and released when its transaction ends, so that ToolWrappers running in different threads
+        wait for each other instead of holding the SQLite lock while waiting for the RW lock. It is a multiprocessing lock
+        so that it can be shared with the ToolWrappers executed in child processes (--executor process). The
+        write_transaction_owner is the pid of the process holding it, so that it can be released if this process is
+        killed.
+
+        The user tables modified by a session are collected when it is flushed and when it executes a statement. Their
+        mtime_epoch_millis in wom_TableModificationTime is updated once, when the session is committed.
         """
         s_database_url = OptionManager.instance()["--database"]
 
@@ -76,47 +102,268 @@ class SQLManager(SingletonMixin):
         def _fk_pragma_on_connect(dbapi_con, con_record):
             if self.d_database_config['db_connection'] == "sqlite":
                 dbapi_con.execute('pragma foreign_keys=ON')
+                dbapi_con.create_aggregate(TableFingerprint.NAME, -1, TableFingerprint)
 
         event.listen(self.engine, 'connect', _fk_pragma_on_connect)
         ###
 
         # Luc: I don't know why I have used the autoflush=True
-        self.__Session = scoped_session(sessionmaker(bind=self.engine, autoflush=True, autocommit=False))
+        session_factory = sessionmaker(bind=self.engine, autoflush=True, autocommit=False)
+        self.__Session = scoped_session(session_factory)
         # The lock
         self.__lock = RWLock()
+        # count and scalar query again inside the read lock: the read lock is taken once by each thread
+        self.__read_lock_depth = threading.local()
+        self.__write_transaction_lock = multiprocessing.get_context("spawn").Lock()
+        self.__write_transaction_owner = multiprocessing.get_context("spawn").Value("i", 0, lock=False)
+
+        if self.d_database_config['db_connection'] == "sqlite":
+            event.listen(session_factory, 'before_flush', self._before_flush)
+            event.listen(session_factory, 'after_transaction_end', self._after_transaction_end)
+        event.listen(session_factory, 'before_flush', self._track_flushed_tables)
+        event.listen(session_factory, 'do_orm_execute', self._track_executed_statement)
+        event.listen(session_factory, 'before_commit', self._stamp_modified_tables)
+        event.listen(session_factory, 'after_transaction_end', self._forget_modified_tables)
+
+    def get_write_transaction_lock(self):
+        return self.__write_transaction_lock
+
+    def get_write_transaction_owner(self):
+        return self.__write_transaction_owner
+
+    def set_write_transaction_lock(self, lock, owner):
+        """
+        Replace the write_transaction_lock by the one of the parent process. Must be called before any session is used.
+
+        :param lock: The write_transaction_lock of the SQLManager of the parent process
+        :type lock: multiprocessing.Lock
+        :param owner: The write_transaction_owner of the SQLManager of the parent process
+        :type owner: multiprocessing.Value
+        """
+        self.__write_transaction_lock = lock
+        self.__write_transaction_owner = owner
+
+    def release_write_transaction_of(self, pid):
+        """
+        Release the write_transaction_lock if it is held by the given process, which has been killed.
+
+        The database itself is rolled back by SQLite when the process dies: only the lock has to be released.
+
+        :param pid: The pid of the killed process
+        :type pid: int
+        """
+        if self.__write_transaction_owner.value == pid:
+            self.__write_transaction_owner.value = 0
+            self.__write_transaction_lock.release()
+            Logger.instance().debug("The write transaction lock held by the killed process {} has been released."
+                                    .format(pid))
+
+    def acquire_write_transaction(self, session):
+        """
+        Take the write_transaction_lock for the transaction of the given session, if it has not already been taken.
+
+        Only SQLite databases are concerned, for the others, nothing is done.
+
+        :param session: SQLAlchemy session object
+        """
+        if self.d_database_config['db_connection'] == "sqlite" and not session.info.get("wopmars_write_transaction"):
+            Logger.instance().debug(str(session) + " want the write transaction lock on SQLManager.")
+            self.__write_transaction_lock.acquire()
+            self.__write_transaction_owner.value = os.getpid()
+            session.info["wopmars_write_transaction"] = True
+            Logger.instance().debug(str(session) + " has taken the write transaction lock on SQLManager.")
+
+    def _before_flush(self, session, flush_context, instances):
+        self.acquire_write_transaction(session)
+
+    def _after_transaction_end(self, session, transaction):
+        # only the end of the outermost transaction releases the database
+        if transaction.parent is None and session.info.pop("wopmars_write_transaction", False):
+            self.__write_transaction_owner.value = 0
+            self.__write_transaction_lock.release()
+            Logger.instance().debug(str(session) + " has released the write transaction lock on SQLManager.")
+
+    @staticmethod
+    def add_modified_table(session, table_name):
+        """
+        Remember that the given table has been written by the current transaction of the session.
+
+        The tables of WopMars are not stamped.
+
+        :param session: SQLAlchemy session object
+        :param table_name: The name of the table in the database
+        :type table_name: str
+        """
+        if table_name[:4] != "wom_":
+            session.info.setdefault("wopmars_modified_tables", set()).add(table_name)
+
+    def _track_flushed_tables(self, session, flush_context, instances):
+        for obj in session.new | session.deleted:
+            for table in sqlalchemy.inspect(obj).mapper.tables:
+                self.add_modified_table(session, table.name)
+        for obj in session.dirty:
+            if session.is_modified(obj):
+                for table in sqlalchemy.inspect(obj).mapper.tables:
+                    self.add_modified_table(session, table.name)
+
+    def _track_executed_statement(self, orm_execute_state):
+        statement = orm_execute_state.statement
+        if isinstance(statement, UpdateBase):
+            self.add_modified_table(orm_execute_state.session, statement.table.name)
+        elif isinstance(statement, TextClause):
+            match_written_table = SQLManager.written_table_regex.match(statement.text)
+            if match_written_table:
+                self.add_modified_table(orm_execute_state.session, match_written_table.group(1))
+
+    def _stamp_modified_tables(self, session):
+        """
+        Update the mtime_epoch_millis of the tables modified by the transaction, in one statement, before it is committed.
+        """
+        # the last flush of the commit happens after this hook: the session is flushed first to collect every table
+        session.flush()
+        set_table_names = session.info.pop("wopmars_modified_tables", None)
+        modification_table = Base.metadata.tables.get("wom_TableModificationTime")
+        if set_table_names and modification_table is not None:
+            mtime_epoch_millis, mtime_human = get_current_time()
+            Logger.instance().debug("Stamping the modification of the tables: " + ", ".join(sorted(set_table_names)))
+            session.execute(modification_table.update()
+                            .where(modification_table.c.table_name.in_(sorted(set_table_names)))
+                            .values(mtime_epoch_millis=mtime_epoch_millis, mtime_human=mtime_human))
+
+    def _forget_modified_tables(self, session, transaction):
+        # the tables modified by a transaction rolled back have not been modified
+        if transaction.parent is None:
+            session.info.pop("wopmars_modified_tables", None)
 
     def clean_up_unexecuted_tool_wrappers(self):
+        """
+        Delete the ToolWrappers that have not been executed or that have been skipped because already executed by the
+        previous executions, with their options, resources, inputs and outputs.
 
+        The rows are deleted by a few set-based statements in one transaction. The inputs and outputs are deleted by
+        the "ON DELETE CASCADE" of their foreign key. These ToolWrappers never hold the definition of another one, so
+        that no definition_id refers to them.
+        """
         from wopmars.models.Option import Option
+        from wopmars.models.Resource import Resource
+        from wopmars.models.ToolWrapper import ToolWrapper
+        if self.inspect.has_table(ToolWrapper.__tablename__):
+            toolwrapper_table = ToolWrapper.__table__
+            list_child_tables = [model.__table__ for model in [Option, Resource]
+                                 if self.inspect.has_table(model.__tablename__)]
+            clause_unexecuted = toolwrapper_table.c.status.in_(["NOT_EXECUTED", "ALREADY_EXECUTED"])
+            select_unexecuted_toolwrappers = select([toolwrapper_table.c.id]).where(clause_unexecuted)
+            try:
+                self.__lock.acquire_write()
+                with self.engine.begin() as connection:
+                    for child_table in list_child_tables:
+                        connection.execute(child_table.delete()
+                                           .where(child_table.c.toolwrapper_id.in_(select_unexecuted_toolwrappers)))
+                    count_deleted = connection.execute(toolwrapper_table.delete().where(clause_unexecuted)).rowcount
+                # the rows are deleted outside of the session: forget its objects, SQLite reuses the ids of the rows
+                self.get_session().close()
+                Logger.instance().debug("SQLManager.clean_up_unexecuted_tool_wrappers(): {} rules deleted."
+                                        .format(count_deleted))
+            finally:
+                self.__lock.release()
+
+    def prune_wopmars_history(self, keep_last=None, older_than_days=None):
+        """
+        Delete the old executions from the history, with their rules, then compact and analyze the database.
+
+        The executions pruned are the ones which are not among the keep_last most recent and which have started more
+        than older_than_days days ago. The most recent rule of each rule signature is kept, because the next executions
+        compare their rules with it to skip the ones already executed, and so are the rules holding the definition of a
+        rule kept. An execution is deleted once none of its rules is kept.
+
+        The wom tables of a database created by a previous version of WopMars are migrated first.
+
+        :param keep_last: The number of most recent executions to keep (None to not keep any)
+        :type keep_last: int
+        :param older_than_days: Only prune the executions started more than this number of days ago (None for all)
+        :type older_than_days: float
+        :return: tuple(int, int): the number of executions and of rules deleted
+        :raises WopMarsException: Neither keep_last nor older_than_days is given
+        """
+        from wopmars.models.Option import Option
+        from wopmars.models.Resource import Resource
         from wopmars.models.TableInputOutputInformation import TableInputOutputInformation
         from wopmars.models.FileInputOutputInformation import FileInputOutputInformation
         from wopmars.models.ToolWrapper import ToolWrapper
-        # from wopmars.models.Execution import Execution
-        if self.inspect.has_table(ToolWrapper.__tablename__):
+        from wopmars.models.Execution import Execution
+
+        if keep_last is None and older_than_days is None:
+            raise WopMarsException("Error while pruning the history",
+                                   "The number of executions to keep or their age must be given.")
+        if not self.inspect.has_table(ToolWrapper.__tablename__):
+            return 0, 0
+        execution_table = Execution.__table__
+        toolwrapper_table = ToolWrapper.__table__
+        list_child_tables = [model.__table__ for model in
+                             [Option, Resource, TableInputOutputInformation, FileInputOutputInformation]
+                             if self.inspect.has_table(model.__tablename__)]
 
-            toolwrapper_result_tuple =  self.engine.execute(select([ToolWrapper.__table__.c.id]).where(ToolWrapper.status == 'NOT_EXECUTED')).fetchall()
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(Option.__table__.delete().where(Option.toolwrapper_id == toolwrapper_id_row[0]))
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(TableInputOutputInformation.__table__.delete().where(TableInputOutputInformation.toolwrapper_id == toolwrapper_id_row[0]))
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(FileInputOutputInformation.__table__.delete().where(FileInputOutputInformation.toolwrapper_id == toolwrapper_id_row[0]))
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(ToolWrapper.__table__.delete().where(ToolWrapper.id == toolwrapper_id_row[0]))
-
-            toolwrapper_result_tuple = self.engine.execute(select([ToolWrapper.__table__.c.id]).where(ToolWrapper.status == 'ALREADY_EXECUTED')).fetchall()
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(Option.__table__.delete().where(Option.toolwrapper_id == toolwrapper_id_row[0]))
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(TableInputOutputInformation.__table__.delete().where(TableInputOutputInformation.toolwrapper_id == toolwrapper_id_row[0]))
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(FileInputOutputInformation.__table__.delete().where(FileInputOutputInformation.toolwrapper_id == toolwrapper_id_row[0]))
-            for toolwrapper_id_row in toolwrapper_result_tuple:
-                self.engine.execute(ToolWrapper.__table__.delete().where(ToolWrapper.id == toolwrapper_id_row[0]))
-
-        # if self.inspect.has_table(Execution.__tablename__):
-        #
-        #         self.engine.execute(Execution.__table__.delete().where(Execution.status == None))
+        try:
+            self.__lock.acquire_write()
+            self.migrate_wopmars_history_tables()
+            with self.engine.begin() as connection:
+                list_clauses = []
+                if keep_last is not None:
+                    # the most recent execution which can be pruned
+                    last_prunable_id = connection.execute(select([execution_table.c.id])
+                                                          .order_by(execution_table.c.id.desc())
+                                                          .offset(keep_last).limit(1)).scalar()
+                    if last_prunable_id is None:
+                        return 0, 0
+                    list_clauses.append(execution_table.c.id <= last_prunable_id)
+                if older_than_days is not None:
+                    started_before = get_current_time()[1] - datetime.timedelta(days=older_than_days)
+                    list_clauses.append(execution_table.c.started_at < started_before)
+                # the subqueries select the rules again: they must not be correlated with the statements using them
+                select_prunable_executions = select([execution_table.c.id]).where(sqlalchemy.and_(*list_clauses))\
+                    .correlate(None)
+                # the last rule of each rule signature
+                select_last_toolwrappers = select([func.max(toolwrapper_table.c.id)])\
+                    .group_by(toolwrapper_table.c.rule_name, toolwrapper_table.c.signature).correlate(None)
+                select_old_toolwrappers = select([toolwrapper_table.c.id])\
+                    .where(toolwrapper_table.c.execution_id.in_(select_prunable_executions))\
+                    .where(toolwrapper_table.c.id.notin_(select_last_toolwrappers)).correlate(None)
+                # the definitions still used by a rule which is not pruned
+                select_used_definitions = select([toolwrapper_table.c.definition_id])\
+                    .where(toolwrapper_table.c.definition_id.isnot(None))\
+                    .where(toolwrapper_table.c.id.notin_(select_old_toolwrappers)).correlate(None)
+                select_prunable_toolwrappers = select_old_toolwrappers\
+                    .where(toolwrapper_table.c.id.notin_(select_used_definitions))
+
+                count_toolwrappers = 0
+                # the definitions used only by pruned rules can be pruned once these rules are deleted
+                while True:
+                    for child_table in list_child_tables:
+                        connection.execute(child_table.delete()
+                                           .where(child_table.c.toolwrapper_id.in_(select_prunable_toolwrappers)))
+                    count_deleted = connection.execute(toolwrapper_table.delete()
+                                                       .where(toolwrapper_table.c.id.in_(select_prunable_toolwrappers)))\
+                        .rowcount
+                    if count_deleted == 0:
+                        break
+                    count_toolwrappers += count_deleted
+                count_executions = connection.execute(
+                    execution_table.delete()
+                    .where(execution_table.c.id.in_(select_prunable_executions))
+                    .where(~select([toolwrapper_table.c.id])
+                           .where(toolwrapper_table.c.execution_id == execution_table.c.id).exists())).rowcount
+            # the rows are deleted outside of the session: forget its objects, SQLite reuses the ids of the rows
+            self.get_session().close()
+            Logger.instance().info("{} executions and {} rules have been deleted from the history."
+                                   .format(count_executions, count_toolwrappers))
+            if self.d_database_config['db_connection'] == "sqlite":
+                # VACUUM cannot be executed in a transaction
+                with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                    connection.execute(text("VACUUM"))
+                    connection.execute(text("ANALYZE"))
+        finally:
+            self.__lock.release()
+        return count_executions, count_toolwrappers
 
     def clear_wopmars_history(self):
         """
@@ -125,6 +372,7 @@ class SQLManager(SingletonMixin):
         :param list_str_table: [String] the rule_name of the models.
         """
         from wopmars.models.Option import Option
+        from wopmars.models.Resource import Resource
         from wopmars.models.TableInputOutputInformation import TableInputOutputInformation
         from wopmars.models.FileInputOutputInformation import FileInputOutputInformation
         from wopmars.models.TableModificationTime import TableModificationTime
@@ -133,6 +381,8 @@ class SQLManager(SingletonMixin):
 
         if self.inspect.has_table(Option.__tablename__):
             self.engine.execute(Option.__table__.delete())
+        if self.inspect.has_table(Resource.__tablename__):
+            self.engine.execute(Resource.__table__.delete())
         if self.inspect.has_table(TableInputOutputInformation.__tablename__):
             self.engine.execute(TableInputOutputInformation.__table__.delete())
         if self.inspect.has_table(FileInputOutputInformation.__tablename__):
@@ -166,6 +416,7 @@ class SQLManager(SingletonMixin):
 
         :param session: SQLAlchemy session object
         """
+        self.acquire_write_transaction(session)
         try:
             Logger.instance().debug(str(session) + " want the write lock on SQLManager.")
             self.__lock.acquire_write()
@@ -196,10 +447,13 @@ class SQLManager(SingletonMixin):
         :return: The result of the query.
         """
         result = None
+        if query.session.new or query.session.dirty or query.session.deleted:
+            # the query will flush the session: the write transaction is taken before the read lock
+            self.acquire_write_transaction(query.session)
         try:
             Logger.instance().debug("Executing query on session " + str(query.session) + ": \n" + str(query) + ";")
             Logger.instance().debug("WopmarsQuery " + str(query.session) + " want the iterate_wopfile_yml_dic_and_insert_rules_in_db-lock on SQLManager")
-            self.__lock.acquire_read()
+            self.acquire_read()
             Logger.instance().debug("\"" + str(query.session) + "\" has taken the iterate_wopfile_yml_dic_and_insert_rules_in_db lock on SQLManager.")
             # switch case according to the demanded method.
             # in each condition, we call the superclass associated method: superclass is Query from sqlalchemy
@@ -220,10 +474,30 @@ class SQLManager(SingletonMixin):
                                        "Demanded operation doesn't exist: " + str(method))
         finally:
             # Always release the lock
-            self.__lock.release()
+            self.release_read()
             Logger.instance().debug("\"" + str(query.session) + "\" has released the iterate_wopfile_yml_dic_and_insert_rules_in_db lock on SQLManager.")
         return result
 
+    def acquire_read(self):
+        """
+        Acquire the read lock, unless the current thread already holds it.
+
+        The write lock has priority over the read lock: a thread taking the read lock a second time would wait for a
+        writer which waits for the first read lock.
+        """
+        depth = getattr(self.__read_lock_depth, "value", 0)
+        if depth == 0:
+            self.__lock.acquire_read()
+        self.__read_lock_depth.value = depth + 1
+
+    def release_read(self):
+        """
+        Release the read lock taken by :meth:`~.wopmars.SQLManager.SQLManager.acquire_read`.
+        """
+        self.__read_lock_depth.value -= 1
+        if self.__read_lock_depth.value == 0:
+            self.__lock.release()
+
     def execute(self, session, statement, *args, **kwargs):
         """
         Allow to execute a statement object on the given session.
@@ -233,6 +507,7 @@ class SQLManager(SingletonMixin):
         """
         Logger.instance().debug("SQLManager.execute(" + str(session) + ", " + str(statement) + ", " +
                                     str(args) + ", " + str(kwargs) + ")")
+        self.acquire_write_transaction(session)
         try:
             Logger.instance().debug(str(session) + " want the write lock on SQLManager for statement \"" + str(statement) + "\"")
             self.__lock.acquire_write()
@@ -287,10 +562,52 @@ class SQLManager(SingletonMixin):
             self.__lock.acquire_write()
             Logger.instance().debug("Creating all tables...")
             Base.metadata.create_all(self.engine)
+            self.migrate_wopmars_history_tables()
             # Always release the lock
         finally:
             self.__lock.release()
 
+    def migrate_wopmars_history_tables(self):
+        """
+        Add the columns and indexes of the wom tables that are missing in a database created by a previous version of
+        WopMars. Must be called with the write lock acquired.
+
+        The create_all of SQLAlchemy only creates the missing tables. The missing columns are added empty (NULL) with
+        "ALTER TABLE ... ADD COLUMN" and the missing indexes are created.
+
+        With SQLite, the INSERT, UPDATE and DELETE triggers created on the tables of the user by the previous versions
+        are dropped. They updated the mtime_epoch_millis once per modified row: the modified tables are now stamped
+        once per commit, see :meth:`~.wopmars.SQLManager.SQLManager.add_modified_table`.
+        """
+        with self.engine.begin() as connection:
+            # a new inspector: the one of the SQLManager caches the columns and indexes
+            inspector = sqlalchemy.inspect(connection)
+            preparer = self.engine.dialect.identifier_preparer
+            for table_name in SQLManager.wopmars_history_tables:
+                table = Base.metadata.tables.get(table_name)
+                if table is None or not inspector.has_table(table_name):
+                    continue
+                set_column_names = set(column["name"] for column in inspector.get_columns(table_name))
+                for column in table.columns:
+                    if column.name not in set_column_names:
+                        Logger.instance().info("Adding the column {}.{} to the database.".format(table_name,
+                                                                                                 column.name))
+                        connection.execute(text("ALTER TABLE {} ADD COLUMN {} {}".format(
+                            preparer.quote(table_name), preparer.quote(column.name),
+                            column.type.compile(dialect=self.engine.dialect))))
+                set_index_names = set(index["name"] for index in inspector.get_indexes(table_name))
+                for index in table.indexes:
+                    if index.name not in set_index_names:
+                        Logger.instance().info("Creating the index {} in the database.".format(index.name))
+                        index.create(connection)
+            if self.d_database_config['db_connection'] == "sqlite":
+                for trigger_name, table_name in connection.execute(
+                        text("SELECT name, tbl_name FROM sqlite_master WHERE type = 'trigger'")).fetchall():
+                    if table_name[:4] != "wom_" and trigger_name in ["{}_{}".format(table_name, statement)
+                                                                     for statement in ["INSERT", "UPDATE", "DELETE"]]:
+                        Logger.instance().info("Dropping the trigger {} from the database.".format(trigger_name))
+                        connection.execute(text("DROP TRIGGER {}".format(preparer.quote(trigger_name))))
+
     def create(self, tablename):
         """
         Use the declarative Base to create a table from its tablename.
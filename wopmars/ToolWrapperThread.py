@@ -1,13 +1,26 @@
 """
 Module containing the ToolWrapperThread class.
 """
+import importlib
+import multiprocessing
 import pathlib
+import signal
+import sys
 import threading
 import os
+import time
 import traceback
 
+try:
+    import resource
+except ImportError:
+    # not available on Windows: the rules can not be limited
+    resource = None
+
 from wopmars.SQLManager import SQLManager
 from wopmars.Observable import Observable
+from wopmars.models.TableInputOutputInformation import TableInputOutputInformation
+from wopmars.models.ToolWrapper import ToolWrapper
 from wopmars.utils.Logger import Logger
 from wopmars.utils.OptionManager import OptionManager
 from wopmars.utils.WopMarsException import WopMarsException
@@ -21,25 +34,52 @@ class ToolWrapperThread(threading.Thread, Observable):
     It has been designed in order to implement the multithreading, this is why it inherit from threading.Thread.
     """
 
+    # seconds given to a child process to roll back after it has been asked to stop, before it is killed
+    STOP_GRACE_SECS = 5
+
     def __init__(self, tool_wrapper):
         """
         self.__dry = True means that the tool shouldn't be executed because its output already exist
 
         :return:
         """
+        # the wrapped tool_python_path, set first because it is needed by __hash__
+        self.__tool_wrapper = tool_wrapper
         threading.Thread.__init__(self)
         self.__set_observer = set([])
-        # the wrapped tool_python_path
-        self.__tool_wrapper = tool_wrapper
         #self.__dry is different than the --dry-run option because it says "this has already been executed" whereas
         # the --dry-run option means "simulate the whole execution"
         # self.__dry can be True even if the --dry-run mode is enabled: it means "this tool has already its output, you
         # don't even need to simulate execution, just skip"
         self.__dry = False
+        # the id is read here, in the thread of the WorkflowManager: the worker thread loads its own copy of the
+        # tool_wrapper from it because SQLAlchemy objects can not be shared between the sessions of two threads
+        self.__tool_wrapper_id = tool_wrapper.id
+        self.__rule_name = tool_wrapper.rule_name
+        self.__tool_python_path = tool_wrapper.tool_python_path
+        self.__tool_wrapper_module = tool_wrapper.__class__.__module__
+        # the number of times the tool_wrapper is executed again after a failure and the delay before the first retry
+        self.__retries = tool_wrapper.retries or 0
+        self.__backoff_secs = tool_wrapper.backoff_secs if tool_wrapper.backoff_secs is not None else 1.0
+        # the maximum duration of an execution: the timeout of the rule or the "--rule-timeout" option
+        self.__timeout_secs = tool_wrapper.timeout_secs
+        if self.__timeout_secs is None and OptionManager.instance()["--rule-timeout"] is not None:
+            self.__timeout_secs = float(OptionManager.instance()["--rule-timeout"])
+        # start, stop, status, exit code and peak RSS of the execution, sent back to the WorkflowManager which stores
+        # them in the database
+        self.__execution_infos = (None, None, None, None, None)
+        # the WopMarsException raised during the execution, if any
+        self.__exception = None
 
     def get_toolwrapper(self):
         return self.__tool_wrapper
 
+    def get_execution_infos(self):
+        return self.__execution_infos
+
+    def get_exception(self):
+        return self.__exception
+
     def set_dry(self, dry):
         self.__dry = dry
 
@@ -49,82 +89,341 @@ class ToolWrapperThread(threading.Thread, Observable):
     def run(self):
         """
         Run the tool and fire events.
+
+        With the "--executor process" option, the tool_wrapper is executed in a child process and this thread waits for
+        it. Otherwise, if the ToolWrapperThread has been started as a thread by the WorkflowManager (--jobs option), the
+        tool_wrapper is loaded again in the session of this thread. The start, stop and status of the execution are
+        kept in the ToolWrapperThread and the WorkflowManager stores them when it is notified.
+
+        A rule with a timeout, a memory limit or a CPU limit is always executed in a child process because a thread can
+        not be stopped or limited.
+
+        If the execution fails and the rule has "retries" left, it is executed again after the "backoff" delay, which is
+        doubled after each failed retry.
+
+        Exceptions are not raised by this method: they are stored and the observers are notified of the failure.
         :return:
         """
+        is_worker_thread = threading.current_thread() is self and self.__tool_wrapper_id is not None
+        is_isolated = not self.__dry and not OptionManager.instance()["--dry-run"] and self.__tool_wrapper_id is not None \
+            and (OptionManager.instance()["--executor"] == "process" or self.__timeout_secs is not None
+                 or OptionManager.instance()["--rule-memory-limit"] is not None
+                 or OptionManager.instance()["--rule-cpu-limit"] is not None)
+        attempt = 0
+        while True:
+            self.__exception = None
+            if is_isolated:
+                self.run_in_process()
+            else:
+                self.run_in_thread(is_worker_thread)
+            if self.__exception is None or attempt >= self.__retries:
+                break
+            delay_secs = self.__backoff_secs * 2 ** attempt
+            attempt += 1
+            Logger.instance().warning("Rule {} has failed. Retry {}/{} in {} seconds."
+                                      .format(self.__rule_name, attempt, self.__retries, delay_secs))
+            Logger.instance().debug(str(self.__exception))
+            time.sleep(delay_secs)
+        if self.__exception is None:
+            self.fire_success()
+        else:
+            self.fire_failure()
+
+    def run_in_thread(self, is_worker_thread):
+        """
+        Run the tool in the current thread.
 
+        :param is_worker_thread: True if the current thread is the one of this ToolWrapperThread
+        :type is_worker_thread: bool
+        """
         wopmars_session = SQLManager.instance().get_session()
         time_unix_ms, time_human = get_current_time()
         start = time_human
+        tool_wrapper = self.__tool_wrapper
         try:
+            if is_worker_thread:
+                tool_wrapper = wopmars_session.query(ToolWrapper).filter(ToolWrapper.id == self.__tool_wrapper_id).one()
             # self.__tool_wrapper.set_session(wopmars_session)
-            self.__tool_wrapper.session = wopmars_session
+            tool_wrapper.session = wopmars_session
             # if the tool need to be executed because its output doesn't exist
             if self.__dry:  # tool_wrapper skipped
                 Logger.instance().info("ToolWrapper skipped: {} -> {}"
-                                       .format(self.__tool_wrapper.rule_name, self.__tool_wrapper.__class__.__name__))
+                                       .format(tool_wrapper.rule_name, tool_wrapper.__class__.__name__))
                 # Logger.instance().info("ToolWrapper: " + str(self.__tool_wrapper.rule_name) +
                 #                        " -> " + self.__tool_wrapper.__class__.__name__ + " skipped.")
-                self.__tool_wrapper.set_execution_infos(start, time_human, "ALREADY_EXECUTED")
+                self.set_execution_infos(start, time_human, "ALREADY_EXECUTED")
             else:
                 Logger.instance().info(
-                    "\n" + str(self.__tool_wrapper) + "\n" + "command line: \n\t" + self.get_command_line())
+                    "\n" + str(tool_wrapper) + "\n" + "command line: \n\t" + self.get_command_line(tool_wrapper))
                 # if you shouldn't simulate
                 if OptionManager.instance()["--dry-run"]:  # dry run
                     Logger.instance().debug("Dry-run mode enabled. Execution skipped.")
-                    self.__tool_wrapper.set_execution_infos(status="DRY")
+                    self.set_execution_infos(status="DRY")
                 else:  # normal execution
-                    # if OptionManager.instance()["--touch"]:  # dry run
-                    #     Logger.instance().debug("Touch mode enabled.")
-                    #     self.__tool_wrapper.touch()
-                    Logger.instance().info("ToolWrapper: " + str(self.__tool_wrapper.rule_name) + " -> "
-                                           + self.__tool_wrapper.__class__.__name__ + " started.")
-                    output_file_fields = self.__tool_wrapper.specify_output_file()
-                    for out_field in output_file_fields:
-                        out_file_path = self.__tool_wrapper.output_file(out_field)
-                        out_dir = os.path.dirname(out_file_path)
-                        pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
-
-                    ####################################################################################################
-                    #
-                    # Touch output files of tool wrapper
-                    #
-                    ####################################################################################################
-
-                    if OptionManager.instance()["--touch"]:  # Just touch
-                        self.__tool_wrapper.touch()
-
-                    ####################################################################################################
-                    #
-                    # Normal run of tool wrapper
-                    #
-                    ####################################################################################################
-
-                    else:  # Run
-                        self.__tool_wrapper.run()
-                    wopmars_session.commit()
+                    ToolWrapperThread.execute(tool_wrapper, wopmars_session)
                     time_unix_ms, time_human = get_current_time()
-                    self.__tool_wrapper.set_execution_infos(start, time_human, "EXECUTED")
+                    self.set_execution_infos(start, time_human, "EXECUTED")
 
         except Exception as e:
             wopmars_session.rollback()
-            self.__tool_wrapper.set_execution_infos(start, time_human, "ERROR")
-            raise WopMarsException("Error while executing rule " + self.__tool_wrapper.rule_name +
-                                   " (ToolWrapper " + self.__tool_wrapper.tool_python_path + ")",
-                                   "Full stack trace: \n" + str(traceback.format_exc()))
+            self.set_execution_infos(start, time_human, "ERROR")
+            self.__exception = WopMarsException("Error while executing rule " + str(tool_wrapper.rule_name) +
+                                                " (ToolWrapper " + str(tool_wrapper.tool_python_path) + ")",
+                                                "Full stack trace: \n" + str(traceback.format_exc()))
+        finally:
+            if is_worker_thread:
+                # the session of the worker thread is not used anymore
+                wopmars_session.close()
+
+    def run_in_process(self):
+        """
+        Run the tool in a child process and wait for it.
+
+        The child process has its own SQLManager and session and sends back the start, stop, status, error and peak RSS
+        of the execution through a pipe. The exit code of the child process is kept with them. The ToolWrapper object
+        of the WorkflowManager is not used in this thread: its rule_name and tool_python_path have been read by the
+        WorkflowManager before the thread has been started.
+
+        If the execution lasts more than the timeout, the child process is stopped and the status is "TIMEOUT".
+        """
+        context = multiprocessing.get_context("spawn")
+        parent_connection, child_connection = context.Pipe(duplex=False)
+        process = context.Process(target=ToolWrapperThread.run_child_process,
+                                  args=(dict(OptionManager.instance()), self.__tool_wrapper_module, self.__tool_wrapper_id,
+                                        set(TableInputOutputInformation.tablemodelnames),
+                                        SQLManager.instance().get_write_transaction_lock(),
+                                        SQLManager.instance().get_write_transaction_owner(), child_connection),
+                                  name="wopmars-" + self.__rule_name)
+        time_unix_ms, start = get_current_time()
+        process.start()
+        child_connection.close()
+        # poll waits forever if there is no timeout
+        if not parent_connection.poll(self.__timeout_secs):
+            Logger.instance().error("Rule {} has exceeded its timeout of {} seconds. Stopping it..."
+                                    .format(self.__rule_name, self.__timeout_secs))
+            ToolWrapperThread.stop_child_process(process)
+            time_unix_ms, stop = get_current_time()
+            status = "TIMEOUT"
+            error = "The rule has exceeded its timeout of {} seconds.".format(self.__timeout_secs)
+            peak_rss_kb = None
+        else:
+            try:
+                start, stop, status, error, peak_rss_kb = parent_connection.recv()
+            except EOFError:
+                # the child process has died without sending anything: killed by a signal, a limit or a crash
+                time_unix_ms, stop = get_current_time()
+                status = "ERROR"
+                error = "The process executing the rule has exited unexpectedly."
+                peak_rss_kb = None
+        process.join()
+        parent_connection.close()
+        if status == "ERROR" and process.exitcode:
+            error += " Exit code: " + str(process.exitcode)
+        self.__execution_infos = (start, stop, status, process.exitcode, peak_rss_kb)
+        if error is not None:
+            self.__exception = WopMarsException("Error while executing rule " + str(self.__rule_name) +
+                                                " (ToolWrapper " + str(self.__tool_python_path) + ")",
+                                                "Full stack trace: \n" + error)
+
+    @staticmethod
+    def stop_child_process(process):
+        """
+        Stop the child process executing a rule which has exceeded its timeout.
+
+        SIGTERM is sent to the process group of the child, so that the commands started by the tool_wrapper are stopped
+        too, and the child rolls back its session. If it is still alive after STOP_GRACE_SECS, it is killed and the
+        write_transaction_lock it may hold is released.
+
+        :param process: The child process
+        :type process: multiprocessing.Process
+        """
+        for kill in (False, True):
+            try:
+                os.killpg(process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+            except (AttributeError, OSError):
+                # no process group (not POSIX or the child has not created it yet): only signal the child
+                if kill:
+                    process.kill()
+                else:
+                    process.terminate()
+            process.join(ToolWrapperThread.STOP_GRACE_SECS)
+            if not process.is_alive():
+                break
+        SQLManager.instance().release_write_transaction_of(process.pid)
+
+    @staticmethod
+    def raise_timeout(signum, frame):
+        """
+        SIGTERM handler of the child process: interrupt the tool_wrapper so that its session is rolled back.
+        """
+        raise TimeoutError("The rule has been stopped.")
+
+    @staticmethod
+    def run_child_process(options, tool_wrapper_module, tool_wrapper_id, model_names, write_transaction_lock,
+                          write_transaction_owner, connection):
+        """
+        Entry-point of the child process executing a tool_wrapper (--executor process or rule with a timeout).
+
+        The OptionManager and the SQLManager singletons of the child process are set up from the ones of the parent,
+        the tool_wrapper is loaded from the database, executed and the informations of the execution are sent back.
+
+        The child process leads its own process group and is interrupted by SIGTERM when it has to stop. The
+        "--rule-memory-limit" and "--rule-cpu-limit" options are applied to it before the tool_wrapper is executed.
+
+        :param options: The content of the OptionManager of the parent process
+        :type options: dict
+        :param tool_wrapper_module: The module of the class of the tool_wrapper, needed to map its polymorphic class
+        :type tool_wrapper_module: str
+        :param tool_wrapper_id: The id of the tool_wrapper in the database
+        :type tool_wrapper_id: int
+        :param model_names: The models used in the workflow
+        :type model_names: set(str)
+        :param write_transaction_lock: The write_transaction_lock of the SQLManager of the parent process
+        :type write_transaction_lock: multiprocessing.Lock
+        :param write_transaction_owner: The write_transaction_owner of the SQLManager of the parent process
+        :type write_transaction_owner: multiprocessing.Value
+        :param connection: The connection receiving (start, stop, status, error, peak_rss_kb)
+        :type connection: multiprocessing.connection.Connection
+        """
+        if hasattr(os, "setpgrp"):
+            os.setpgrp()
+        signal.signal(signal.SIGTERM, ToolWrapperThread.raise_timeout)
+        OptionManager.instance().update(options)
+        SQLManager.instance().set_write_transaction_lock(write_transaction_lock, write_transaction_owner)
+        wopmars_session = SQLManager.instance().get_session()
+        time_unix_ms, start = get_current_time()
+        status = "EXECUTED"
+        error = None
+        try:
+            TableInputOutputInformation.tablemodelnames.update(model_names)
+            TableInputOutputInformation.import_models(model_names)
+            importlib.import_module(tool_wrapper_module)
+            tool_wrapper = wopmars_session.query(ToolWrapper).filter(ToolWrapper.id == tool_wrapper_id).one()
+            tool_wrapper.session = wopmars_session
+            Logger.instance().info("\n" + str(tool_wrapper) + "\n" + "command line: \n\t" +
+                                   ToolWrapperThread(tool_wrapper).get_command_line())
+            ToolWrapperThread.set_resource_limits(OptionManager.instance()["--rule-memory-limit"],
+                                                  OptionManager.instance()["--rule-cpu-limit"])
+            ToolWrapperThread.execute(tool_wrapper, wopmars_session)
+        except Exception:
+            wopmars_session.rollback()
+            status = "ERROR"
+            error = str(traceback.format_exc())
         finally:
-            # todo twthread , fermer session
-            # session_tw.close()
-            pass
-        self.fire_success()
+            wopmars_session.close()
+        time_unix_ms, stop = get_current_time()
+        connection.send((start, stop, status, error, ToolWrapperThread.get_peak_rss_kb()))
+        connection.close()
+
+    @staticmethod
+    def set_resource_limits(memory_limit_mb, cpu_limit_secs):
+        """
+        Limit the address space (RLIMIT_AS) and the CPU time (RLIMIT_CPU) of the current process and of the commands it
+        starts.
+
+        A process exceeding its memory limit gets MemoryError or fails to allocate, a process exceeding its CPU limit
+        is killed by SIGXCPU.
+
+        :param memory_limit_mb: The maximum address space in megabytes, or None
+        :type memory_limit_mb: int
+        :param cpu_limit_secs: The maximum CPU time in seconds, or None
+        :type cpu_limit_secs: int
+        :raises WopMarsException: The limits are not supported on this platform
+        """
+        if memory_limit_mb is None and cpu_limit_secs is None:
+            return
+        if resource is None:
+            raise WopMarsException("Error while limiting the rule",
+                                   "The resource limits are not supported on the platform " + sys.platform)
+        if memory_limit_mb is not None:
+            soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (int(memory_limit_mb) * 1024 * 1024, hard))
+        if cpu_limit_secs is not None:
+            soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_limit_secs), hard))
+
+    @staticmethod
+    def get_peak_rss_kb():
+        """
+        Return the peak resident set size of the current process and of the commands it has started, in kilobytes.
+
+        :return: int or None if it is not available on this platform
+        """
+        if resource is None:
+            return None
+        peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        # ru_maxrss is given in bytes on macOS
+        if sys.platform == "darwin":
+            peak_rss //= 1024
+        return peak_rss
+
+    @staticmethod
+    def execute(tool_wrapper, wopmars_session):
+        """
+        Create the output directories of the tool_wrapper, run it (or touch its outputs) and commit its work.
+
+        :param tool_wrapper: The ToolWrapper to execute
+        :type tool_wrapper: :class:`~.wopmars.models.ToolWrapper.ToolWrapper`
+        :param wopmars_session: The session of the current thread
+        :type wopmars_session: :class:`~.wopmars.WopmarsSession.WopmarsSession`
+        """
+        # if OptionManager.instance()["--touch"]:  # dry run
+        #     Logger.instance().debug("Touch mode enabled.")
+        #     self.__tool_wrapper.touch()
+        Logger.instance().info("ToolWrapper: " + str(tool_wrapper.rule_name) + " -> "
+                               + tool_wrapper.__class__.__name__ + " started.")
+        output_file_fields = tool_wrapper.specify_output_file()
+        for out_field in output_file_fields:
+            out_file_path = tool_wrapper.output_file(out_field)
+            out_dir = os.path.dirname(out_file_path)
+            pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+        ################################################################################################################
+        #
+        # Touch output files of tool wrapper
+        #
+        ################################################################################################################
+
+        if OptionManager.instance()["--touch"]:  # Just touch
+            tool_wrapper.touch()
+
+        ################################################################################################################
+        #
+        # Normal run of tool wrapper
+        #
+        ################################################################################################################
+
+        else:  # Run
+            tool_wrapper.run()
+        wopmars_session.commit()
+
+    def set_execution_infos(self, start=None, stop=None, status=None):
+        """
+        Keep the informations relative to the execution of the tool_wrapper for the WorkflowManager.
+
+        The ToolWrapper itself is not modified: the WorkflowManager records the informations in its BookkeepingJournal
+        so that no session holds the database while the rules are running.
+
+        :param start: The start time of the execution
+        :param stop: The stop time of the execution
+        :param status: The status of the execution
+        """
+        # the exit code and the peak RSS are only known for the rules executed in a child process
+        self.__execution_infos = (start, stop, status, None, None)
 
-    def get_command_line(self):
+    def get_command_line(self, tool_wrapper=None):
         """
         This create a string containing the command line for executing the tool_python_path only.
 
+        :param tool_wrapper: The ToolWrapper to describe, by default the one of this ToolWrapperThread
+        :type tool_wrapper: :class:`~.wopmars.models.ToolWrapper.ToolWrapper`
         :return: The string containg the command line
         """
-        list_str_inputs_files = [f.file_key + "': '" + f.path for f in self.__tool_wrapper.relation_toolwrapper_to_fileioinfo if f.relation_file_or_tableioinfo_to_typeio.is_input == 1]
-        list_str_inputs_tables = [t.table_key + "': '" + t.model_py_path for t in self.__tool_wrapper.relation_toolwrapper_to_tableioinfo if t.relation_file_or_tableioinfo_to_typeio.is_input == 1]
+        if tool_wrapper is None:
+            tool_wrapper = self.__tool_wrapper
+        list_str_inputs_files = [f.file_key + "': '" + f.path for f in tool_wrapper.relation_toolwrapper_to_fileioinfo if f.relation_file_or_tableioinfo_to_typeio.is_input == 1]
+        list_str_inputs_tables = [t.table_key + "': '" + t.model_py_path for t in tool_wrapper.relation_toolwrapper_to_tableioinfo if t.relation_file_or_tableioinfo_to_typeio.is_input == 1]
         str_input_dict = ""
         str_input_dict_files = ""
         str_input_dict_tables = ""
@@ -136,8 +435,8 @@ class ToolWrapperThread(threading.Thread, Observable):
         if list_str_inputs_files or list_str_inputs_tables:
             str_input_dict = " -i \"{%s}\"" % (", ".join([s for s in [str_input_dict_files, str_input_dict_tables] if s != ""]))
 
-        list_str_outputs_files = [f.file_key + "': '" + f.path for f in self.__tool_wrapper.relation_toolwrapper_to_fileioinfo if f.relation_file_or_tableioinfo_to_typeio.is_input == 0]
-        list_str_outputs_tables = [t.table_key + "': '" + t.model_py_path for t in self.__tool_wrapper.relation_toolwrapper_to_tableioinfo if t.relation_file_or_tableioinfo_to_typeio.is_input == 0]
+        list_str_outputs_files = [f.file_key + "': '" + f.path for f in tool_wrapper.relation_toolwrapper_to_fileioinfo if f.relation_file_or_tableioinfo_to_typeio.is_input == 0]
+        list_str_outputs_tables = [t.table_key + "': '" + t.model_py_path for t in tool_wrapper.relation_toolwrapper_to_tableioinfo if t.relation_file_or_tableioinfo_to_typeio.is_input == 0]
         str_output_dict = ""
         str_output_dict_files = ""
         str_output_dict_tables = ""
@@ -157,7 +456,7 @@ class ToolWrapperThread(threading.Thread, Observable):
 
         consistent_keys = ["--forceall", "--dot", "--log", ]
         s = ""
-        s += "wopmars tool " + self.__tool_wrapper.tool_python_path + str_input_dict + str_output_dict + str_params_dict + " " + \
+        s += "wopmars tool " + tool_wrapper.tool_python_path + str_input_dict + str_output_dict + str_params_dict + " " + \
              " ".join(str(key) + " " + str(OptionManager.instance()[key]) for key in OptionManager.instance().keys() if key in consistent_keys and OptionManager.instance()[key] is not None and type(OptionManager.instance()[key]) != bool) + \
              " " + " ".join(str(key) for key in OptionManager.instance().keys() if key in consistent_keys and OptionManager.instance()[key] is True and type(OptionManager.instance()[key]) == bool)
 
@@ -203,4 +502,5 @@ class ToolWrapperThread(threading.Thread, Observable):
         return self.__tool_wrapper == other.get_toolwrapper()
 
     def __hash__(self):
-        return id(self)
+        # two ToolWrapperThreads wrapping the same tool_wrapper are the same element of the UniqueQueue
+        return hash(self.__tool_wrapper)
@@ -26,8 +26,11 @@ class WopmarsSession:
     def commit(self):
         """
         Validate changes on the database. Should be used when everything is ok.
+
+        The statements given to :meth:`~.wopmars.WopmarsSession.WopmarsSession.execute` do not appear in the session but
+        they have taken the write transaction: it is committed too.
         """
-        if self.something():
+        if self.something() or self.__session.info.get("wopmars_write_transaction"):
             Logger.instance().debug(str(self.__session) + " is about to commit.")
             Logger.instance().debug("Operations to be commited in session" + str(self.__session) + ": \n\tUpdates:\n\t\t" +
                                     "\n\t\t".join([str(k) for k in self.__session.dirty]) +
@@ -48,14 +51,14 @@ class WopmarsSession:
         # call on SQLManager commit method to use the lock
         self.__manager.rollback(self.__session)
 
-    def query(self, table):
+    def query(self, *entities):
         """
         Return a WopmarsQuery used for querying database using the ORM.
 
-        :param table: The mapper object on which you want to query.
+        :param entities: The mapper objects or columns on which you want to query.
         :return: WopmarsQuery on the desired table and bind to the current session.
         """
-        return WopmarsQuery(table, session=self.__session)
+        return WopmarsQuery(entities, session=self.__session)
 
     def add(self, item):
         """
@@ -81,6 +84,14 @@ class WopmarsSession:
         """
         self.__session.delete(entry)
 
+    def expire(self, entry):
+        """
+        Expire the attributes of an entry: they are read again from the database at their next access.
+
+        :param entry: A mapper object already existent in the database.
+        """
+        self.__session.expire(entry)
+
     def delete_content(self, table):
         """
         Delete the content of a given table.
@@ -1,17 +1,25 @@
+import queue
 import sys
 
+import networkx as nx
+from sqlalchemy.sql.functions import func
+
+from wopmars.BookkeepingJournal import BookkeepingJournal
 from wopmars.SQLManager import SQLManager
 from wopmars.models.Execution import Execution
 from wopmars.models.TableInputOutputInformation import TableInputOutputInformation
+from wopmars.models.TableModificationTime import TableModificationTime
 from wopmars.models.ToolWrapper import ToolWrapper
 from wopmars.models.TypeInputOrOutput import TypeInputOrOutput
 from wopmars.DAG import DAG
 from wopmars.ToolWrapperThread import ToolWrapperThread
 from wopmars.ToolWrapperObserver import ToolWrapperObserver
 from wopmars.Parser import Parser
+from wopmars.utils.DictUtils import DictUtils
 from wopmars.utils.Logger import Logger
 from wopmars.utils.OptionManager import OptionManager
-from wopmars.utils.UniqueQueue import UniqueQueue
+from wopmars.utils.StatCache import StatCache
+from wopmars.utils.UniquePriorityQueue import UniquePriorityQueue
 from wopmars.utils.WopMarsException import WopMarsException
 from wopmars.utils.various import get_current_time
 
@@ -30,14 +38,25 @@ class WorkflowManager(ToolWrapperObserver):
     4- Each node is wrapped inside a :class:`~.wopmars.framework.management.ToolWrapperThread.ToolWrapperThread` object which will be added to the queue.
     5- Each ToolWrapperThread is executed (ordered) as follows:
 
-      a- If the inputs are ready: they are executed.
-      b- If not, they are put in the buffer.
+      a- If the inputs are ready, less than "--jobs" rules are running and the resources they need are available
+      (option "--resources"): they are executed. With "--jobs" greater than 1, they are started in their own thread.
+      b- If the resources are not available, they wait in the queue.
+      c- If the inputs are not ready, they are put in the buffer.
 
     6- When the :class:`~.wopmars.framework.management.ToolWrapperThread.ToolWrapperThread` has finished its execution, a notification of success is sent.
+    The notification puts the ToolWrapperThread in the queue of finished threads which is read by the WorkflowManager.
+    With the "--keep-going" option, a notification of failure is handled the same way but the successors of the failed
+    ToolWrapper are never put in the queue.
     7- The method :meth:`~wopmars.framework.management.WorkflowManager.WorkflowManager.execute_from` is called again with the succeeded ToolWrapper as argument.
     8- Loop to the 3rd step
     9- When the DAG is finished, the software exits
 
+    The state of the inputs and the execution informations of the tools are not committed by the WorkflowManager: they
+    are recorded in a :class:`~.wopmars.BookkeepingJournal.BookkeepingJournal` which writes them from its own thread.
+
+    The steps 3 to 8 are the iterations of the loop of :meth:`~wopmars.framework.management.WorkflowManager.WorkflowManager.run_queue`:
+    the stack does not grow with the number of executed rules.
+
     Every exception or error are raised to the top level of the software through WopMarsException with
     a String explaining the context and details about the exception.
     """    
@@ -45,22 +64,47 @@ class WorkflowManager(ToolWrapperObserver):
         """
         The parser will give the DAG which will be executed.
         The queue_exec is the Thread pool. It will contains the tool threads that will wait for being executed. Each tool
-        should appear only once in the queue.
-        The list_queue_buffer will be filled with the tool threads that the WorkflowManager couldn't execute.
+        should appear only once in the queue. The tools on the longest remaining path of the dag are taken first.
+        The list_queue_buffer will be filled with the tool threads that the WorkflowManager couldn't execute because
+        their inputs are not ready.
+        The critical_path_lengths gives for each node of the dag_to_exec the expected duration of the longest path from
+        this node to the end of the dag. It is the priority of the node in the queue.
+        The resources_limits gives the quantities of resources available (option "--resources"), resources_needed gives
+        for each node of the dag_to_exec the quantities of the limited resources it needs and resources_in_use, the
+        quantities used by the running tools.
+        The count_predecessors gives for each node of the dag_to_exec the number of its predecessors that have not been
+        executed yet. A node is put in the queue when it reaches 0.
+        The run_plan gives for each node of the dag_to_exec True if it needs to be executed, as decided before the
+        execution by :meth:`~.wopmars.WorkflowManager.WorkflowManager.get_run_plan`.
         The count_exec is a counter that keep trace of the number of tools that are currently executed.
+        The queue_finished receives the ToolWrapperThreads that have finished, possibly from other threads.
+        The list_failed contains the ToolWrappers that have failed, with the "--keep-going" option.
+        The jobs is the maximum number of tools executed at the same time.
         The dag_tools will contain the dag representing the workflow.
         The dag_to_exec is basically the same dag than dag_tools or a subgraph depending on the options --since or --until
         given by the user.
         The session is used to get back the session without calling again SQLManager.
+        The journal writes the state of the inputs and the execution informations of the tools in the database, from
+        its own thread, while the tools are running.
         """
         self.__parser = Parser()
-        self.__queue_exec = UniqueQueue()
+        self.__queue_exec = UniquePriorityQueue(priority=self.get_priority)
         self.__list_queue_buffer = []
         self.__count_exec = 0
+        self.__queue_finished = queue.Queue()
+        self.__list_failed = []
+        self.__jobs = int(OptionManager.instance()["--jobs"])
         self.__dag_tools = None
         self.__dag_to_exec = None
         self.__already_runned = set()
+        self.__critical_path_lengths = {}
+        self.__resources_limits = {}
+        self.__resources_needed = {}
+        self.__resources_in_use = {}
+        self.__count_predecessors = {}
+        self.__run_plan = {}
         self.__session = SQLManager.instance().get_session()
+        self.__journal = BookkeepingJournal()
 
     def run(self):
         """
@@ -70,11 +114,14 @@ class WorkflowManager(ToolWrapperObserver):
 
         The dag is taken thanks to the :meth:`~.wopmars.framework.parsing.Parser.Parser.parse` method of the parser. And then pruned by the :meth:`~.wopmars.framework.management.WorkflowManager.WorkflowManager.get_dag_to_exec` method
         which will set the right DAG to be executed.
-        Then, :meth:`~.wopmars.framework.management.WorkflowManager.WorkflowManager.execute_from` is called with no argument to get the origin nodes.
+        Then, :meth:`~.wopmars.framework.management.WorkflowManager.WorkflowManager.execute_from` is called with no argument to get the origin nodes
+        and :meth:`~.wopmars.framework.management.WorkflowManager.WorkflowManager.run_queue` executes the dag.
         """
 
         # This create_all is supposed to only create workflow-management side models (called "wom_*")
         SQLManager.instance().create_all()
+        # The files are stat-ed once during the execution: forget those of a previous execution
+        StatCache.instance().clear()
 
         # if OptionManager.instance()["--cleanup-metadata"]:
         #     Logger.instance().info("Deleting WoPMaRS history...")
@@ -91,8 +138,18 @@ class WorkflowManager(ToolWrapperObserver):
         # Aitor has removed this command that removed everything before forceall
         # if OptionManager.instance()["--forceall"] and not OptionManager.instance()["--dry-run"]:
         #     self.erase_output()
+        # Order the ready rules by the expected duration of their longest remaining path
+        self.__critical_path_lengths = self.__dag_to_exec.get_critical_path_lengths(self.get_expected_run_durations())
+        if OptionManager.instance()["--resources"] is not None:
+            self.__resources_limits = DictUtils.str_to_dict(OptionManager.instance()["--resources"])
+        self.__resources_needed = self.get_resources_needed()
         # Start the execution at the root nodes
+        self.__count_predecessors = dict(self.__dag_to_exec.in_degree())
+        # Decide which rules need to be executed before starting
+        self.__run_plan = self.get_run_plan()
+        self.__journal.start()
         self.execute_from()
+        self.run_queue()
 
     def get_dag_to_exec(self):
         """
@@ -146,24 +203,28 @@ class WorkflowManager(ToolWrapperObserver):
 
         self.__session.commit()
 
-    def execute_from(self, tw=None):
+    def execute_from(self, tw_from=None):
         """
-        Execute the dag from the toolwrappers in the list given.
+        Put in the queue the successors of the given ToolWrapper which have no more predecessors to wait for.
 
-        The next nodes are taken thanks to the "successors()" method of the DAG and are put into the queue.
-        The "run_queue()" is then called.
+        The next nodes are taken thanks to the "successors()" method of the DAG. Their count of predecessors not
+        executed yet is decremented and those reaching 0 are put into the queue, which is executed by "run_queue()".
 
         A trace of the already_runned ToolWrapper objects is kept in order to avoid duplicate execution.
 
-        :param node: A node of the DAG or None, if it needs to be executed from the root.
-        :type node: :class:`~.wopmars.framework.database.models.ToolWrapper.ToolWrapper`
+        :param tw_from: A node of the DAG which has just been executed or None, if it needs to be executed from the root.
+        :type tw_from: :class:`~.wopmars.framework.database.models.ToolWrapper.ToolWrapper`
         :return: void
         """
         # the first list will be the root nodes
-        list_tw = self.__dag_to_exec.successors(tw)
+        list_tw = self.__dag_to_exec.successors(tw_from)
         Logger.instance().debug("Next tools: " + str([t.__class__.__name__ for t in list_tw]))
 
         for tw in list_tw:
+            if tw_from is not None:
+                self.__count_predecessors[tw] -= 1
+                if self.__count_predecessors[tw] > 0:
+                    continue
             # every rule should be executed once and only once
             if tw not in self.__already_runned:
                 # ToolWrapperThread object is a thread ready to start
@@ -172,149 +233,165 @@ class WorkflowManager(ToolWrapperObserver):
                 Logger.instance().debug("ToolWrapper: " + tw.rule_name +
                                         " -> " + tw.tool_python_path +
                                         " has already been executed. Pass.")
-        self.run_queue()
 
     def run_queue(self):
         """
         Call start() method of all elements of the queue.
 
-        The tools inside the queue are taken then their inputs are checked. If they are ready, the tools are started.
-        If not, they are put in a buffer list of "not ready tools" or "ready but has not necessary ressources available
-        tools".
+        The tools inside the queue have all their predecessors executed. They are taken while less than "--jobs" tools
+        are running. A tool needing resources used by the running tools is put back in the queue. Then, the inputs are
+        checked. If they are ready, the tools are started. If not, they are put in a buffer list of "not ready tools".
 
         The start method is called with a dry argument, if it appears that the input of the ToolWrapper are the same
         than in a previous execution, and that the output are already ready. The dry parameter is set to True and the
         start method will only simulate the execution.
 
         After that, the code check for the state of the workflow and gather the informations to see if the workflow
-        is finished, if it encounter an error or if it is currently running.
+        is finished, if it encounter an error or if it is currently running. If tools are running, it waits for one of
+        them to finish, puts its successors in the queue and loops.
 
         :raises WopMarsException: The workflow encounter a problem and must stop.
         """
 
-        #
-        # # toTODO LucG THIS METHOD IS NOT THREAD-SAFE (peut etre que si, à voir)
-        #
-
-        ################################################################################################################
-        #
-        # Main while
-        # If no tools have been added to the queue:
-        #  - All tools have been executed and the queue is empty, so nothing happens
-        #  - There were remaining tools in the queue but they weren't ready, so they are tested again
-        #
-        ################################################################################################################
-
-        while not self.__queue_exec.empty():
-            Logger.instance().debug("Queue size: " + str(self.__queue_exec.qsize()))
-            Logger.instance().debug("Queue content: " + str(["rule: " + tt.get_toolwrapper().rule_name + "->" +
-                                                             tt.get_toolwrapper().tool_python_path for tt in self.__queue_exec.get_queue_tuple()]))
-
-            ############################################################################################################
+        while True:
+            ####################################################################################################################
             #
-            # get the first element of the queue to execute
+            # Main while
+            # If no tools have been added to the queue:
+            #  - All tools have been executed and the queue is empty, so nothing happens
+            #  - There were remaining tools in the queue but all the jobs are busy, they wait in the queue
             #
-            ############################################################################################################
+            ####################################################################################################################
 
-            tool_wrapper_thread = self.__queue_exec.get()
-            tool_wrapper = tool_wrapper_thread.get_toolwrapper()
+            list_waiting_resources = []
+            while not self.__queue_exec.empty() and self.__count_exec < self.__jobs:
+                Logger.instance().debug("Queue size: " + str(self.__queue_exec.qsize()))
 
-            Logger.instance().debug("Current rule: " + tool_wrapper.rule_name + "->" + tool_wrapper.tool_python_path)
-            # check if the predecessors of a rule have been already executed: a rule shouldn't be executed if
-            # its predecessors have not been executed yet
-            if not self.all_predecessors_have_run(tool_wrapper):
-               Logger.instance().debug("Predecessors of rule: " + tool_wrapper.rule_name + " have not been executed yet.")
+                ####################################################################################################################
+                #
+                # get the first element of the queue to execute
+                #
+                ####################################################################################################################
 
-            ############################################################################################################
-            #
-            # Ready for running, either inputs are ready or dry-run mode is enabled
-            #
-            ############################################################################################################
+                tool_wrapper_thread = self.__queue_exec.get()
+                tool_wrapper = tool_wrapper_thread.get_toolwrapper()
 
-            elif tool_wrapper.are_inputs_ready() or OptionManager.instance()["--dry-run"]:
-                # the state of inputs (table and file) are set in the db here.
-                tool_wrapper.set_args_time_and_size(1)
-                Logger.instance().debug("ToolWrapper ready: " + tool_wrapper.tool_python_path)
-                dry = False
+                Logger.instance().debug("Current rule: " + tool_wrapper.rule_name + "->" + tool_wrapper.tool_python_path)
 
-                ############################################################################################################
+                ####################################################################################################################
                 #
-                # Will set to dry (ie. will not execute) if all these conditions are true
-                # - not in forceall mode
-                # - tool already executed previously
-                # - some predecessors of this tool wrapper has not been executed
+                # The resources needed are used by running tools: wait in the queue for a running tool to finish
                 #
-                ############################################################################################################
-
-                # check if the actual execution of the tool_python_path is necessary
-                # every predecessors of the tool_python_path have to be executed (or simulated)
-                # will not execute and set to dry if all these options
-
-                if not OptionManager.instance()["--forceall"] and not OptionManager.instance()["--touch"]:  # if not in forceall option
-                    if self.is_this_tool_wrapper_already_executed(tool_wrapper):  # this tool wrapper already executed
-                        # some predecessors of this tool wrapper has not been executed
-                        if not bool([tool_wrapper_predecessor for tool_wrapper_predecessor
-                                     in self.__dag_to_exec.predecessors(tool_wrapper)
-                                     if tool_wrapper_predecessor.status != "EXECUTED"
-                                        and tool_wrapper_predecessor.status != "ALREADY_EXECUTED"]):
+                ####################################################################################################################
+
+                if not self.are_resources_available(tool_wrapper):
+                    Logger.instance().debug("ToolWrapper waiting for resources: rule: " + tool_wrapper.rule_name + " -> " +
+                                            str(tool_wrapper.tool_python_path))
+                    list_waiting_resources.append(tool_wrapper_thread)
+
+                ####################################################################################################################
+                #
+                # Ready for running, either inputs are ready or dry-run mode is enabled
+                #
+                ####################################################################################################################
+
+                elif tool_wrapper.are_inputs_ready() or OptionManager.instance()["--dry-run"]:
+                    # the state of inputs (table and file) are written in the db by the journal.
+                    self.__journal.record(tool_wrapper.get_args_time_and_size(1))
+                    Logger.instance().debug("ToolWrapper ready: " + tool_wrapper.tool_python_path)
+                    dry = False
+
+                    ####################################################################################################################
+                    #
+                    # Will set to dry (ie. will not execute) if all these conditions are true
+                    # - not in forceall mode
+                    # - tool already executed previously
+                    # - some predecessors of this tool wrapper has not been executed
+                    #
+                    ####################################################################################################################
+
+                    # check if the actual execution of the tool_python_path is necessary
+                    # every predecessors of the tool_python_path have to be executed (or simulated)
+                    # will not execute and set to dry if all these options
+
+                    if not OptionManager.instance()["--forceall"] and not OptionManager.instance()["--touch"]:  # if not in forceall option
+                        if self.__run_plan.get(tool_wrapper) is False:
+                            # the run plan has found that neither this tool wrapper nor its predecessors need to be executed
+                            dry = True
+                        elif self.is_this_tool_wrapper_already_executed(tool_wrapper):  # this tool wrapper already executed
+                            # some predecessors of this tool wrapper has not been executed
+                            if not bool([tool_wrapper_predecessor for tool_wrapper_predecessor
+                                         in self.__dag_to_exec.predecessors(tool_wrapper)
+                                         if tool_wrapper_predecessor.status != "EXECUTED"
+                                            and tool_wrapper_predecessor.status != "ALREADY_EXECUTED"]):
+                                dry = True
+                        if dry:
                             Logger.instance().info("ToolWrapper: {} -> {} seems to have already been run with same parameters."
                                                    .format(tool_wrapper.rule_name, tool_wrapper.tool_python_path))
-                            dry = True
 
-                # totodo lucg twthread verification des resources
-                tool_wrapper_thread.subscribe(self)
-                self.__count_exec += 1
-                # totodo lucg twthread methode start
-                tool_wrapper_thread.set_dry(dry)
-                try:
-                    # be careful here: the execution of the toolthreads is recursive meaning that calls to function may
-                    # be stacked (run -> notify success -> run(next tool) -> notify success(next tool) -> etc....
-                    # totodo lucg twthread methode start
-                    tool_wrapper_thread.run()
-                except Exception as e:
-                    # as mentioned above, there may be recursive calls to this function, so every exception can
-                    # pass here multiple times: this attribute is used for recognizing exception that have already been
-                    # caught
-                    if not hasattr(e, "teb_already_seen"):
-                        setattr(e, "teb_already_seen", True)
-                        tool_wrapper.set_execution_infos(status="ERROR")
-                        self.__session.add(tool_wrapper)
-                        self.__session.commit()
-                    raise e
-            else:
-                Logger.instance().debug("ToolWrapper not ready: rule: " + tool_wrapper.rule_name + " -> " + str(tool_wrapper.tool_python_path))
-                # The buffer contains the ToolWrappers that have inputs which are not ready yet.
-                self.__list_queue_buffer.append(tool_wrapper_thread)
-
-        Logger.instance().debug("Buffer: " + str(["rule: " + t.get_toolwrapper().rule_name + "->" +
-                                                  t.get_toolwrapper().tool_python_path for t in self.__list_queue_buffer]))
-        Logger.instance().debug("Running rules: " + str(self.__count_exec))
-
-        # There is no more ToolWrapper that are waiting to be executed.
-        # Is there some tools that are currently being executed?
-        if self.__count_exec == 0:
-            # Is there some tools that weren't ready?
-            finish_epoch_millis_unix_ms, finish_epoch_millis_datetime = get_current_time()
-            if len(self.__list_queue_buffer) == 0:
-                # If there is no tool waiting and no tool being executed, the workflow has finished.
-                # finished_at = finish_epoch_millis_unix_ms
-                # finished_at_strftime = datetime.datetime.fromtimestamp(finished_at/1000).strftime('%Y-%m-%d %H:%M:%S')
-                Logger.instance().info("The workflow has completed. Finished at: {}".format(finish_epoch_millis_datetime))
-                self.set_finishing_informations(finish_epoch_millis_datetime, "FINISHED")
-                SQLManager.instance().get_session().close()
-                sys.exit(0)
-            # uniquement en environnement multiThreadpredece
-            elif not self.check_buffer():
-                # If there is no tool being executed but there is that are waiting something, the workflow has an issue
-                # finished_at = time_unix_ms()
-                tw_list = [t.get_toolwrapper() for t in self.__list_queue_buffer]
-                if len(tw_list) > 0:
-                    input_files_not_ready = tw_list[0].get_input_files_not_ready()
-                    self.set_finishing_informations(finish_epoch_millis_datetime, "ERROR")
+                    tool_wrapper_thread.subscribe(self)
+                    self.__count_exec += 1
+                    self.acquire_resources(tool_wrapper)
+                    tool_wrapper_thread.set_dry(dry)
+                    # skipped and simulated tools do nothing, they are not worth a thread
+                    if self.__jobs > 1 and not dry and not OptionManager.instance()["--dry-run"]:
+                        tool_wrapper_thread.start()
+                    else:
+                        if not dry and not OptionManager.instance()["--dry-run"]:
+                            # the tool commits in the session of the WorkflowManager: the journal must be written first
+                            self.__journal.flush()
+                        tool_wrapper_thread.run()
+                else:
+                    Logger.instance().debug("ToolWrapper not ready: rule: " + tool_wrapper.rule_name + " -> " + str(tool_wrapper.tool_python_path))
+                    # The buffer contains the ToolWrappers that have inputs which are not ready yet.
+                    self.__list_queue_buffer.append(tool_wrapper_thread)
+
+            for tool_wrapper_thread in list_waiting_resources:
+                self.__queue_exec.put(tool_wrapper_thread)
+
+            Logger.instance().debug("Buffer: " + str(["rule: " + t.get_toolwrapper().rule_name + "->" +
+                                                      t.get_toolwrapper().tool_python_path for t in self.__list_queue_buffer]))
+            Logger.instance().debug("Running rules: " + str(self.__count_exec))
+
+            # There is no more ToolWrapper that are waiting to be executed.
+            # Is there some tools that are currently being executed?
+            if self.__count_exec == 0:
+                # Is there some tools that weren't ready?
+                finish_epoch_millis_unix_ms, finish_epoch_millis_datetime = get_current_time()
+                if len(self.__list_queue_buffer) == 0 and self.__list_failed:
+                    # With --keep-going, every rule not depending on a failed rule has been executed. The ERROR is
+                    # recorded by the caller, as for the other failures
+                    list_not_executed = [tw.rule_name for tw in self.__dag_to_exec.nodes()
+                                         if tw not in self.__already_runned and tw not in self.__list_failed]
                     raise WopMarsException("The workflow has failed.",
-                                           " The inputs '{}' have failed for this tool '{}'"
-                                           .format(input_files_not_ready[0], tw_list[0].rule_name))
-            # If there is one tool that is ready, it means that it is in queue because ressources weren't available.
+                                           " The rules '{}' have failed. The rules depending on them have not been"
+                                           " executed: '{}'".format("', '".join(tw.rule_name for tw in self.__list_failed),
+                                                                    "', '".join(list_not_executed)))
+                elif len(self.__list_queue_buffer) == 0:
+                    # If there is no tool waiting and no tool being executed, the workflow has finished.
+                    # finished_at = finish_epoch_millis_unix_ms
+                    # finished_at_strftime = datetime.datetime.fromtimestamp(finished_at/1000).strftime('%Y-%m-%d %H:%M:%S')
+                    Logger.instance().info("The workflow has completed. Finished at: {}".format(finish_epoch_millis_datetime))
+                    self.set_finishing_informations(finish_epoch_millis_datetime, "FINISHED")
+                    SQLManager.instance().get_session().close()
+                    sys.exit(0)
+                # uniquement en environnement multiThreadpredece
+                elif not self.check_buffer():
+                    # If there is no tool being executed but there is that are waiting something, the workflow has an issue
+                    # finished_at = time_unix_ms()
+                    tw_list = [t.get_toolwrapper() for t in self.__list_queue_buffer]
+                    if len(tw_list) > 0:
+                        input_files_not_ready = tw_list[0].get_input_files_not_ready()
+                        self.set_finishing_informations(finish_epoch_millis_datetime, "ERROR")
+                        raise WopMarsException("The workflow has failed.",
+                                               " The inputs '{}' have failed for this tool '{}'"
+                                               .format(input_files_not_ready[0], tw_list[0].rule_name))
+                # If there is one tool that is ready, it means that it is in queue because ressources weren't available.
+                else:
+                    return
+            else:
+                # wait for a running tool to finish: its successors are put in the queue for the next iteration
+                self.process_finished_tool_wrapper_thread(self.__queue_finished.get())
 
     def set_finishing_informations(self, finished_at, status):
         """
@@ -325,6 +402,8 @@ class WorkflowManager(ToolWrapperObserver):
         :param status: The final status of the workflow
         :type status: str
         """
+        # the bookkeeping of the tools must be in the database before counting their status
+        self.__journal.close()
 
         execution = self.__session.query(Execution).order_by(Execution.id.desc()).first()
 
@@ -370,12 +449,184 @@ class WorkflowManager(ToolWrapperObserver):
         else:  # not --dry-run, update finishing time
 
             if execution is not None:
+                self.share_options_and_resources(execution.id)
                 execution.finished_at = finished_at
                 execution.time = int((execution.finished_at - execution.started_at).total_seconds())
                 execution.status = status
                 self.__session.add(execution)
                 self.__session.commit()
 
+    def share_options_and_resources(self, execution_id):
+        """
+        Delete the options and resources of the rules executed again with the same signature than at their previous
+        execution: their definition_id points to the row still holding them.
+
+        This only deduplicates the options and resources, once the execution has finished. The rows of the rules,
+        with their options, resources, inputs and outputs, are still inserted when the workflow is read: the rules
+        executed in a child process read their options from their own row. The inputs and outputs of the rules are
+        kept: they store the modification time, size and checksum of the files of this execution. The rules skipped
+        because already executed or not executed are not changed: they are deleted by the clean up of the next
+        execution.
+
+        :param execution_id: The id of the execution
+        :type execution_id: int
+        """
+        rule_name_to_tool_wrapper = {tool_wrapper.rule_name: tool_wrapper for tool_wrapper in self.__dag_to_exec.nodes()
+                                     if tool_wrapper.id is not None and tool_wrapper.signature is not None
+                                     and tool_wrapper.status not in ("ALREADY_EXECUTED", "NOT_EXECUTED")}
+        if not rule_name_to_tool_wrapper:
+            return
+        # the previous execution of each rule
+        subquery_last_ids = self.__session.query(func.max(ToolWrapper.id))\
+            .filter(ToolWrapper.rule_name.in_(list(rule_name_to_tool_wrapper)))\
+            .filter(ToolWrapper.execution_id != execution_id)\
+            .group_by(ToolWrapper.rule_name)
+        list_previous = self.__session.query(ToolWrapper.rule_name, ToolWrapper.id, ToolWrapper.definition_id,
+                                             ToolWrapper.signature, ToolWrapper.status)\
+            .filter(ToolWrapper.id.in_(subquery_last_ids)).all()
+        count_shared = 0
+        for rule_name, previous_id, previous_definition_id, previous_signature, previous_status in list_previous:
+            tool_wrapper = rule_name_to_tool_wrapper[rule_name]
+            if previous_signature != tool_wrapper.signature:
+                continue
+            # the rows skipped or not executed are deleted by the clean up of the next execution: they never hold them
+            definition_id = previous_definition_id or (previous_id if previous_status == "EXECUTED" else None)
+            if definition_id is None:
+                continue
+            tool_wrapper.definition_id = definition_id
+            # the orphans are deleted with the flush
+            tool_wrapper.relation_toolwrapper_to_option.clear()
+            tool_wrapper.relation_toolwrapper_to_resource.clear()
+            self.__session.add(tool_wrapper)
+            count_shared += 1
+        Logger.instance().debug("{} rules share the options and resources of a previous execution."
+                                .format(count_shared))
+
+    def get_run_plan(self):
+        """
+        Decide, before the execution, which rules of the dag_to_exec need to be executed.
+
+        The files declared by the rules are stat-ed at once, in parallel, and the modification times of the tables are
+        loaded with one query. Then the dag is walked in topological order: a rule needs to be executed if one of its
+        predecessors needs to be executed, if its inputs are not ready or if it has not already been executed with the
+        same inputs. With the "--forceall" or "--touch" options, every rule is executed.
+
+        The rules having a predecessor to execute are checked again when they are ready: with the
+        "--rerun-trigger=checksum" option, the predecessor may rewrite their inputs with the same content.
+
+        :return: dict(ToolWrapper: bool) True if the rule needs to be executed
+        """
+        list_tool_wrappers = list(nx.topological_sort(self.__dag_to_exec))
+        if OptionManager.instance()["--forceall"] or OptionManager.instance()["--touch"]:
+            run_plan = dict.fromkeys(list_tool_wrappers, True)
+        else:
+            StatCache.instance().prefetch([f.path for tool_wrapper in list_tool_wrappers
+                                           for f in tool_wrapper.relation_toolwrapper_to_fileioinfo])
+            # the tables of the rules then find their modification time in the session
+            self.__session.query(TableModificationTime).all()
+            run_plan = {}
+            for tool_wrapper in list_tool_wrappers:
+                if any(run_plan[predecessor] for predecessor in self.__dag_to_exec.predecessors(tool_wrapper)) \
+                        or not tool_wrapper.are_inputs_ready():
+                    run_plan[tool_wrapper] = True
+                    continue
+                if OptionManager.instance()["--rerun-trigger"] == "checksum":
+                    # the checksums of the inputs are needed to compare them with the previous execution
+                    self.__journal.record(tool_wrapper.get_args_time_and_size(1))
+                run_plan[tool_wrapper] = not self.is_this_tool_wrapper_already_executed(tool_wrapper)
+        Logger.instance().info("{} of {} rules to run.".format(sum(run_plan.values()), len(run_plan)))
+        return run_plan
+
+    def get_expected_run_durations(self):
+        """
+        Get the expected run duration of each ToolWrapper of the dag_to_exec from the previous executions.
+
+        The expected duration of a rule is the mean of the run_duration_secs of the previous executions of the rule with
+        the same name. The rules never executed take the mean of the others, or 1 second if there is no history.
+
+        :return: dict(ToolWrapper: float)
+        """
+        rule_name_to_duration = dict(
+            self.__session.query(ToolWrapper.rule_name, func.avg(ToolWrapper.run_duration_secs))
+                .filter(ToolWrapper.status == "EXECUTED")
+                .filter(ToolWrapper.run_duration_secs.isnot(None))
+                .group_by(ToolWrapper.rule_name).all())
+        default_duration = 1.0
+        if rule_name_to_duration:
+            default_duration = sum(rule_name_to_duration.values()) / len(rule_name_to_duration)
+        return {tool_wrapper: rule_name_to_duration.get(tool_wrapper.rule_name, default_duration)
+                for tool_wrapper in self.__dag_to_exec.nodes()}
+
+    def get_priority(self, tool_wrapper_thread):
+        """
+        The priority of a ToolWrapperThread in the queue is the critical path length of its ToolWrapper.
+
+        :param tool_wrapper_thread: A ToolWrapperThread put in the queue
+        :type tool_wrapper_thread: :class:`~.wopmars.management.ToolWrapperThread.ToolWrapperThread`
+        :return: float
+        """
+        return self.__critical_path_lengths.get(tool_wrapper_thread.get_toolwrapper(), 0)
+
+    def get_resources_needed(self):
+        """
+        Get the quantities of resources needed by each ToolWrapper of the dag_to_exec, for the resources limited by the
+        "--resources" option.
+
+        A rule needing more than the limit of a resource is considered as needing the whole resource: it will run
+        when no other running rule uses it.
+
+        :return: dict(ToolWrapper: dict(str: float))
+        """
+        resources_limits = self.__resources_limits
+        if not resources_limits or OptionManager.instance()["--dry-run"]:
+            return {}
+        resources_needed = {}
+        for tool_wrapper in self.__dag_to_exec.nodes():
+            resources_needed[tool_wrapper] = {}
+            for resource_name, resource_value in tool_wrapper.get_resources().items():
+                if resource_name in resources_limits:
+                    if resource_value > resources_limits[resource_name]:
+                        Logger.instance().warning("The rule {} needs {} {} but only {} are available."
+                                                  .format(tool_wrapper.rule_name, resource_value, resource_name,
+                                                          resources_limits[resource_name]))
+                        resource_value = resources_limits[resource_name]
+                    resources_needed[tool_wrapper][resource_name] = resource_value
+        return resources_needed
+
+    def are_resources_available(self, tool_wrapper):
+        """
+        Check if the resources needed by the tool_wrapper are not used by the running tools.
+
+        :param tool_wrapper: Node of the DAG
+        :type tool_wrapper: :class:`~.wopmars.models.ToolWrapper.ToolWrapper`
+        :return: Bool
+        """
+        resources_limits = self.__resources_limits
+        for resource_name, resource_value in self.__resources_needed.get(tool_wrapper, {}).items():
+            if self.__resources_in_use.get(resource_name, 0) + resource_value > resources_limits[resource_name]:
+                return False
+        return True
+
+    def acquire_resources(self, tool_wrapper):
+        """
+        Count the resources needed by the tool_wrapper as used until it is released.
+
+        :param tool_wrapper: Node of the DAG which is started
+        :type tool_wrapper: :class:`~.wopmars.models.ToolWrapper.ToolWrapper`
+        """
+        for resource_name, resource_value in self.__resources_needed.get(tool_wrapper, {}).items():
+            self.__resources_in_use[resource_name] = self.__resources_in_use.get(resource_name, 0) + resource_value
+
+    def release_resources(self, tool_wrapper):
+        """
+        Make the resources used by the tool_wrapper available again.
+
+        :param tool_wrapper: Node of the DAG which has finished
+        :type tool_wrapper: :class:`~.wopmars.models.ToolWrapper.ToolWrapper`
+        """
+        for resource_name, resource_value in self.__resources_needed.get(tool_wrapper, {}).items():
+            self.__resources_in_use[resource_name] -= resource_value
+
     def all_predecessors_have_run(self, rule):
         """
         Check if all the predecessors of the given tool_python_path have yet been executed in this workflow.
@@ -384,7 +635,7 @@ class WorkflowManager(ToolWrapperObserver):
         :type rule: :class:`~.wopmars.main.framework.database.models.ToolWrapper.ToolWrapper`
         :return: Bool
         """
-        return bool(self.__dag_to_exec.get_all_predecessors(rule).difference(set([rule])).issubset(set(self.__already_runned)))
+        return self.__count_predecessors[rule] == 0
 
     @staticmethod
     def is_this_tool_wrapper_already_executed(tool_wrapper):
@@ -393,8 +644,10 @@ class WorkflowManager(ToolWrapperObserver):
 
         The conditions are:
             - The tool_wrapper outputs exist
-            - The tool_wrapper outputs are more recent than inputs
-            - If tool_wrapper exist in the database, then it checks if there are the same parameter values
+            - The tool_wrapper outputs are more recent than inputs or, with the "--rerun-trigger=checksum" option, the
+              content of the inputs is the same than at the previous execution
+            - If the rule exists in the database, then it checks if its last execution has the same signature: same
+              tool, inputs, outputs and parameter values, and the same source code of the wrapper and of its models
 
         :param tool_wrapper: The tool_wrapper to be tested
         :type tool_wrapper: :class:`~.wopmars.models.ToolWrapper.ToolWrapper`
@@ -427,17 +680,33 @@ class WorkflowManager(ToolWrapperObserver):
 
         is_already_executed = False  # Default, not executed
 
-        # Check if output of tool_wrapper exist and output is more recent than input
-        is_already_executed = tool_wrapper.output_file_exists() and tool_wrapper.output_table_exists() \
-                           and tool_wrapper.is_output_more_recent_than_input()
-
-        tool_wrapper_old = session.query(ToolWrapper).filter(ToolWrapper.tool_python_path == tool_wrapper.tool_python_path)\
+        # Get the last execution of the same rule
+        tool_wrapper_old = session.query(ToolWrapper).filter(ToolWrapper.rule_name == tool_wrapper.rule_name)\
             .filter(ToolWrapper.execution_id != tool_wrapper.execution_id)\
             .order_by(ToolWrapper.id.desc()).first()
 
+        # Check if output of tool_wrapper exist and input has not changed since
+        is_already_executed = tool_wrapper.output_file_exists() and tool_wrapper.output_table_exists()
+        if is_already_executed:
+            is_input_unchanged = None
+            if OptionManager.instance()["--rerun-trigger"] == "checksum" and tool_wrapper_old is not None:
+                is_input_unchanged = tool_wrapper.is_input_unchanged_since(tool_wrapper_old)
+            if is_input_unchanged is None:  # no checksum to compare with: output must be more recent than input
+                is_input_unchanged = tool_wrapper.is_output_more_recent_than_input()
+            is_already_executed = is_input_unchanged
+
         if not (tool_wrapper_old is None):  # If tool_wrapper exists in the database, check if same parameter values
 
-            is_already_executed = is_already_executed and (tool_wrapper == tool_wrapper_old)
+            if tool_wrapper_old.signature is not None:
+                is_already_executed = is_already_executed and tool_wrapper.signature == tool_wrapper_old.signature
+            else:  # executed by a version of WopMars without signature
+                is_already_executed = is_already_executed and (tool_wrapper == tool_wrapper_old)
+
+            if is_already_executed and tool_wrapper_old.source_hash is not None \
+                    and tool_wrapper.source_hash != tool_wrapper_old.source_hash:
+                Logger.instance().info("The source code of the rule {} has changed since its last execution."
+                                       .format(tool_wrapper.rule_name))
+                is_already_executed = False
 
         return is_already_executed
 
@@ -454,41 +723,82 @@ class WorkflowManager(ToolWrapperObserver):
 
     def notify_success(self, thread_toolwrapper):
         """
-        Handle thread_toolwrapper success by continuing the dag.
+        Handle thread_toolwrapper success by putting it in the queue of finished ToolWrapperThreads.
+
+        This method may be called from the thread of the ToolWrapperThread.
 
         :param thread_toolwrapper: ToolWrapper thread that just succeed
         :type thread_toolwrapper: :class:`~.wopmars.management.ToolWrapperThread.ToolWrapperThread`
         """
-        self.__session.add(thread_toolwrapper.get_toolwrapper())
-        self.__session.commit()
+        self.__queue_finished.put(thread_toolwrapper)
+
+    def notify_failure(self, thread_toolwrapper):
+        """
+        Handle thread_toolwrapper failure by putting it in the queue of finished ToolWrapperThreads.
+
+        This method may be called from the thread of the ToolWrapperThread.
+
+        :param thread_toolwrapper: ToolWrapper thread that just failed
+        :type thread_toolwrapper: :class:`~.wopmars.management.ToolWrapperThread.ToolWrapperThread`
+        """
+        self.__queue_finished.put(thread_toolwrapper)
+
+    def process_finished_tool_wrapper_thread(self, thread_toolwrapper):
+        """
+        Store the execution informations of a finished ToolWrapperThread and continue the dag.
+
+        The successors of the ToolWrapper that have no more predecessors to wait for are put in the queue, which will be
+        executed by the next iteration of "run_queue()". If the ToolWrapperThread has failed, the tools that are still
+        running are waited for before raising the error or, with the "--keep-going" option, the failure is logged and
+        the workflow continues without the successors of the ToolWrapper.
+
+        :param thread_toolwrapper: ToolWrapper thread that just finished
+        :type thread_toolwrapper: :class:`~.wopmars.management.ToolWrapperThread.ToolWrapperThread`
+        :raises WopMarsException: The ToolWrapperThread has failed.
+        """
+        tool_wrapper = thread_toolwrapper.get_toolwrapper()
+        self.__journal.record([(tool_wrapper,
+                                tool_wrapper.get_execution_infos_values(*thread_toolwrapper.get_execution_infos()))])
+        # the end of the rule is written before its successors are checked
+        self.__journal.flush()
+        self.__count_exec -= 1
+        self.release_resources(tool_wrapper)
+        # the outputs may have been written by the tool
+        StatCache.instance().invalidate([f.path for f in tool_wrapper.relation_toolwrapper_to_fileioinfo
+                                         if f.relation_file_or_tableioinfo_to_typeio.is_input == 0])
+        # a tool running in its own thread or process commits outside of the session of the WorkflowManager: the
+        # modification times of its output tables are read again from the database
+        for table_io_info in tool_wrapper.relation_toolwrapper_to_tableioinfo:
+            if table_io_info.relation_file_or_tableioinfo_to_typeio.is_input == 0:
+                self.__session.expire(table_io_info.relation_tableioinfo_to_tablemodiftime)
+
+        if thread_toolwrapper.get_exception() is not None and OptionManager.instance()["--keep-going"]:
+            Logger.instance().error(str(thread_toolwrapper.get_exception()))
+            list_depending = sorted(tw.rule_name for tw in self.__dag_to_exec.get_all_successors(tool_wrapper)
+                                    if tw is not tool_wrapper)
+            Logger.instance().warning("ToolWrapper {} -> {} has failed. The rules depending on it will not be executed: "
+                                      "'{}'".format(str(tool_wrapper.rule_name), str(tool_wrapper.__class__.__name__),
+                                                    "', '".join(list_depending)))
+            self.__list_failed.append(tool_wrapper)
+            return
+
+        if thread_toolwrapper.get_exception() is not None:
+            # let the running tools finish and store their informations before stopping the workflow
+            while self.__count_exec > 0:
+                other_thread_toolwrapper = self.__queue_finished.get()
+                other_tool_wrapper = other_thread_toolwrapper.get_toolwrapper()
+                self.__journal.record([(other_tool_wrapper, other_tool_wrapper.get_execution_infos_values(
+                    *other_thread_toolwrapper.get_execution_infos()))])
+                self.__count_exec -= 1
+            raise thread_toolwrapper.get_exception()
 
         dry_status = thread_toolwrapper.get_dry()
         # if not OptionManager.instance()["--dry-run"]:
         #     thread_toolwrapper.get_toolwrapper().set_args_time_and_size("output", dry_status)
         if dry_status is False and not OptionManager.instance()["--dry-run"]:
             Logger.instance().info("ToolWrapper {} -> {} has succeeded."
-                                   .format(str(thread_toolwrapper.get_toolwrapper().rule_name),
-                                           str(thread_toolwrapper.get_toolwrapper().__class__.__name__)))
+                                   .format(str(tool_wrapper.rule_name), str(tool_wrapper.__class__.__name__)))
         # Continue the dag execution from the tool_python_path that just finished.
-        self.__already_runned.add(thread_toolwrapper.get_toolwrapper())
-        self.__count_exec -= 1
-
-        if len(self.__list_queue_buffer):
-            Logger.instance().debug("Fill the queue with the buffer: " +
-                                    str([t.get_toolwrapper().__class__.__name__ for t in self.__list_queue_buffer]))
-        i = 0
-        for tw_thread in self.__list_queue_buffer:
-            self.__queue_exec.put(tw_thread)
-            del self.__list_queue_buffer[i]
-            i += 1
-
-        self.execute_from(thread_toolwrapper.get_toolwrapper())
+        self.__already_runned.add(tool_wrapper)
 
-    def notify_failure(self, thread_toolwrapper):
-        """
-        Handle thread_toolwrapper failure by re-puting it in the queue.
-
-        :param thread_toolwrapper: ToolWrapper thread that just failed
-        :return:
-        """
-        pass
+        self.execute_from(tool_wrapper)
@@ -22,20 +22,34 @@ from wopmars.utils.various import get_mtime, get_current_time
 __doc__ = """wopmars %s
 
 Usage:
-  wopmars --version | (-D DATABASE) (-w DEFINITION_FILE) [-n] [-F] [-v...] [-d DIR] [-g FILE] [-L FILE] [-S RULE | -U RULE] [-c] [-t]
-  wopmars tool TOOLWRAPPER [-i DICT] [-o DICT] [-P DICT] [-F] [-D DATABASE] [-v...] [-d DIR] [-L FILE] [-g FILE] [-c] [-t]
+  wopmars --version | (-D DATABASE) (-w DEFINITION_FILE) [-n] [-F] [-v...] [-d DIR] [-g FILE] [-L FILE] [-S RULE | -U RULE] [-c] [-t] [-j N] [-e EXECUTOR] [-r DICT] [-k] [--rule-timeout=SECONDS] [--rule-memory-limit=MB] [--rule-cpu-limit=SECONDS] [--rerun-trigger=TRIGGER]
+  wopmars tool TOOLWRAPPER [-i DICT] [-o DICT] [-P DICT] [-F] [-D DATABASE] [-v...] [-d DIR] [-L FILE] [-g FILE] [-c] [-t] [-j N] [-e EXECUTOR]
   wopmars example [-d DIR]
+  wopmars history --prune (-D DATABASE) [--keep-last=N] [--older-than=DAYS] [-v...] [-d DIR] [-L FILE]
 
 Arguments:
   DATABASE         Path to the sqlite database file (Required)
   DEFINITION_FILE  Path to the definition file of the workflow (Required)
   FILE             Path to a file.
+  N                Positive integer.
+  DAYS             Positive number of days.
   DIR              Path to a directory.
+  EXECUTOR         Either "thread" or "process".
   RULE             Name of a rule in the workflow definition file.
+  SECONDS          Positive number of seconds.
+  MB               Positive number of megabytes.
+  TRIGGER          Either "mtime" or "checksum".
   TOOLWRAPPER      Path the the tool_python_path
   DICT             String formatted like a dictionary. Ex: "{'input1': 'path/to/input1', 'input2': 'path/to/input2'}"
 
 Options:
+  --keep-last=N                With "history --prune", keep the N most recent executions.
+  --older-than=DAYS            With "history --prune", only delete the executions started more than DAYS days ago.
+  --prune                      Delete the old executions from the history, then compact the database (VACUUM and ANALYZE). The last execution of each rule is kept, so that the rules already executed are still skipped. Needs --keep-last or --older-than.
+  --rerun-trigger=TRIGGER      Rerun a rule when its input files are more recent than its outputs ("mtime") or when the content of its input files has changed since its last execution ("checksum"). [default: mtime]
+  --rule-cpu-limit=SECONDS     Limit the CPU time of each rule (RLIMIT_CPU) to SECONDS. The rules are executed in child processes.
+  --rule-memory-limit=MB       Limit the address space of each rule (RLIMIT_AS) to MB megabytes. The rules are executed in child processes.
+  --rule-timeout=SECONDS       Stop the rules running for more than SECONDS and mark them TIMEOUT. The "timeout" of a rule in the definition file has precedence.
   --version                    Show version and exists
   -D --database=DATABASE       REQUIRED: Set the path to the database, e.g -D sqlite:///db.sqlite
   -F --forceall                Force the execution of the workflow, without checking for previous executions.
@@ -44,12 +58,16 @@ Options:
   -S RULE --since=RULE         Execute the workflow since the given RULE.
   -U RULE --until=RULE         Execute the workflow until the given RULE.
   -c --cleanup-metadata        Clear WoMars history. Should be used in case of bug which seem to be related to the history. Be carefull, clearing history will result in a re-execution of the whole workflow.
+  -e --executor=EXECUTOR       Run each rule in a "thread" or in a child "process". Use "process" for CPU-bound rules written in Python or to protect the workflow from the crashes of the rules. [default: thread]
   -d --directory=DIR           Specify working directory (relative paths in the wopfile will use this as their origin). [default: $CWD].
   -g FILE --dot=FILE           Write dot representing the workflow in the FILE file (with .dot extension). This option needs to install WopMars with pygraphviz (pip install wopmars[pygraphviz])
   -h --help                    Show this help.
   -i --input=DICT              Set the input of the tool_python_path you want to use in the dictionary format.
+  -j N --jobs=N                Run up to N rules at the same time, each one in its own thread. [default: 1]
+  -k --keep-going              When a rule fails, keep executing the rules which do not depend on it. The workflow still ends with an error.
   -n --dry-run                 Only display what would have been done.
   -o --output=DICT             Set the output of the tool_python_path you want to use in the dictionary format.
+  -r --resources=DICT          Set the quantities of resources available for the rules running at the same time in the dictionary format. Ex: "{'threads': 16, 'memory': 64000, 'db_writer': 1}"
   -t --touch                   Only display what would have been done.
   -u --update                  Should be used when a file supposedly generated by the workflow already exists and should be used as it. (Not implemented)
   -v                           Set verbosity level, eg -v, -vv or -vvv
@@ -108,8 +126,21 @@ class WopMars:
                 "TOOLWRAPPER": Or(None, Use(PathManager.is_in_python_path)),
                 "tool": Use(bool),
                 "example": Use(bool),
+                "history": Use(bool),
+                "--prune": Use(bool),
+                "--keep-last": Or(None, And(Use(int), lambda n: n >= 0)),
+                "--older-than": Or(None, And(Use(float), lambda n: n >= 0)),
                 "--version": Use(bool),
                 "--cleanup-metadata": Use(bool),
+                "--jobs": And(Use(int), lambda n: n >= 1),
+                "--executor": Or("thread", "process"),
+                "--keep-going": Use(bool),
+                "--rerun-trigger": Or("mtime", "checksum"),
+                "--rule-timeout": Or(None, And(Use(float), lambda n: n > 0)),
+                "--rule-memory-limit": Or(None, And(Use(int), lambda n: n > 0)),
+                "--rule-cpu-limit": Or(None, And(Use(int), lambda n: n > 0)),
+                "--resources": Or(None, And(Use(DictUtils.str_to_dict),
+                                            lambda d: all(type(v) in (int, float) and v >= 0 for v in d.values()))),
             })
             # The option values are validated using schema library
             OptionManager.instance().validate(schema_option)
@@ -140,6 +171,11 @@ class WopMars:
 
         Logger.instance().debug("\nCommand line Args:" + str(OptionManager.instance()))
 
+        if OptionManager.instance()["--prune"] and OptionManager.instance()["--keep-last"] is None \
+                and OptionManager.instance()["--older-than"] is None:
+            Logger.instance().error("The option --prune needs --keep-last or --older-than.")
+            sys.exit(2)
+
         ############################################################################################
         #
         # Print version to stdout and exists
@@ -197,6 +233,21 @@ class WopMars:
             if OptionManager.instance()["--cleanup-metadata"]:
                 sys.exit(0)
 
+        ############################################################################################
+        #
+        # history --prune (delete the old executions and exit)
+        #
+        ############################################################################################
+
+        if OptionManager.instance()["history"]:
+            if OptionManager.instance()["--prune"]:
+                keep_last = OptionManager.instance()["--keep-last"]
+                older_than_days = OptionManager.instance()["--older-than"]
+                SQLManager.instance().prune_wopmars_history(
+                    keep_last=None if keep_last is None else int(keep_last),
+                    older_than_days=None if older_than_days is None else float(older_than_days))
+            sys.exit(0)
+
         try:
             workflow_manager.run()
         except WopMarsException as WE:
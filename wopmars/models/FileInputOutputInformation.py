@@ -1,11 +1,14 @@
 import os
 
-from sqlalchemy import Column, BigInteger, Integer, String, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, BigInteger, Integer, String, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 
 from wopmars.Base import Base
+from wopmars.SQLManager import SQLManager
 from wopmars.models.InputOutput import InputOutput
 from wopmars.utils.Logger import Logger
+from wopmars.utils.StatCache import StatCache
+from wopmars.utils.various import get_checksum
 
 
 class FileInputOutputInformation(InputOutput, Base):
@@ -21,18 +24,26 @@ class FileInputOutputInformation(InputOutput, Base):
     - is_input: INTEGER - foreign key to the associated type ID: :class:`wopmars.framework.database.tables.TypeInputOrOutput.TypeInputOrOutput`
     - mtime_epoch_millis: INTEGER - unix mtime_epoch_millis at which the table have been used
     - size: INTEGER - the size of the file
+    - checksum: VARCHAR(64) - the sha256 of the content of the file, with the "--rerun-trigger=checksum" option
+    - st_dev: INTEGER - the device of the file when the checksum has been computed
+    - st_ino: INTEGER - the inode of the file when the checksum has been computed
     """
 
     __tablename__ = "wom_{}".format(__qualname__)
+    # the checksums already computed are looked up by file
+    __table_args__ = (Index("ix_wom_FileInputOutputInformation_st_dev_st_ino", "st_dev", "st_ino"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     file_key = Column(String(255))
     path = Column(String(255))
-    toolwrapper_id = Column(Integer, ForeignKey("wom_ToolWrapper.id", ondelete='CASCADE'))
+    toolwrapper_id = Column(Integer, ForeignKey("wom_ToolWrapper.id", ondelete='CASCADE'), index=True)
     is_input = Column(Boolean, ForeignKey("wom_TypeInputOrOutput.is_input"))
     mtime_human = Column(DateTime, nullable=True)
     mtime_epoch_millis = Column(BigInteger, nullable=True)
     size = Column(BigInteger, nullable=True)
+    checksum = Column(String(64), nullable=True)
+    st_dev = Column(BigInteger, nullable=True)
+    st_ino = Column(BigInteger, nullable=True)
 
     # One file is in one rule
     relation_file_or_tableioinfo_to_toolwrapper = relationship("ToolWrapper", back_populates="relation_toolwrapper_to_fileioinfo", enable_typechecks=False)
@@ -46,7 +57,34 @@ class FileInputOutputInformation(InputOutput, Base):
         :return: boolean: True if it exists, false if not
         """
         Logger.instance().debug("Checking if " + self.file_key + " is ready: " + self.path)
-        return os.path.isfile(self.path)
+        return StatCache.instance().is_file(self.path)
+
+    def get_checksum_values(self):
+        """
+        Get the checksum of the content of the file with the device and the inode of the file.
+
+        The checksum already known by this object and the checksums already stored are used as a cache: if a file with
+        the same device, inode, size and mtime_epoch_millis has already been hashed, it is not read again.
+
+        :return: dict(str: object) the values of the columns checksum, st_dev and st_ino
+        """
+        stat = StatCache.instance().stat(self.path)
+        mtime_epoch_millis = stat.st_mtime * 1000
+        if self.checksum is not None and (self.st_dev, self.st_ino, self.size, self.mtime_epoch_millis) \
+                == (stat.st_dev, stat.st_ino, stat.st_size, mtime_epoch_millis):
+            return {"checksum": self.checksum, "st_dev": stat.st_dev, "st_ino": stat.st_ino}
+        checksum = SQLManager.instance().get_session().query(FileInputOutputInformation.checksum)\
+            .filter(FileInputOutputInformation.st_dev == stat.st_dev)\
+            .filter(FileInputOutputInformation.st_ino == stat.st_ino)\
+            .filter(FileInputOutputInformation.size == stat.st_size)\
+            .filter(FileInputOutputInformation.mtime_epoch_millis == mtime_epoch_millis)\
+            .filter(FileInputOutputInformation.checksum.isnot(None)).first()
+        if checksum is None:
+            Logger.instance().debug("Computing the checksum of " + self.path)
+            checksum = get_checksum(self.path)
+        else:
+            checksum = checksum[0]
+        return {"checksum": checksum, "st_dev": stat.st_dev, "st_ino": stat.st_ino}
 
     def __eq__(self, other):
         return os.path.abspath(self.path) == os.path.abspath(other.path) and self.file_key == other.file_key
@@ -31,7 +31,7 @@ class Option(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(255))
     value = Column(String(255))
-    toolwrapper_id = Column(Integer, ForeignKey("wom_ToolWrapper.id"))
+    toolwrapper_id = Column(Integer, ForeignKey("wom_ToolWrapper.id"), index=True)
 
     # One option is used by one rule
     relation_option_to_toolwrapper = relationship("ToolWrapper", back_populates="relation_toolwrapper_to_option",
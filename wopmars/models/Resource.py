@@ -0,0 +1,36 @@
+from wopmars.Base import Base
+
+from sqlalchemy import Column, Integer, String, ForeignKey, Float
+from sqlalchemy.orm import relationship
+
+
+class Resource(Base):
+    """
+    The Resource class handle the quantity of a resource needed by a rule, as given in the ``resources`` block of the
+    definition file. It is the model of the table ``wom_resource`` which contains the following fields:
+
+    - id: INTEGER - primary key - auto increment
+    - name: VARCHAR(255) - the name of the resource, for instance "threads", "memory" or "db_writer"
+    - value: FLOAT - the quantity of the resource needed by the rule
+    - toolwrapper_id: INTEGER - the ID of the associated rule
+    """
+
+    __tablename__ = "wom_{}".format(__qualname__)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(255))
+    value = Column(Float)
+    toolwrapper_id = Column(Integer, ForeignKey("wom_ToolWrapper.id"), index=True)
+
+    # One resource is used by one rule
+    relation_resource_to_toolwrapper = relationship("ToolWrapper", back_populates="relation_toolwrapper_to_resource",
+                                                    enable_typechecks=False)
+
+    def __eq__(self, other):
+        return self.value == other.value and self.name == other.name
+
+    def __hash__(self):
+        return id(self)
+
+    def __str__(self):
+        return str(self.name) + ": " + str(self.value)
@@ -8,8 +8,10 @@ from sqlalchemy.orm import relationship, reconstructor
 
 from wopmars.SQLManager import SQLManager
 from wopmars.models.InputOutput import InputOutput
+from wopmars.models.TableModificationTime import TableModificationTime
 from wopmars.models.ToolWrapper import ToolWrapper
 from wopmars.utils.Logger import Logger
+from wopmars.utils.TableFingerprint import TableFingerprint
 from sqlalchemy.sql.functions import func
 
 
@@ -31,9 +33,9 @@ class TableInputOutputInformation(InputOutput, Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     table_key = Column(String(255))
-    table_name = Column(String(255), ForeignKey("wom_TableModificationTime.table_name"))
+    table_name = Column(String(255), ForeignKey("wom_TableModificationTime.table_name"), index=True)
     model_py_path = Column(String(255))
-    toolwrapper_id = Column(Integer, ForeignKey("wom_ToolWrapper.id", ondelete='CASCADE'))
+    toolwrapper_id = Column(Integer, ForeignKey("wom_ToolWrapper.id", ondelete='CASCADE'), index=True)
     is_input = Column(Boolean, ForeignKey("wom_TypeInputOrOutput.is_input"))
     mtime_human = Column(DateTime, nullable=True)
     mtime_epoch_millis = Column(BigInteger, nullable=True)
@@ -155,11 +157,54 @@ class TableInputOutputInformation(InputOutput, Base):
             # toodo LG twthread
         return True
 
+    def get_fingerprint(self):
+        """
+        Get the fingerprint of the content of the table: the row count and a hash of the rows which does not depend on
+        their order.
+
+        With SQLite, the fingerprint is computed by the database with the TableFingerprint aggregate function. With the
+        other databases, the rows are streamed. The fingerprint is cached in the TableModificationTime entry of the
+        table until the table is modified.
+
+        :return: str: the fingerprint
+        """
+        session = SQLManager.instance().get_session()
+        mtime_epoch_millis = session.query(TableModificationTime.mtime_epoch_millis)\
+            .filter(TableModificationTime.table_name == self.table_name).scalar()
+        modification_table_entry = None
+        if mtime_epoch_millis is not None:
+            modification_table_entry = session.query(TableModificationTime)\
+                .filter(TableModificationTime.table_name == self.table_name).one()
+            if modification_table_entry.fingerprint is not None \
+                    and modification_table_entry.fingerprint_mtime_epoch_millis == mtime_epoch_millis:
+                return modification_table_entry.fingerprint
+
+        columns = [self.__table.__table__.c[name] for name in sorted(self.__table.__table__.c.keys())]
+        if SQLManager.instance().d_database_config['db_connection'] == "sqlite":
+            fingerprint = session.query(getattr(func, TableFingerprint.NAME)(*columns)).scalar()
+            if fingerprint is None:  # SQLite does not call the aggregate function on an empty table
+                fingerprint = TableFingerprint().finalize()
+        else:
+            table_fingerprint = TableFingerprint()
+            for row in session.query(*columns).yield_per(1000):
+                table_fingerprint.step(*row)
+            fingerprint = table_fingerprint.finalize()
+        Logger.instance().debug("Fingerprint of the table " + self.table_key + ": " + fingerprint)
+
+        if modification_table_entry is not None:
+            modification_table_entry.fingerprint = fingerprint
+            modification_table_entry.fingerprint_mtime_epoch_millis = mtime_epoch_millis
+            session.add(modification_table_entry)
+            session.commit()
+        return fingerprint
+
     def __eq__(self, other):
         """
         Two TableInputOutputInformation object are equals if their table attributes belongs to the same class and if the associated table
         has the same content
 
+        The contents are compared by their fingerprint, computed by the database.
+
         :param other: TableInputOutputInformation
         :return: boolean: True if the table attributes are the same, False if not
         """
@@ -167,9 +212,7 @@ class TableInputOutputInformation(InputOutput, Base):
         if self.model_py_path != other.model_py_path or self.table_key != other.table_key:
             return False
         try:
-            self_results = set(session.query(self.__table).all())
-            other_results = set(session.query(other.get_table()).all())
-            if self_results != other_results:
+            if self.get_fingerprint() != other.get_fingerprint():
                 return False
         except Exception as e:
             session.rollback()
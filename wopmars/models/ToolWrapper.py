@@ -1,16 +1,21 @@
+import hashlib
+import importlib
+import json
 import os
 import pathlib
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Index
 from sqlalchemy.orm import relationship
 
 from wopmars.Base import Base
 from wopmars.SQLManager import SQLManager
 from wopmars.models.Option import Option
+from wopmars.models.Resource import Resource
 from wopmars.utils.Logger import Logger
 from wopmars.utils.OptionManager import OptionManager
 from wopmars.utils.WopMarsException import WopMarsException
-from wopmars.utils.various import get_mtime, get_current_time
+from wopmars.utils.StatCache import StatCache
+from wopmars.utils.various import get_current_time
 from wopmars.models.TableModificationTime import TableModificationTime
 
 
@@ -26,24 +31,45 @@ class ToolWrapper(Base):
     - started_at: INTEGER - unix mtime_epoch_millis [ms] at wich the tool_python_path started its execution
     - finished_at: INTEGER - unix mtime_epoch_millis [ms] at wich the tool_python_path finished its execution
     - mtime_epoch_millis: FLOAT - the total mtime_epoch_millis [ms] tool_python_path execution
+    - retries: INTEGER - the number of times the rule is executed again after a failure
+    - backoff_secs: FLOAT - the delay [s] before the first retry, doubled for each next retry
+    - timeout_secs: FLOAT - the maximum duration [s] of an execution of the rule
+    - exit_code: INTEGER - the exit code of the child process which has executed the rule, negative if it has been
+      killed by a signal (None if the rule has not been executed in a child process)
+    - peak_rss_kb: INTEGER - the peak resident set size [kB] of the child process which has executed the rule
+    - signature: VARCHAR(64) - the sha256 of the definition of the rule: tool, rule name, inputs, outputs and options
+    - source_hash: VARCHAR(64) - the sha256 of the source code of the wrapper module and of the models of its tables
+    - definition_id: INTEGER - foreign key to the table ``wom_ToolWrapper`` - the previous execution of the rule, with
+      the same signature, holding its options and resources (None if they are stored by this row)
     - status: VARCHAR(255) - the final status of the Toolwrapper. it can be:
 
        - NOT PLANNED: the tool_python_path execution was not even expected by the user
        - ALREADY EXECUTED: the tool_python_path has been previously executed in an old workflow and does not need to be re-executed
        - EXECUTED: the tool_python_path has been executed
        - ERROR: the tool_python_path has encountered an error during the execution
+       - TIMEOUT: the tool_python_path has been stopped because it has exceeded its timeout
     """
 
     __tablename__ = "wom_{}".format(__qualname__)
+    # the rules of an execution are counted by status when it finishes
+    __table_args__ = (Index("ix_wom_ToolWrapper_execution_id_status", "execution_id", "status"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    rule_name = Column(String(255))
+    rule_name = Column(String(255), index=True)
     tool_python_path = Column(String(255))
     execution_id = Column(Integer, ForeignKey("wom_Execution.id"))
     started_at = Column(DateTime, nullable=True)
     finished_at = Column(DateTime, nullable=True)
     run_duration_secs = Column(Integer, nullable=True)
-    status = Column(String(255), nullable=True, default="NOT_EXECUTED")
+    retries = Column(Integer, nullable=True, default=0)
+    backoff_secs = Column(Float, nullable=True, default=1.0)
+    timeout_secs = Column(Float, nullable=True)
+    exit_code = Column(Integer, nullable=True)
+    peak_rss_kb = Column(Integer, nullable=True)
+    signature = Column(String(64), nullable=True, index=True)
+    source_hash = Column(String(64), nullable=True)
+    definition_id = Column(Integer, ForeignKey("wom_ToolWrapper.id"), nullable=True, index=True)
+    status = Column(String(255), nullable=True, default="NOT_EXECUTED", index=True)
 
     # One rule has many tables
     relation_toolwrapper_to_tableioinfo = relationship("TableInputOutputInformation", back_populates="relation_file_or_tableioinfo_to_toolwrapper", cascade="all, delete, delete-orphan")
@@ -51,6 +77,8 @@ class ToolWrapper(Base):
     relation_toolwrapper_to_fileioinfo = relationship("FileInputOutputInformation", back_populates="relation_file_or_tableioinfo_to_toolwrapper", cascade="all, delete, delete-orphan")
     # One option is used by many toolwrappers
     relation_toolwrapper_to_option = relationship("Option", back_populates="relation_option_to_toolwrapper", cascade="all, delete, delete-orphan")
+    # One rule needs many resources
+    relation_toolwrapper_to_resource = relationship("Resource", back_populates="relation_resource_to_toolwrapper", cascade="all, delete, delete-orphan")
     # One rule has one execution
     # execution = relationship("Execution", back_populates="rules")
     relation_toolwrapper_to_execution = relationship("Execution", back_populates="relation_execution_to_toolwrapper")
@@ -94,6 +122,7 @@ class ToolWrapper(Base):
         - :meth:`~.wopmars.framework.database.ToolWrapper.ToolWrapper.is_options_respected`
         - :meth:`~.wopmars.framework.database.ToolWrapper.ToolWrapper.is_input_or_output_respected`
         - :meth:`~.wopmars.framework.database.ToolWrapper.ToolWrapper.is_output_respected`
+        - :meth:`~.wopmars.framework.database.ToolWrapper.ToolWrapper.is_resources_respected`
         """
         # the relation_toolwrapper_to_option have to be checked first because they can alter the behavior of the is_input_or_output_respected and
         # is_output_respected methods
@@ -103,6 +132,8 @@ class ToolWrapper(Base):
         self.is_input_or_output_respected(is_input=True)
         # Check whether output is respected
         self.is_input_or_output_respected(is_input=False)
+        # Check whether resources are respected
+        self.is_resources_respected()
 
     def is_input_or_output_respected(self, is_input):
         """
@@ -240,6 +271,22 @@ class ToolWrapper(Base):
                 raise WopMarsException("The content of the definition file is not valid.",
                                        "The option '" + opt + "' has not been provided but it is required.")
 
+    def is_resources_respected(self):
+        """
+        Parsing method:
+
+        Check if the quantities of resources needed by the rule are positive numbers. If not, throws a
+        WopMarsParsingException.
+
+        :raises WopMarsException: If a quantity of resource is not a positive number.
+        """
+        for resource_name, resource_value in self.get_resources().items():
+            if isinstance(resource_value, bool) or not isinstance(resource_value, (int, float)) or resource_value < 0:
+                raise WopMarsException("The content of the definition file is not valid.",
+                                       "The resource '" + str(resource_name) + "' of the rule " + str(self.rule_name) +
+                                       " -> " + self.__class__.__name__ + " should be a positive number. It is: " +
+                                       str(resource_value))
+
     def follows(self, other):
         """
         Parsing method:
@@ -318,6 +365,8 @@ class ToolWrapper(Base):
         If the is_input of InputOutput is "output" and the execution is "not dry", the mtime_epoch_millis in modification_table is set to the
         current mtime_epoch_millis.mtime_epoch_millis().
 
+        The values are given by :meth:`~.wopmars.models.ToolWrapper.ToolWrapper.get_args_time_and_size` and committed.
+
         # totodo LucG modify it to take commits into account instead of the status of 'output' of a table
 
         :param is_input: "input" or "output"
@@ -326,45 +375,61 @@ class ToolWrapper(Base):
         :is_input dry: bool
         """
         session = SQLManager.instance().get_session()
+        try:
+            list_args = self.get_args_time_and_size(is_input, dry)
+        except WopMarsException:
+            session.rollback()
+            raise
+        for io_info, values in list_args:
+            for column_name, value in values.items():
+                setattr(io_info, column_name, value)
+            session.add(io_info)
+        session.commit()
+
+    def get_args_time_and_size(self, is_input, dry=False):
+        """
+        Get the mtime_epoch_millis and the size of the input or output files and the mtime_epoch_millis of the input
+        or output tables, without modifying the objects.
+
+        The WorkflowManager records them in its BookkeepingJournal instead of committing them.
+
+        :param is_input: "input" or "output"
+        :is_input is_input: bool
+        :param dry: Say if the execution has been simulated.
+        :is_input dry: bool
+        :return: list(tuple(FileInputOutputInformation or TableInputOutputInformation, dict(str: object))) the objects
+            with the values of their columns
+        :raises WopMarsException: A file doesn't exist and the --dry-run option is not enabled
+        """
+        list_args = []
         for f in [f for f in self.relation_toolwrapper_to_fileioinfo if f.relation_file_or_tableioinfo_to_typeio.is_input == is_input]:
             try:
-                mtime_epoch_millis, mtime_human = get_mtime(f.path)
-                f.mtime_human = mtime_human
-                f.mtime_epoch_millis = mtime_epoch_millis
-                size = os.path.getsize(f.path)
-                f.size = size
-                size = os.path.getsize(f.path)
+                mtime_epoch_millis, mtime_human = StatCache.instance().get_mtime(f.path)
+                size = StatCache.instance().get_size(f.path)
+                values = {"mtime_human": mtime_human, "mtime_epoch_millis": mtime_epoch_millis, "size": size}
+                if is_input == 1 and OptionManager.instance()["--rerun-trigger"] == "checksum":
+                    values.update(f.get_checksum_values())
+                list_args.append((f, values))
             except FileNotFoundError as FE:
-                # totodo LucG ask lionel sans ce rollback, ca bug, pourquoi? la session est vide... comme si la query etait bloquante
                 if not OptionManager.instance()["--dry-run"]:
-                    session.rollback()
                     raise WopMarsException("Error during the execution of the workflow",
-                                           "The " + is_input + " file " + str(f.path) + " of rule " + str(self.rule_name) +
+                                           "The " + str(is_input) + " file " + str(f.path) + " of rule " + str(self.rule_name) +
                                            " doesn't exist")
                 else:
                     # in dry-run mode, input/output files might not exist
-                    mtime_epoch_millis = None
-                    size = None
-            f.used_at = mtime_epoch_millis
-            f.size = size
-            session.add(f)
+                    list_args.append((f, {"size": None}))
             if is_input == 1:
                 Logger.instance().debug("Input file " + str(f) + " used.")
             elif is_input == 0 and dry:
                 Logger.instance().debug("Output file " + str(f) + " has been loaded from previous execution.")
             elif is_input == 0 and not dry:
                 Logger.instance().debug("Output file " + str(f) + " has been created.")
-        # this commit is due to a bug that i couldn't figure out: the session empty itself between the two loops...
-        # this is not good at all since it may lead to inconsistence in the database
-        session.commit()
 
         for t in [tableioinfo for tableioinfo in self.relation_toolwrapper_to_tableioinfo
                   if tableioinfo.relation_file_or_tableioinfo_to_typeio.is_input == is_input]:
-            t.mtime_human = t.relation_tableioinfo_to_tablemodiftime.mtime_human
-            t.mtime_epoch_millis = t.relation_tableioinfo_to_tablemodiftime.mtime_epoch_millis
-            # t.used_at = t.relation_tableioinfo_to_tablemodiftime.mtime_epoch_millis
-            session.add(t)
-        session.commit()
+            list_args.append((t, {"mtime_human": t.relation_tableioinfo_to_tablemodiftime.mtime_human,
+                                  "mtime_epoch_millis": t.relation_tableioinfo_to_tablemodiftime.mtime_epoch_millis}))
+        return list_args
 
     def same_input_than(self, other):
         """
@@ -428,7 +493,7 @@ class ToolWrapper(Base):
         :return: Bool: True if the output is actually more recent than input
         """
 
-        newest_input_file = [get_mtime(input_fileioinfo.path)[0]
+        newest_input_file = [StatCache.instance().get_mtime(input_fileioinfo.path)[0]
                              for input_fileioinfo in self.relation_toolwrapper_to_fileioinfo
                                   if input_fileioinfo.relation_file_or_tableioinfo_to_typeio.is_input == 1]
         newest_input_table = [input_tableioinfo.relation_tableioinfo_to_tablemodiftime.mtime_epoch_millis
@@ -437,7 +502,7 @@ class ToolWrapper(Base):
         # newest is supposed to have largest epoch time
         newest_input = max(newest_input_file + newest_input_table)
 
-        oldest_output_file = [get_mtime(output_fileioinfo.path)[0]
+        oldest_output_file = [StatCache.instance().get_mtime(output_fileioinfo.path)[0]
                               for output_fileioinfo in self.relation_toolwrapper_to_fileioinfo
                               if output_fileioinfo.relation_file_or_tableioinfo_to_typeio.is_input == 0]
         oldest_output_table = [output_tableioinfo.relation_tableioinfo_to_tablemodiftime.mtime_epoch_millis
@@ -448,6 +513,33 @@ class ToolWrapper(Base):
 
         return newest_input < oldest_output
 
+    def is_input_unchanged_since(self, other):
+        """
+        Check if the inputs are the same than at the execution of other, with the "--rerun-trigger=checksum" option.
+
+        The input files are compared by the checksum of their content, so that a copy or a checkout of unchanged files
+        does not trigger a new execution. The input tables are compared by the mtime_epoch_millis of their last
+        modification.
+
+        :param other: The same rule in a previous execution
+        :type other: :class:`~.wopmars.models.ToolWrapper.ToolWrapper`
+        :return: Bool: True if the inputs are unchanged, None if the checksums of other are unknown
+        """
+        other_checksums = {f.file_key: f.checksum for f in other.relation_toolwrapper_to_fileioinfo
+                           if f.relation_file_or_tableioinfo_to_typeio.is_input == 1}
+        if None in other_checksums.values():
+            return None
+        for f in [f for f in self.relation_toolwrapper_to_fileioinfo if f.relation_file_or_tableioinfo_to_typeio.is_input == 1]:
+            if f.checksum is None or other_checksums.get(f.file_key) != f.checksum:
+                return False
+
+        other_mtimes = {t.table_key: t.mtime_epoch_millis for t in other.relation_toolwrapper_to_tableioinfo
+                        if t.relation_file_or_tableioinfo_to_typeio.is_input == 1}
+        for t in [t for t in self.relation_toolwrapper_to_tableioinfo if t.relation_file_or_tableioinfo_to_typeio.is_input == 1]:
+            if other_mtimes.get(t.table_key) != t.relation_tableioinfo_to_tablemodiftime.mtime_epoch_millis:
+                return False
+        return True
+
     def same_output_than(self, other):
         """
         Never used.
@@ -486,7 +578,7 @@ class ToolWrapper(Base):
         """
         for output_file in [this_file for this_file in self.relation_toolwrapper_to_fileioinfo
                             if this_file.relation_file_or_tableioinfo_to_typeio.is_input == 0]:
-            if not os.path.exists(output_file.path):
+            if not StatCache.instance().exists(output_file.path):
                 return False
         return True
 
@@ -506,22 +598,42 @@ class ToolWrapper(Base):
     def get_state(self):
         return self.__state
 
-    def set_execution_infos(self, start=None, stop=None, status=None):
+    def set_execution_infos(self, start=None, stop=None, status=None, exit_code=None, peak_rss_kb=None):
         """
         Generic method to set the informations relatives to the execution of the ToolWrapper.
 
         :param start: The mtime_epoch_millis of start of the Toolwrapper
         :param stop: The mtime_epoch_millis of end of the Toolwrapper
         :param status: The status of the Toolwrapper
+        :param exit_code: The exit code of the child process which has executed the Toolwrapper
+        :param peak_rss_kb: The peak resident set size of the child process which has executed the Toolwrapper
+        """
+        for column_name, value in self.get_execution_infos_values(start, stop, status, exit_code, peak_rss_kb).items():
+            setattr(self, column_name, value)
+
+    def get_execution_infos_values(self, start=None, stop=None, status=None, exit_code=None, peak_rss_kb=None):
+        """
+        Get the values of the columns changed by :meth:`~.wopmars.models.ToolWrapper.ToolWrapper.set_execution_infos`,
+        without modifying the ToolWrapper.
+
+        :return: dict(str: object) the values of the columns
         """
+        values = {}
         if start is not None:
-            self.started_at = start
+            values["started_at"] = start
         if stop is not None:
-            self.finished_at = stop
-        if self.started_at is not None and self.finished_at is not None:
-            self.run_duration_secs = (self.finished_at - self.started_at).total_seconds()
+            values["finished_at"] = stop
+        started_at = values.get("started_at", self.started_at)
+        finished_at = values.get("finished_at", self.finished_at)
+        if started_at is not None and finished_at is not None:
+            values["run_duration_secs"] = (finished_at - started_at).total_seconds()
         if status is not None:
-            self.status = status
+            values["status"] = status
+        if exit_code is not None:
+            values["exit_code"] = exit_code
+        if peak_rss_kb is not None:
+            values["peak_rss_kb"] = peak_rss_kb
+        return values
 
     def __eq__(self, other):
         """
@@ -542,6 +654,74 @@ class ToolWrapper(Base):
                 self.same_tables(other, is_input=False) and
                 self.same_options(other))
 
+    def get_signature(self):
+        """
+        Get the canonical signature of the definition of the rule.
+
+        The signature is computed from the tool_python_path, the rule_name, the keys and absolute paths of the files,
+        the keys and models of the tables and the values of the options. Two ToolWrappers with the same signature are
+        equal.
+
+        :return: str: the sha256 of the definition of the rule
+        """
+        definition = {
+            "tool_python_path": self.tool_python_path,
+            "rule_name": self.rule_name,
+            "files": sorted([bool(f.relation_file_or_tableioinfo_to_typeio.is_input), f.file_key, os.path.abspath(f.path)]
+                            for f in self.relation_toolwrapper_to_fileioinfo),
+            "tables": sorted([bool(t.relation_file_or_tableioinfo_to_typeio.is_input), t.table_key, t.model_py_path]
+                             for t in self.relation_toolwrapper_to_tableioinfo),
+            "options": sorted([o.name, str(o.value)] for o in self.relation_toolwrapper_to_option),
+        }
+        return hashlib.sha256(json.dumps(definition, sort_keys=True).encode("utf-8")).hexdigest()
+
+    # the sha256 of the source files already read: path -> ((st_mtime_ns, st_size), sha256)
+    __source_file_hashes = {}
+
+    @staticmethod
+    def get_source_file_hash(module_name):
+        """
+        Get the sha256 of the source file of a module.
+
+        The hash is computed once for each version of the file.
+
+        :param module_name: The name of the module, like "wopmars.tests.resource.wrapper.FooWrapper1"
+        :type module_name: str
+        :return: str or None if the module has no source file
+        """
+        try:
+            source_path = getattr(importlib.import_module(module_name), "__file__", None)
+        except ImportError:
+            return None
+        if source_path is None:
+            return None
+        try:
+            stat_result = os.stat(source_path)
+        except OSError:
+            return None
+        stat_key = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = ToolWrapper.__source_file_hashes.get(source_path)
+        if cached is None or cached[0] != stat_key:
+            with open(source_path, "rb") as source_file:
+                cached = (stat_key, hashlib.sha256(source_file.read()).hexdigest())
+            ToolWrapper.__source_file_hashes[source_path] = cached
+        return cached[1]
+
+    def get_source_hash(self):
+        """
+        Get the hash of the source code of the rule: the module of the wrapper and the modules of the models of its
+        tables.
+
+        A rule whose source code has changed since its last execution is executed again, with its successors.
+
+        :return: str: the sha256 of the hashes of the source files
+        """
+        list_module_names = [type(self).__module__]
+        list_module_names.extend(sorted(set(t.model_py_path for t in self.relation_toolwrapper_to_tableioinfo)))
+        list_source_hashes = [[module_name, ToolWrapper.get_source_file_hash(module_name)]
+                              for module_name in list_module_names]
+        return hashlib.sha256(json.dumps(list_source_hashes).encode("utf-8")).hexdigest()
+
     def same_files(self, other, is_input):
         """
         Check if the files of a ToolWrapper are the same than the files of the other for a given type (input or output).
@@ -748,6 +928,28 @@ class ToolWrapper(Base):
         """
         return {}
 
+    def specify_resources(self):
+        """
+        Can be implemented by the tool_python_path developper.
+
+        This method return a dict of the quantities of resources needed by the ToolWrapper while running. Keys are the
+        names of the resources and values, numbers. The resources with a limit given by the "--resources" option are
+        shared by the rules running at the same time. The ``resources`` block of the definition file overrides them.
+
+        Example:
+
+        .. code-block:: python
+
+            {
+                'threads': 4,
+                'memory': 8000,
+                'db_writer': 1,
+            }
+
+        :return: {String: Number}
+        """
+        return {}
+
     def run(self):
         """
         Should be implemented by the tool_python_path developer.
@@ -758,6 +960,17 @@ class ToolWrapper(Base):
         """
         raise NotImplementedError("The method run of the ToolWrapper " + str(self.tool_python_path) + " should be implemented")
 
+    def get_resources(self):
+        """
+        Return the quantities of resources needed by this rule: the ones given by the wrapper developer, overridden by
+        the ones given in the ``resources`` block of the definition file.
+
+        :return: {String: Number}
+        """
+        resources = dict(self.specify_resources())
+        resources.update({resource.name: resource.value for resource in self.relation_toolwrapper_to_resource})
+        return resources
+
     ### Methods availables for the tool developer
 
     def input_file(self, key):
@@ -0,0 +1,40 @@
+"""
+Module containing the FooWrapper13 class
+"""
+import subprocess
+
+from wopmars.models.ToolWrapper import ToolWrapper
+from wopmars.utils.Logger import Logger
+
+
+class FooWrapper13(ToolWrapper):
+    """
+    This class has been done for example/testing purpose.
+    Modifications may lead to failure in tests.
+
+    It fails the "failures" first times it is run. The attempts are counted in a file next to the output.
+    """
+    __mapper_args__ = {'polymorphic_identity': "FooWrapper13"}
+
+    def specify_input_file(self):
+        return ["input1"]
+
+    def specify_output_file(self):
+        return ["output1"]
+
+    def specify_params(self):
+        return {
+            "failures": "int"
+        }
+
+    def run(self):
+        Logger.instance().info(self.__class__.__name__ + " is running...")
+        attempts_path = self.output_file("output1") + ".attempts"
+        with open(attempts_path, "a") as attempts_file:
+            attempts_file.write("attempt\n")
+        with open(attempts_path) as attempts_file:
+            attempts = len(attempts_file.readlines())
+        if attempts <= (self.option("failures") or 0):
+            raise RuntimeError("FooWrapper13 fails at attempt {}".format(attempts))
+        p = subprocess.Popen(["touch", self.output_file("output1")])
+        p.wait()
@@ -0,0 +1,35 @@
+"""
+Module containing the FooWrapper14 class
+"""
+import subprocess
+
+from wopmars.models.ToolWrapper import ToolWrapper
+from wopmars.utils.Logger import Logger
+
+
+class FooWrapper14(ToolWrapper):
+    """
+    This class has been done for example/testing purpose.
+    Modifications may lead to failure in tests.
+
+    It runs the "sleep" command for "duration" seconds before touching its output.
+    """
+    __mapper_args__ = {'polymorphic_identity': "FooWrapper14"}
+
+    def specify_input_file(self):
+        return ["input1"]
+
+    def specify_output_file(self):
+        return ["output1"]
+
+    def specify_params(self):
+        return {
+            "duration": "int"
+        }
+
+    def run(self):
+        Logger.instance().info(self.__class__.__name__ + " is running...")
+        p = subprocess.Popen(["sleep", str(self.option("duration") or 0)])
+        p.wait()
+        p = subprocess.Popen(["touch", self.output_file("output1")])
+        p.wait()
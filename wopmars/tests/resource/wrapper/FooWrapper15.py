@@ -0,0 +1,39 @@
+"""
+Module containing the FooWrapper15 class
+"""
+import ctypes
+import subprocess
+
+from wopmars.models.ToolWrapper import ToolWrapper
+from wopmars.utils.Logger import Logger
+
+
+class FooWrapper15(ToolWrapper):
+    """
+    This class has been done for example/testing purpose.
+    Modifications may lead to failure in tests.
+
+    It allocates "allocate_mb" megabytes and, if "crash" is not 0, crashes its process with a segmentation fault before
+    touching its output.
+    """
+    __mapper_args__ = {'polymorphic_identity': "FooWrapper15"}
+
+    def specify_input_file(self):
+        return ["input1"]
+
+    def specify_output_file(self):
+        return ["output1"]
+
+    def specify_params(self):
+        return {
+            "allocate_mb": "int",
+            "crash": "int"
+        }
+
+    def run(self):
+        Logger.instance().info(self.__class__.__name__ + " is running...")
+        allocated = bytearray((self.option("allocate_mb") or 0) * 1024 * 1024)
+        if self.option("crash"):
+            ctypes.string_at(0)
+        p = subprocess.Popen(["touch", self.output_file("output1")])
+        p.wait()
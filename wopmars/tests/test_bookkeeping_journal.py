@@ -0,0 +1,56 @@
+import unittest
+from unittest import TestCase
+
+from wopmars.BookkeepingJournal import BookkeepingJournal
+from wopmars.SQLManager import SQLManager
+from wopmars.models.ToolWrapper import ToolWrapper
+from wopmars.utils.OptionManager import OptionManager
+
+
+class TestBookkeepingJournal(TestCase):
+
+    def setUp(self):
+        OptionManager.initial_test_setup()  # Set tests arguments
+        SQLManager.instance().create_all()  # Create database with tables
+        self.__session = SQLManager.instance().get_session()
+        self.__toolwrapper = ToolWrapper(rule_name="rule1")
+        self.__toolwrapper.status = "NOT_EXECUTED"
+        self.__session.add(self.__toolwrapper)
+        self.__session.commit()
+        self.__toolwrapper_id = self.__toolwrapper.id
+
+    def get_status_in_db(self):
+        return self.__session.execute(ToolWrapper.__table__.select()
+                                      .where(ToolWrapper.__table__.c.id == self.__toolwrapper_id)).first().status
+
+    def test_record(self):
+        journal = BookkeepingJournal()
+        journal.start()
+        journal.record([(self.__toolwrapper, {"status": "EXECUTED"})])
+        # the value is set at once on the object without making the session dirty
+        self.assertEqual(self.__toolwrapper.status, "EXECUTED")
+        self.assertFalse(self.__session.something())
+        journal.flush()
+        self.assertEqual(self.get_status_in_db(), "EXECUTED")
+        journal.close()
+        self.assertFalse(journal.is_alive())
+
+    def test_write_merges_updates(self):
+        journal = BookkeepingJournal()
+        journal.record([(self.__toolwrapper, {"status": "EXECUTED", "exit_code": 0})])
+        journal.record([(self.__toolwrapper, {"status": "ERROR"})])
+        # the journal has not been started: the groups are written by the current thread
+        journal.close()
+        self.assertEqual(self.get_status_in_db(), "ERROR")
+        self.assertEqual(self.__session.query(ToolWrapper).filter(ToolWrapper.id == self.__toolwrapper_id).one()
+                         .exit_code, 0)
+
+    def tearDown(self):
+        SQLManager.instance().get_session().close()
+        SQLManager.instance().drop_all()
+        OptionManager._drop()
+        SQLManager._drop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -102,6 +102,45 @@ class TestDAG(TestCase):
         self.assertNotEqual(set(my_dag.get_all_predecessors(self.__toolwrapper_fourth)),
                             self.__set_tool.difference(set([self.__toolwrapper_fourth])))
 
+    def test_get_reachable_nodes(self):
+        my_dag = DAG(self.__set_tool)
+
+        self.assertEqual(my_dag.get_all_successors(self.__toolwrapper_second),
+                         {self.__toolwrapper_second, self.__toolwrapper_fourth})
+        self.assertEqual(my_dag.get_all_successors(None), self.__set_tool | {None})
+        # the reachable nodes are computed again when the graph changes
+        my_dag.remove_edge(self.__toolwrapper_second, self.__toolwrapper_fourth)
+        self.assertEqual(my_dag.get_all_successors(self.__toolwrapper_second), {self.__toolwrapper_second})
+        self.assertEqual(my_dag.get_all_predecessors(self.__toolwrapper_fourth),
+                         {self.__toolwrapper_first, self.__toolwrapper_third, self.__toolwrapper_fourth})
+
+    def test_get_critical_path_lengths(self):
+        my_dag = DAG(self.__set_tool)
+        weights = {self.__toolwrapper_first: 1, self.__toolwrapper_second: 2, self.__toolwrapper_third: 5,
+                   self.__toolwrapper_fourth: 1}
+        path_lengths = my_dag.get_critical_path_lengths(weights)
+
+        self.assertEqual(path_lengths[self.__toolwrapper_fourth], 1)
+        self.assertEqual(path_lengths[self.__toolwrapper_second], 3)
+        self.assertEqual(path_lengths[self.__toolwrapper_third], 6)
+        self.assertEqual(path_lengths[self.__toolwrapper_first], 7)
+
+    def test_edges_follow(self):
+        my_dag = DAG(self.__set_tool)
+        # the edges built from the producers of the inputs are the pairs of tools following each other
+        set_edges_expected = set((tool_wrapper2, tool_wrapper1) for tool_wrapper1 in self.__set_tool
+                                 for tool_wrapper2 in self.__set_tool
+                                 if tool_wrapper1 is not tool_wrapper2 and tool_wrapper1.follows(tool_wrapper2))
+        self.assertEqual(set(my_dag.edges()), set_edges_expected)
+
+    def test_get_dot_digraph(self):
+        dot_digraph = DAG(self.__set_tool).get_dot_digraph()
+        self.assertEqual(len(dot_digraph.nodes()), 4)
+        self.assertTrue(dot_digraph.has_edge(self.__toolwrapper_first.dot_label(),
+                                             self.__toolwrapper_second.dot_label()))
+        self.assertFalse(dot_digraph.has_edge(self.__toolwrapper_second.dot_label(),
+                                              self.__toolwrapper_first.dot_label()))
+
     def tearDown(self):
         SQLManager.instance().get_session().close() 
         SQLManager.instance().drop_all()
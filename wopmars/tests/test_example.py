@@ -3,8 +3,9 @@ import shutil
 import sqlite3
 import subprocess
 import sys
+import tempfile
 
-from unittest import TestCase
+from unittest import TestCase, mock
 from wopmars import WopMars
 from wopmars.SQLManager import SQLManager
 from wopmars.utils.OptionManager import OptionManager
@@ -14,6 +15,10 @@ from wopmars.utils.PathManager import PathManager
 class TestExample(TestCase):
 
     def setUp(self):
+        # the plans of the workflows are cached in a temporary directory
+        self.__cache_home = tempfile.mkdtemp()
+        self.__patch_cache_home = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.__cache_home})
+        self.__patch_cache_home.start()
         self.test_path = PathManager.get_test_path()  # Get tests path
         OptionManager.initial_test_setup()  # Set tests arguments
         self.db_url = OptionManager.instance()["--database"]
@@ -31,6 +36,8 @@ class TestExample(TestCase):
         PathManager.unlink(self.db)
         OptionManager._drop()
         SQLManager._drop()
+        self.__patch_cache_home.stop()
+        shutil.rmtree(self.__cache_home, ignore_errors=True)
 
     def test_example(self):
         # pip.main(['install', '{}/.'.format(self.example_dir_path), '--upgrade']) # working in travis
@@ -7,6 +7,8 @@ from wopmars.SQLManager import SQLManager
 from wopmars.models.FileInputOutputInformation import FileInputOutputInformation
 from wopmars.utils.OptionManager import OptionManager
 from wopmars.utils.PathManager import PathManager
+from wopmars.utils.StatCache import StatCache
+from wopmars.utils.various import get_checksum
 
 
 class TestFileInputOutputInformation(TestCase):
@@ -34,6 +36,28 @@ class TestFileInputOutputInformation(TestCase):
         self.assertNotEqual(self.__io_file_existing, self.__io_file_existing4)
         self.assertNotEqual(self.__io_file_existing, self.__io_file_not_existing)
 
+    def test_get_checksum_values(self):
+        SQLManager.instance().create_all()
+        path = os.path.join(self.test_path, "outdir/checksum_file.txt")
+        with open(path, "w") as file_handler:
+            file_handler.write("content")
+        stat = os.stat(path)
+        file1 = FileInputOutputInformation(file_key="input1", path=path)
+        self.assertEqual(file1.get_checksum_values(),
+                         {"checksum": get_checksum(path), "st_dev": stat.st_dev, "st_ino": stat.st_ino})
+        # a file with the same device, inode, size and mtime_epoch_millis is not hashed again
+        file1.size = stat.st_size
+        file1.mtime_epoch_millis = stat.st_mtime * 1000
+        file1.st_dev, file1.st_ino, file1.checksum = stat.st_dev, stat.st_ino, "cached"
+        session = SQLManager.instance().get_session()
+        session.add(file1)
+        session.commit()
+        file2 = FileInputOutputInformation(file_key="input1", path=path)
+        self.assertEqual(file2.get_checksum_values()["checksum"], "cached")
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        StatCache.instance().invalidate([path])
+        self.assertEqual(file2.get_checksum_values()["checksum"], get_checksum(path))
+
     def tearDown(self):
         SQLManager.instance().get_session().close()
         SQLManager.instance().drop_all()
@@ -1,7 +1,9 @@
+import json
 import os
 import shutil
+import tempfile
 import unittest
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from wopmars.tests.resource.wrapper.FooWrapper10 import FooWrapper10
 from wopmars.tests.resource.wrapper.FooWrapper4 import FooWrapper4
@@ -16,6 +18,8 @@ from wopmars.models.FileInputOutputInformation import FileInputOutputInformation
 from wopmars.models.TypeInputOrOutput import TypeInputOrOutput
 from wopmars.DAG import DAG
 from wopmars.Parser import Parser
+from wopmars.PlanCache import PlanCache
+from wopmars.Reader import Reader
 from wopmars.utils.OptionManager import OptionManager
 from wopmars.utils.PathManager import PathManager
 from wopmars.utils.WopMarsException import WopMarsException
@@ -24,6 +28,10 @@ from wopmars.utils.WopMarsException import WopMarsException
 class TestParser(TestCase):
 
     def setUp(self):
+        # the plans of the workflows are cached in a temporary directory
+        self.__cache_home = tempfile.mkdtemp()
+        self.__patch_cache_home = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.__cache_home})
+        self.__patch_cache_home.start()
         OptionManager.initial_test_setup()  # Set tests arguments
         SQLManager.instance().create_all()  # Create database with tables
         session = SQLManager.instance().get_session()
@@ -41,6 +49,8 @@ class TestParser(TestCase):
         shutil.rmtree("outdir", ignore_errors=True)
         OptionManager._drop()
         SQLManager._drop()
+        self.__patch_cache_home.stop()
+        shutil.rmtree(self.__cache_home, ignore_errors=True)
 
     def test_parse(self):
         OptionManager.initial_test_setup()
@@ -148,5 +158,52 @@ class TestParser(TestCase):
         #os.remove(dot_path)
         #os.remove(dot_path[:-4] + ".ps")
 
+    def test_parse_plan_cache(self):
+        OptionManager.instance()["--wopfile"] = os.path.join(self.__test_path, "resource/wopfile/example_def_file1.yml")
+        with tempfile.TemporaryDirectory() as cache_home, mock.patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home}):
+            dag_first = self.__parser.parse()
+            self.assertEqual(len(os.listdir(PlanCache.get_cache_dir())), 1)
+            # the definition file is not checked again
+            with mock.patch.object(Reader, "is_grammar_respected", side_effect=AssertionError):
+                dag_cached = Parser().parse()
+            self.assertEqual(set((tw1.rule_name, tw2.rule_name) for tw1, tw2 in dag_first.edges()),
+                             set((tw1.rule_name, tw2.rule_name) for tw1, tw2 in dag_cached.edges()))
+            self.assertEqual(len(dag_cached.nodes()), 7)
+            # a plan whose source files have changed is not used
+            plan_path = os.path.join(PlanCache.get_cache_dir(), os.listdir(PlanCache.get_cache_dir())[0])
+            with open(plan_path) as plan_file:
+                plan = json.load(plan_file)
+            plan["source_hashes"]["wopmars.Reader"] = "changed"
+            with open(plan_path, "w") as plan_file:
+                json.dump(plan, plan_file)
+            with mock.patch.object(Reader, "is_grammar_respected") as is_grammar_respected:
+                Parser().parse()
+            self.assertTrue(is_grammar_respected.called)
+
+    def test_plan_cache_source_hashes(self):
+        OptionManager.instance()["--wopfile"] = os.path.join(self.__test_path, "resource/wopfile/example_def_file1.yml")
+        self.__parser.parse()
+        plan_path = os.path.join(PlanCache.get_cache_dir(), os.listdir(PlanCache.get_cache_dir())[0])
+        with open(plan_path) as plan_file:
+            plan = json.load(plan_file)
+        # the modules of the base classes of the wrappers and models are checked too
+        self.assertEqual(PlanCache.get_module_names(FooWrapper4),
+                         ["wopmars.tests.resource.wrapper.FooWrapper4", "wopmars.models.ToolWrapper",
+                          "sqlalchemy.orm.decl_api"])
+        self.assertTrue({"wopmars.tests.resource.wrapper.FooWrapper4", "wopmars.tests.resource.model.FooBase",
+                         "sqlalchemy.orm.decl_api"}.issubset(plan["source_hashes"]))
+
+    def test_plan_cache_evict(self):
+        with mock.patch.object(PlanCache, "max_plans", 1):
+            for wopfile in ["example_def_file1.yml", "example_def_file_resources.yml"]:
+                OptionManager.instance()["--wopfile"] = os.path.join(self.__test_path, "resource/wopfile", wopfile)
+                Parser().parse()
+                SQLManager.instance().get_session().close()
+        # only the plan used last is kept
+        with open(OptionManager.instance()["--wopfile"]) as wopfile:
+            plan_cache = PlanCache(wopfile.read())
+        self.assertEqual(os.listdir(PlanCache.get_cache_dir()), [os.path.basename(plan_cache.get_path())])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,10 @@
 import os
 import shutil
+import tempfile
 import unittest
-from unittest import TestCase
+from unittest import TestCase, mock
+
+from sqlalchemy import event
 
 from wopmars.tests.resource.wrapper.FooWrapper10 import FooWrapper10
 from wopmars.tests.resource.wrapper.FooWrapper4 import FooWrapper4
@@ -26,6 +29,10 @@ from wopmars.utils.WopMarsException import WopMarsException
 class TestReader(TestCase):
 
     def setUp(self):
+        # the plans of the workflows are cached in a temporary directory
+        self.__cache_home = tempfile.mkdtemp()
+        self.__patch_cache_home = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.__cache_home})
+        self.__patch_cache_home.start()
 
         OptionManager.initial_test_setup()  # Set tests arguments
         SQLManager.instance().create_all()  # Create database with tables
@@ -93,6 +100,44 @@ class TestReader(TestCase):
             except Exception as e:
                 raise AssertionError("Should not raise an exception " + str(e))
 
+    def test_read_resources(self):
+        self.__reader.iterate_wopfile_yml_dic_and_insert_rules_in_db(
+            os.path.join(self.__testdir_path, "resource/wopfile/example_def_file_resources.yml"))
+        rule_name_to_resources = {tw.rule_name: tw.get_resources() for tw in self.__session.query(ToolWrapper).all()}
+        self.assertEqual(rule_name_to_resources["rule1"], {"memory": 6})
+        self.assertEqual(rule_name_to_resources["rule3"], {"memory": 6, "db_writer": 1})
+
+        with self.assertRaises(WopMarsException):
+            self.__reader.iterate_wopfile_yml_dic_and_insert_rules_in_db(
+                os.path.join(self.__testdir_path, "resource/wopfile/example_def_file_wrong_grammar5.yml"))
+
+    def test_read_retries(self):
+        self.__reader.iterate_wopfile_yml_dic_and_insert_rules_in_db(
+            os.path.join(self.__testdir_path, "resource/wopfile/example_def_file_retries.yml"))
+        rule_name_to_retries = {tw.rule_name: (tw.retries, tw.backoff_secs)
+                                for tw in self.__session.query(ToolWrapper).all()}
+        self.assertEqual(rule_name_to_retries["rule1"], (2, 0.1))
+        self.assertEqual(rule_name_to_retries["rule2"], (0, 1.0))
+
+        with self.assertRaises(WopMarsException):
+            self.__reader.iterate_wopfile_yml_dic_and_insert_rules_in_db(
+                os.path.join(self.__testdir_path, "resource/wopfile/example_def_file_wrong_grammar6.yml"))
+
+    def test_read_one_transaction(self):
+        list_commits = []
+
+        def count_commit(session):
+            list_commits.append(session)
+
+        event.listen(self.__session._session(), "after_commit", count_commit)
+        try:
+            self.__reader.iterate_wopfile_yml_dic_and_insert_rules_in_db(self.__example_def_file1_path)
+        finally:
+            event.remove(self.__session._session(), "after_commit", count_commit)
+        # the whole workflow is registered in one transaction
+        self.assertEqual(len(list_commits), 1)
+        self.assertEqual(self.__session.query(ToolWrapper).count(), 7)
+
     def test_read2(self):
         try:
             self.__reader.iterate_wopfile_yml_dic_and_insert_rules_in_db(self.__example_def_file3_path)
@@ -222,6 +267,8 @@ class TestReader(TestCase):
         OptionManager._drop()
         SQLManager._drop()
         shutil.rmtree(os.path.join(self.__testdir_path, "outdir"), ignore_errors=True)
+        self.__patch_cache_home.stop()
+        shutil.rmtree(self.__cache_home, ignore_errors=True)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,16 @@
+import datetime
 import threading
 import unittest
 from unittest import TestCase
 
+import sqlalchemy
+from sqlalchemy import text
+
+from wopmars.models.FileInputOutputInformation import FileInputOutputInformation
+from wopmars.models.Option import Option
+from wopmars.models.TableModificationTime import TableModificationTime
+from wopmars.models.ToolWrapper import ToolWrapper
+from wopmars.models.TypeInputOrOutput import TypeInputOrOutput
 from wopmars.tests.resource.model.FooBase import FooBase
 from wopmars.SQLManager import SQLManager
 from wopmars.utils.OptionManager import OptionManager
@@ -60,6 +69,85 @@ class TestSQLManager(TestCase):
             Logger.instance().error("Should not raise an exception")
         self.assertTrue(len(self.__local_session.query(FooBase).filter(FooBase.name.like('string %')).all()) == 3000)
 
+    def test_release_write_transaction_of(self):
+        write_transaction_lock = SQLManager.instance().get_write_transaction_lock()
+        # a child process has been killed while holding the write transaction lock
+        write_transaction_lock.acquire()
+        SQLManager.instance().get_write_transaction_owner().value = 123456
+        SQLManager.instance().release_write_transaction_of(654321)
+        self.assertFalse(write_transaction_lock.acquire(block=False))
+        SQLManager.instance().release_write_transaction_of(123456)
+        self.assertTrue(write_transaction_lock.acquire(block=False))
+        write_transaction_lock.release()
+
+    def test_stamp_modified_tables(self):
+        modification_table_entry = TableModificationTime(table_name="FooBase", mtime_epoch_millis=0,
+                                                         mtime_human=datetime.datetime.fromtimestamp(0))
+        self.__local_session.add(modification_table_entry)
+        self.__local_session.commit()
+
+        def get_and_reset_mtime():
+            mtime_epoch_millis = self.__local_session.query(TableModificationTime.mtime_epoch_millis)\
+                .filter(TableModificationTime.table_name == "FooBase").scalar()
+            self.__local_session.execute(TableModificationTime.__table__.update().values(mtime_epoch_millis=0))
+            self.__local_session.commit()
+            return mtime_epoch_millis
+
+        # the rows added in the session
+        self.__local_session.add_all([FooBase(name="stamp " + str(i)) for i in range(100)])
+        self.__local_session.commit()
+        self.assertGreater(get_and_reset_mtime(), 0)
+        # a rollback doesn't stamp the table
+        self.__local_session.add(FooBase(name="rollbacked"))
+        self.__local_session.rollback()
+        self.__local_session.commit()
+        self.assertEqual(get_and_reset_mtime(), 0)
+        # the statements
+        self.__local_session.execute(FooBase.__table__.insert().values(name="inserted"))
+        self.__local_session.commit()
+        self.assertGreater(get_and_reset_mtime(), 0)
+        self.__local_session.execute(text("DELETE FROM FooBase WHERE name = 'inserted'"))
+        self.__local_session.commit()
+        self.assertGreater(get_and_reset_mtime(), 0)
+
+    def test_clean_up_unexecuted_tool_wrappers(self):
+        input_entry = TypeInputOrOutput(is_input=True)
+        for i, status in enumerate(["EXECUTED", "NOT_EXECUTED", "ALREADY_EXECUTED", "ERROR"]):
+            tool_wrapper = ToolWrapper(rule_name="rule" + str(i))
+            tool_wrapper.status = status
+            tool_wrapper.relation_toolwrapper_to_option.append(Option(name="param1", value="1"))
+            file_entry = FileInputOutputInformation(file_key="input1", path="input1.txt")
+            file_entry.relation_file_or_tableioinfo_to_typeio = input_entry
+            tool_wrapper.relation_toolwrapper_to_fileioinfo.append(file_entry)
+            self.__local_session.add(tool_wrapper)
+        self.__local_session.commit()
+        SQLManager.instance().clean_up_unexecuted_tool_wrappers()
+        self.assertEqual(sorted(rule_name for rule_name, in self.__local_session.query(ToolWrapper.rule_name)),
+                         ["rule0", "rule3"])
+        # the inputs are deleted by the cascade of the foreign key
+        self.assertEqual(self.__local_session.query(FileInputOutputInformation).count(), 2)
+        self.assertEqual(self.__local_session.query(Option).count(), 2)
+
+    def test_migrate_wopmars_history_tables(self):
+        # a database created by a previous version, without the index and the column, with a trigger per row
+        self.__local_session.execute(text('DROP INDEX "ix_wom_ToolWrapper_execution_id_status"'))
+        self.__local_session.execute(text('ALTER TABLE "wom_ToolWrapper" DROP COLUMN "source_hash"'))
+        self.__local_session.execute(text('CREATE TRIGGER FooBase_INSERT AFTER INSERT ON FooBase BEGIN UPDATE '
+                                          '"wom_TableModificationTime" SET mtime_epoch_millis = 0; END;'))
+        self.__local_session.commit()
+        self.__local_session.close()
+        SQLManager.instance().create_all()
+        inspector = sqlalchemy.inspect(SQLManager.instance().engine)
+        self.assertIn("source_hash", [column["name"] for column in inspector.get_columns("wom_ToolWrapper")])
+        self.assertIn("ix_wom_ToolWrapper_execution_id_status",
+                      [index["name"] for index in inspector.get_indexes("wom_ToolWrapper")])
+        self.assertEqual(self.__local_session.execute(
+            text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar(), 0)
+        tool_wrapper = ToolWrapper(rule_name="rule1")
+        tool_wrapper.source_hash = "hash"
+        self.__local_session.add(tool_wrapper)
+        self.__local_session.commit()
+
     def tearDown(self):
         SQLManager.instance().get_session().close()
         SQLManager.instance().drop_all()
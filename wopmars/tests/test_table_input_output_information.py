@@ -6,8 +6,10 @@ from wopmars.tests.resource.model.FooBase import FooBase
 from wopmars.tests.resource.model.FooBase2 import FooBase2
 from wopmars.SQLManager import SQLManager
 from wopmars.models.TableInputOutputInformation import TableInputOutputInformation
+from wopmars.models.TableModificationTime import TableModificationTime
 from wopmars.utils.OptionManager import OptionManager
 from wopmars.utils.PathManager import PathManager
+from wopmars.utils.various import get_current_time
 
 
 class TestTableInputOutputInformation(TestCase):
@@ -47,6 +49,28 @@ class TestTableInputOutputInformation(TestCase):
         self.assertEqual(self.__io_base_existing, self.__io_base_existing2)
         self.assertNotEqual(self.__io_base_existing, self.__io_base_existing3)
 
+    def test_get_fingerprint(self):
+        fingerprint = self.__io_base_existing.get_fingerprint()
+        self.assertTrue(fingerprint.startswith("10:"))
+        self.assertEqual(self.__io_base_existing3.get_fingerprint(), "0:0000000000000000")
+        # the fingerprint is cached until the mtime_epoch_millis of the table changes
+        time_unix_ms, time_human = get_current_time()
+        modification_table_entry = TableModificationTime(table_name="FooBase", mtime_epoch_millis=time_unix_ms,
+                                                         mtime_human=time_human)
+        self.__local_session.add(modification_table_entry)
+        self.__local_session.commit()
+        self.assertEqual(self.__io_base_existing.get_fingerprint(), fingerprint)
+        self.assertEqual(modification_table_entry.fingerprint, fingerprint)
+        modification_table_entry.fingerprint = "cached"
+        self.__local_session.add(modification_table_entry)
+        self.__local_session.commit()
+        self.assertEqual(self.__io_base_existing.get_fingerprint(), "cached")
+        self.__local_session.add(FooBase(name="testIODB 10"))
+        modification_table_entry.mtime_epoch_millis = time_unix_ms + 1
+        self.__local_session.add(modification_table_entry)
+        self.__local_session.commit()
+        self.assertTrue(self.__io_base_existing.get_fingerprint().startswith("11:"))
+
     def test_is_ready(self):
         self.assertTrue(self.__io_base_existing.is_ready())
         self.assertFalse(self.__io_base_existing3.is_ready())
@@ -260,6 +260,32 @@ class TestToolWrapper(TestCase):
         self.assertEqual(self.__toolwrapper1, self.__toolwrapper2)
         self.assertNotEqual(self.__toolwrapper1, self.__toolwrapper3)
 
+    def test_get_signature(self):
+        def get_toolwrapper(rule_name, param1_value, reverse=False):
+            f1 = FileInputOutputInformation(file_key="input1", path="file1.txt")
+            f1.relation_file_or_tableioinfo_to_typeio = self.input_entry
+            f2 = FileInputOutputInformation(file_key="output1", path="file2.txt")
+            f2.relation_file_or_tableioinfo_to_typeio = self.output_entry
+            list_options = [Option(name="param1", value=param1_value), Option(name="param2", value="2")]
+            toolwrapper = FooWrapper2(rule_name=rule_name)
+            toolwrapper.relation_toolwrapper_to_fileioinfo.extend([f2, f1] if reverse else [f1, f2])
+            toolwrapper.relation_toolwrapper_to_option.extend(list_options[::-1] if reverse else list_options)
+            return toolwrapper
+
+        signature = get_toolwrapper("rule1", "1").get_signature()
+        self.assertEqual(signature, get_toolwrapper("rule1", "1", reverse=True).get_signature())
+        self.assertNotEqual(signature, get_toolwrapper("rule1", "2").get_signature())
+        # two rules using the same wrapper do not share their history
+        self.assertNotEqual(signature, get_toolwrapper("rule2", "1").get_signature())
+
+    def test_get_source_hash(self):
+        source_hash = FooWrapper2(rule_name="rule1").get_source_hash()
+        self.assertEqual(len(source_hash), 64)
+        # the rules using the same wrapper share the same source code
+        self.assertEqual(source_hash, FooWrapper2(rule_name="rule2").get_source_hash())
+        self.assertNotEqual(source_hash, FooWrapper3(rule_name="rule1").get_source_hash())
+        self.assertIsNone(ToolWrapper.get_source_file_hash("wopmars.tests.resource.wrapper.DoesNotExist"))
+
     def test_is_content_respected(self):
         try:
             self.__foowrapper_right_content.is_content_respected()
@@ -1,17 +1,24 @@
+import inspect
 import pathlib
 import shutil
-from unittest import TestCase
+import sys
+import tempfile
+import time
+from unittest import TestCase, mock
 
 import os
 import subprocess
 import unittest
 
+from sqlalchemy import text
+
 from wopmars.utils.OptionManager import OptionManager
 from wopmars import WopMars
 from wopmars.Base import Base
 from wopmars.SQLManager import SQLManager
 from wopmars.models.Execution import Execution
 from wopmars.models.TableModificationTime import TableModificationTime
+from wopmars.models.ToolWrapper import ToolWrapper
 from wopmars.utils.PathManager import PathManager
 from wopmars.utils.various import get_current_time
 
@@ -19,6 +26,10 @@ from wopmars.utils.various import get_current_time
 class TestWopmars(TestCase):
 
     def setUp(self):
+        # the plans of the workflows are cached in a temporary directory
+        self.__cache_home = tempfile.mkdtemp()
+        self.__patch_cache_home = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.__cache_home})
+        self.__patch_cache_home.start()
         self.test_path = PathManager.get_test_path()  # Get tests path
         OptionManager.initial_test_setup()  # Set tests arguments
         self.__db_url = OptionManager.instance()["--database"]
@@ -30,6 +41,11 @@ class TestWopmars(TestCase):
         self.__example_def_file4 = os.path.join(self.test_path, "resource/wopfile/example_def_file4.yml")
         self.__example_def_file5_never_ready = os.path.join(self.test_path, "resource/wopfile/example_def_file5_never_ready.yml")
         self.__example_def_file_input_not_ready = os.path.join(self.test_path, "resource/wopfile/example_def_file_input_not_ready.yml")
+        self.__example_def_file_resources = os.path.join(self.test_path, "resource/wopfile/example_def_file_resources.yml")
+        self.__example_def_file_keep_going = os.path.join(self.test_path, "resource/wopfile/example_def_file_keep_going.yml")
+        self.__example_def_file_retries = os.path.join(self.test_path, "resource/wopfile/example_def_file_retries.yml")
+        self.__example_def_file_timeout = os.path.join(self.test_path, "resource/wopfile/example_def_file_timeout.yml")
+        self.__example_def_file_isolation = os.path.join(self.test_path, "resource/wopfile/example_def_file_isolation.yml")
 
     def tearDown(self):
         SQLManager.instance().get_session().close()
@@ -37,6 +53,8 @@ class TestWopmars(TestCase):
         shutil.rmtree(os.path.join(self.test_path, "outdir"), ignore_errors=True)
         OptionManager._drop()
         SQLManager._drop()
+        self.__patch_cache_home.stop()
+        shutil.rmtree(self.__cache_home, ignore_errors=True)
 
     def test_run(self):
         cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d", self.test_path]
@@ -47,6 +65,129 @@ class TestWopmars(TestCase):
         self.assertTrue(os.path.exists(os.path.join(self.test_path, 'outdir/output_file7.txt')))
         # self.assertEqual(se.exception.code, 0)
 
+    def test_run_jobs(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d", self.test_path,
+                    "--jobs", "3"]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.test_path, 'outdir/output_file7.txt')))
+        session = SQLManager.instance().get_session()
+        self.assertEqual(session.query(ToolWrapper).filter(ToolWrapper.status == "EXECUTED").count(), 7)
+
+    def test_run_jobs_process(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d", self.test_path,
+                    "--jobs", "3", "--executor", "process"]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.test_path, 'outdir/output_file7.txt')))
+        session = SQLManager.instance().get_session()
+        self.assertEqual(session.query(ToolWrapper).filter(ToolWrapper.status == "EXECUTED").count(), 7)
+
+    def test_run_jobs_rerun(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d", self.test_path]
+        with self.assertRaises(SystemExit):
+            WopMars().run(cmd_line)
+        os.remove(os.path.join(self.test_path, "outdir/output_file2.txt"))
+        # rule4 writes FooBase2 again in its own thread: rule6, reading it, must be executed again
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line + ["--jobs", "3"])
+        self.assertEqual(se.exception.code, 0)
+        session = SQLManager.instance().get_session()
+        self.assertEqual(session.query(ToolWrapper.status).filter(ToolWrapper.execution_id == 2)
+                         .filter(ToolWrapper.rule_name == "rule6").scalar(), "EXECUTED")
+
+    def test_run_resources(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file_resources, "-v", "-d", self.test_path,
+                    "--jobs", "3", "--resources", "{'memory': 10}"]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 0)
+        # rules needing 6 out of 10 memory never run at the same time
+        tool_wrappers = SQLManager.instance().get_session().query(ToolWrapper).order_by(ToolWrapper.started_at).all()
+        self.assertEqual(len(tool_wrappers), 3)
+        for tool_wrapper, next_tool_wrapper in zip(tool_wrappers, tool_wrappers[1:]):
+            self.assertLessEqual(tool_wrapper.finished_at, next_tool_wrapper.started_at)
+
+    def test_run_keep_going(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file_keep_going, "-v", "-d", self.test_path,
+                    "--keep-going"]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 1)
+        # the rule which does not depend on the failed rule has been executed
+        self.assertFalse(os.path.exists(os.path.join(self.test_path, 'outdir/output_file2.txt')))
+        self.assertTrue(os.path.exists(os.path.join(self.test_path, 'outdir/output_file3.txt')))
+        session = SQLManager.instance().get_session()
+        rule_name_to_status = dict(session.query(ToolWrapper.rule_name, ToolWrapper.status).all())
+        self.assertEqual(rule_name_to_status, {"rule1": "ERROR", "rule2": "NOT_EXECUTED", "rule3": "EXECUTED"})
+        self.assertEqual(session.query(Execution.status).scalar(), "ERROR")
+
+    def test_run_retries(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file_retries, "-v", "-d", self.test_path]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.test_path, 'outdir/output_file2.txt')))
+        # rule1 has failed twice before succeeding
+        with open(os.path.join(self.test_path, 'outdir/output_file1.txt.attempts')) as attempts_file:
+            self.assertEqual(len(attempts_file.readlines()), 3)
+
+    def test_run_timeout(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file_timeout, "-v", "-d", self.test_path,
+                    "--keep-going"]
+        time_start = time.time()
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 1)
+        # the rule sleeping for 60 seconds has been stopped after 1 second
+        self.assertLess(time.time() - time_start, 30)
+        self.assertFalse(os.path.exists(os.path.join(self.test_path, 'outdir/output_file1.txt')))
+        self.assertTrue(os.path.exists(os.path.join(self.test_path, 'outdir/output_file2.txt')))
+        session = SQLManager.instance().get_session()
+        rule_name_to_status = dict(session.query(ToolWrapper.rule_name, ToolWrapper.status).all())
+        self.assertEqual(rule_name_to_status, {"rule1": "TIMEOUT", "rule2": "EXECUTED"})
+
+    def test_run_memory_limit(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file_isolation, "-v", "-d", self.test_path,
+                    "--keep-going", "--rule-memory-limit", "1000"]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 1)
+        session = SQLManager.instance().get_session()
+        rule_name_to_tool_wrapper = {tw.rule_name: tw for tw in session.query(ToolWrapper).all()}
+        # rule1 exceeds the memory limit, rule2 crashes its process, rule3 succeeds
+        self.assertEqual(rule_name_to_tool_wrapper["rule1"].status, "ERROR")
+        self.assertEqual(rule_name_to_tool_wrapper["rule2"].status, "ERROR")
+        self.assertEqual(rule_name_to_tool_wrapper["rule2"].exit_code, -11)
+        self.assertEqual(rule_name_to_tool_wrapper["rule3"].status, "EXECUTED")
+        self.assertEqual(rule_name_to_tool_wrapper["rule3"].exit_code, 0)
+        self.assertGreater(rule_name_to_tool_wrapper["rule3"].peak_rss_kb, 50 * 1024)
+        self.assertTrue(os.path.exists(os.path.join(self.test_path, 'outdir/output_file3.txt')))
+
+    def test_run_long_chain(self):
+        """The stack depth does not depend on the number of executed rules"""
+        chain_length = 100
+        wopfile_path = os.path.join(self.test_path, "outdir/long_chain.yml")
+        pathlib.Path(os.path.dirname(wopfile_path)).mkdir(parents=True, exist_ok=True)
+        with open(wopfile_path, 'w') as fout:
+            for i in range(chain_length):
+                input1 = "resource/input_files/input_file1.txt" if i == 0 else "outdir/chain{}.txt".format(i)
+                fout.write("rule chain{}:\n    tool: wopmars.tests.resource.wrapper.FooWrapper4\n"
+                           "    input:\n        file:\n            input1: \"{}\"\n"
+                           "    output:\n        file:\n            output1: \"outdir/chain{}.txt\"\n\n"
+                           .format(i, input1, i + 1))
+        cmd_line = ["python", "-D", self.__db_url, "-w", wopfile_path, "-d", self.test_path, "--dry-run"]
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(len(inspect.stack()) + 250)
+        try:
+            with self.assertRaises(SystemExit) as se:
+                WopMars().run(cmd_line)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        self.assertEqual(se.exception.code, 0)
+
     def test_run_touch(self):
 
         """This is a tests for the touch function"""
@@ -198,6 +339,60 @@ class TestWopmars(TestCase):
         self.assertTrue(mtime2 == mtime3)
         self.assertEqual(se.exception.code, 0)
 
+    def test_history_prune(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d", self.test_path]
+        # three executions: all the rules, then twice rule5 and rule7
+        for i in range(3):
+            if i > 0:
+                os.remove(os.path.join(self.test_path, "outdir/output_file5.txt"))
+            with self.assertRaises(SystemExit) as se:
+                WopMars().run(cmd_line)
+            self.assertEqual(se.exception.code, 0)
+        session = SQLManager.instance().get_session()
+        self.assertEqual(session.query(Execution).count(), 3)
+        cmd_line_prune = ["python", "history", "--prune", "-D", self.__db_url, "--keep-last", "1", "-d",
+                          self.test_path]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line_prune)
+        self.assertEqual(se.exception.code, 0)
+        # the second execution is deleted, the first one holds the last execution of the rules skipped since
+        session = SQLManager.instance().get_session()
+        self.assertEqual([execution.id for execution in session.query(Execution).order_by(Execution.id)], [1, 3])
+        self.assertEqual(session.query(ToolWrapper).count(), 9)
+        # the rules are still skipped
+        with self.assertLogs("wopmars", level="INFO") as logs:
+            with self.assertRaises(SystemExit) as se:
+                WopMars().run(cmd_line)
+        self.assertEqual(se.exception.code, 0)
+        self.assertIn("0 of 7 rules to run.", "\n".join(logs.output))
+
+    def test_history_prune_previous_version(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d", self.test_path]
+        with self.assertRaises(SystemExit):
+            WopMars().run(cmd_line)
+        # a database created by a previous version, without the signature of the rules
+        SQLManager.instance().get_session().close()
+        with SQLManager.instance().engine.begin() as connection:
+            connection.execute(text('DROP INDEX "ix_wom_ToolWrapper_signature"'))
+            connection.execute(text('ALTER TABLE "wom_ToolWrapper" DROP COLUMN "signature"'))
+            connection.execute(text('ALTER TABLE "wom_ToolWrapper" DROP COLUMN "source_hash"'))
+        SQLManager._drop()
+        cmd_line_prune = ["python", "history", "--prune", "-D", self.__db_url, "--keep-last", "0", "-d",
+                          self.test_path]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line_prune)
+        self.assertEqual(se.exception.code, 0)
+        # the execution holds the last execution of the rules: it is kept
+        session = SQLManager.instance().get_session()
+        self.assertEqual(session.query(Execution).count(), 1)
+        self.assertEqual(session.query(ToolWrapper).filter(ToolWrapper.signature.is_(None)).count(), 7)
+
+    def test_history_prune_without_limit(self):
+        cmd_line_prune = ["python", "history", "--prune", "-D", self.__db_url, "-d", self.test_path]
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line_prune)
+        self.assertEqual(se.exception.code, 2)
+
     def test_dry_run(self):
         cmd_line = ["python", "--dry-run", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d",
                     self.test_path]
@@ -307,6 +502,23 @@ class TestWopmars(TestCase):
         runtime3 = end - start
         self.assertLess(runtime2, runtime3)
 
+    def test_run_rerun_trigger_checksum(self):
+        cmd_line = ["python", "-D", self.__db_url, "-w", self.__example_def_file1, "-v", "-d", self.test_path]
+        input_file1 = os.path.join(self.test_path, "resource/input_files/input_file1.txt")
+        output_file1 = os.path.join(self.test_path, "outdir/output_file1.txt")
+        with self.assertRaises(SystemExit) as se:
+            WopMars().run(cmd_line + ["--rerun-trigger=checksum"])
+        self.assertEqual(se.exception.code, 0)
+        output_file1_mtime = os.path.getmtime(output_file1)
+        # the input is more recent than the outputs but its content has not changed
+        pathlib.Path(input_file1).touch()
+        with self.assertRaises(SystemExit):
+            WopMars().run(cmd_line + ["--rerun-trigger=checksum"])
+        self.assertEqual(output_file1_mtime, os.path.getmtime(output_file1))
+        with self.assertRaises(SystemExit):
+            WopMars().run(cmd_line)
+        self.assertLess(output_file1_mtime, os.path.getmtime(output_file1))
+
     def get_best_factor(self, full_exec_time, rule_count, maximum_ratio=1):
         average_rule_time = full_exec_time / rule_count
         return 1 + (maximum_ratio * average_rule_time / (1.5 + average_rule_time))
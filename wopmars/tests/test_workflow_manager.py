@@ -1,10 +1,12 @@
 import os
 import shutil
+import tempfile
 import unittest
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from wopmars.SQLManager import SQLManager
 from wopmars.WorkflowManager import WorkflowManager
+from wopmars.models.ToolWrapper import ToolWrapper
 from wopmars.utils.OptionManager import OptionManager
 from wopmars.utils.PathManager import PathManager
 from wopmars.utils.WopMarsException import WopMarsException
@@ -13,6 +15,10 @@ from wopmars.utils.WopMarsException import WopMarsException
 class TestWorkflowManager(TestCase):
 
     def setUp(self):
+        # the plans of the workflows are cached in a temporary directory
+        self.__cache_home = tempfile.mkdtemp()
+        self.__patch_cache_home = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.__cache_home})
+        self.__patch_cache_home.start()
 
         OptionManager.initial_test_setup()  # Set tests arguments
         SQLManager.instance().create_all()  # Create database with tables
@@ -32,6 +38,8 @@ class TestWorkflowManager(TestCase):
         shutil.rmtree(os.path.join(self.test_path, "outdir"), ignore_errors=True)
         OptionManager._drop()
         SQLManager._drop()
+        self.__patch_cache_home.stop()
+        shutil.rmtree(self.__cache_home, ignore_errors=True)
 
     def test_run(self):
 
@@ -45,5 +53,57 @@ class TestWorkflowManager(TestCase):
         with self.assertRaises(WopMarsException):
             self.__workflow_manager.run()
 
+    def test_get_run_plan(self):
+        OptionManager.instance()["--wopfile"] = self.__s_path_to_example_definition_file_finishing
+        with self.assertLogs("wopmars", level="INFO") as logs:
+            with self.assertRaises(SystemExit):
+                self.__workflow_manager.run()
+        self.assertIn("7 of 7 rules to run.", "\n".join(logs.output))
+        # only rule5 and its successor rule7 need to be executed again
+        os.remove(os.path.join(self.test_path, "outdir/output_file5.txt"))
+        with self.assertLogs("wopmars", level="INFO") as logs:
+            with self.assertRaises(SystemExit):
+                WorkflowManager().run()
+        self.assertIn("2 of 7 rules to run.", "\n".join(logs.output))
+        # the source code of rule5 has changed: rule5 and rule7 are executed again
+        session = SQLManager.instance().get_session()
+        session.execute(ToolWrapper.__table__.update().where(ToolWrapper.__table__.c.rule_name == "rule5")
+                        .values(source_hash="changed"))
+        session.commit()
+        with self.assertLogs("wopmars", level="INFO") as logs:
+            with self.assertRaises(SystemExit):
+                WorkflowManager().run()
+        self.assertIn("2 of 7 rules to run.", "\n".join(logs.output))
+        self.assertIn("The source code of the rule rule5 has changed", "\n".join(logs.output))
+
+    def test_share_options_and_resources(self):
+        OptionManager.instance()["--wopfile"] = self.__s_path_to_example_definition_file_finishing
+        with self.assertRaises(SystemExit):
+            self.__workflow_manager.run()
+        os.remove(os.path.join(self.test_path, "outdir/output_file5.txt"))
+        with self.assertRaises(SystemExit):
+            WorkflowManager().run()
+        session = SQLManager.instance().get_session()
+        list_tool_wrappers = session.query(ToolWrapper).filter(ToolWrapper.execution_id == 2).all()
+        self.assertEqual(len(list_tool_wrappers), 7)
+        for tool_wrapper in list_tool_wrappers:
+            if tool_wrapper.status == "ALREADY_EXECUTED":
+                # the rules skipped are deleted by the clean up of the next execution
+                self.assertIsNone(tool_wrapper.definition_id)
+            else:
+                # the rules executed again point to their first execution, which holds their options and resources
+                self.assertIn(tool_wrapper.rule_name, ["rule5", "rule7"])
+                tool_wrapper_first = session.query(ToolWrapper).filter(ToolWrapper.execution_id == 1)\
+                    .filter(ToolWrapper.rule_name == tool_wrapper.rule_name).one()
+                self.assertEqual(tool_wrapper.definition_id, tool_wrapper_first.id)
+                self.assertEqual(tool_wrapper.relation_toolwrapper_to_option, [])
+                self.assertEqual(tool_wrapper.relation_toolwrapper_to_resource, [])
+                # the inputs and outputs store the state of the files of this execution
+                self.assertNotEqual(tool_wrapper.relation_toolwrapper_to_fileioinfo, [])
+        with self.assertLogs("wopmars", level="INFO") as logs:
+            with self.assertRaises(SystemExit):
+                WorkflowManager().run()
+        self.assertIn("0 of 7 rules to run.", "\n".join(logs.output))
+
 if __name__ == '__main__':
     unittest.main()
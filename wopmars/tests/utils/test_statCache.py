@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from wopmars.utils.StatCache import StatCache
+
+
+class TestStatCache(TestCase):
+    def setUp(self):
+        self.__path = os.path.join(tempfile.mkdtemp(), "file.txt")
+
+    def test_invalidate(self):
+        self.assertFalse(StatCache.instance().exists(self.__path))
+        with open(self.__path, "w") as file_handler:
+            file_handler.write("content")
+        # the missing file is cached until its path is invalidated
+        self.assertFalse(StatCache.instance().is_file(self.__path))
+        self.assertRaises(FileNotFoundError, StatCache.instance().get_mtime, self.__path)
+        StatCache.instance().invalidate([self.__path])
+        self.assertTrue(StatCache.instance().is_file(self.__path))
+        self.assertEqual(StatCache.instance().get_size(self.__path), 7)
+        self.assertEqual(StatCache.instance().get_mtime(self.__path)[0], os.path.getmtime(self.__path) * 1000)
+
+    def tearDown(self):
+        os.remove(self.__path)
+        os.rmdir(os.path.dirname(self.__path))
+        StatCache._drop()
+
+
+if __name__ == "__main__":
+    unittest.main()
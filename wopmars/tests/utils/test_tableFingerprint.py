@@ -0,0 +1,23 @@
+import unittest
+from unittest import TestCase
+
+from wopmars.utils.TableFingerprint import TableFingerprint
+
+
+class TestTableFingerprint(TestCase):
+
+    def get_fingerprint(self, rows):
+        table_fingerprint = TableFingerprint()
+        for row in rows:
+            table_fingerprint.step(*row)
+        return table_fingerprint.finalize()
+
+    def test_finalize(self):
+        rows = [(1, "a"), (2, "b"), (3, None)]
+        self.assertEqual(self.get_fingerprint(rows), self.get_fingerprint(rows[::-1]))
+        self.assertNotEqual(self.get_fingerprint(rows), self.get_fingerprint([(1, "a"), (2, "c"), (3, None)]))
+        self.assertNotEqual(self.get_fingerprint(rows), self.get_fingerprint(rows + [(1, "a")]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import queue
+import unittest
+from unittest import TestCase
+
+from wopmars.utils.UniquePriorityQueue import UniquePriorityQueue
+
+
+class TestUniquePriorityQueue(TestCase):
+    def setUp(self):
+        priorities = {"a": 1, "b": 3, "c": 1}
+        self.__queue = UniquePriorityQueue(priority=priorities.get)
+        self.__queue.put("a")
+        self.__queue.put("b")
+        self.__queue.put("c")
+        self.__queue.put("a")
+
+    def test_get(self):
+        self.assertEqual(self.__queue.get_nowait(), "b")
+        self.assertEqual(self.__queue.get_nowait(), "a")
+        self.assertEqual(self.__queue.get_nowait(), "c")
+        self.assertRaises(queue.Empty, self.__queue.get_nowait)
+
+    def test_get_queue_tuple(self):
+        self.assertEqual(self.__queue.get_queue_tuple(), ("b", "a", "c"))
+
+if __name__ == '__main__':
+    unittest.main()
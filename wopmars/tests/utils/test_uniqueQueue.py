@@ -24,5 +24,11 @@ class TestUniqueQueue(TestCase):
     def test_get_queue_tuple(self):
         self.assertEqual(len(self.__queue.get_queue_tuple()), 2)
 
+    def test_put_after_get(self):
+        self.assertEqual(self.__queue.get_nowait(), 1)
+        self.__queue.put(1)
+        self.__queue.put(2)
+        self.assertEqual(self.__queue.get_queue_tuple(), (2, 1))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -112,6 +112,14 @@ class OptionManager(dict, SingletonMixin):
         OptionManager.instance()["--forceall"] = None
         OptionManager.instance()["--dry-run"] = None
         OptionManager.instance()["--touch"] = None
+        OptionManager.instance()["--jobs"] = 1
+        OptionManager.instance()["--executor"] = "thread"
+        OptionManager.instance()["--resources"] = None
+        OptionManager.instance()["--keep-going"] = False
+        OptionManager.instance()["--rule-timeout"] = None
+        OptionManager.instance()["--rule-memory-limit"] = None
+        OptionManager.instance()["--rule-cpu-limit"] = None
+        OptionManager.instance()["--rerun-trigger"] = "mtime"
         OptionManager.instance()["tool"] = None
         test_outdir_path = os.path.join(PathManager.get_test_path(), "outdir")
         # shutil.rmtree(test_outdir_path, ignore_errors=True)
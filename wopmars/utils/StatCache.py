@@ -0,0 +1,116 @@
+"""
+Module containing the StatCache class.
+"""
+import concurrent.futures
+import errno
+import os
+import stat
+import threading
+from datetime import datetime
+
+from wopmars.utils.Singleton import SingletonMixin
+
+
+class StatCache(SingletonMixin):
+    """
+    The StatCache keeps the result of os.stat for the paths checked during one execution of the workflow, so that each
+    file is stat-ed about once by the readiness and freshness checks of the rules.
+
+    The missing paths are cached too. The WorkflowManager clears the cache at the beginning of the execution and
+    invalidates the outputs of a rule when it finishes.
+    """
+
+    # the number of threads used to stat the files in parallel, for the network file systems
+    PREFETCH_WORKERS = 32
+
+    def __init__(self):
+        """
+        The generation is incremented by each invalidation: a stat started before is not cached, it may be outdated.
+        """
+        self.__lock = threading.Lock()
+        self.__path_to_stat = {}
+        self.__generation = 0
+
+    def __stat(self, path):
+        """
+        :return: os.stat_result or None if the path doesn't exist
+        """
+        path = os.path.abspath(path)
+        with self.__lock:
+            if path in self.__path_to_stat:
+                return self.__path_to_stat[path]
+            generation = self.__generation
+        # the lock is not held during the system call, so that the paths can be stat-ed in parallel
+        try:
+            stat_result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            stat_result = None
+        with self.__lock:
+            if generation == self.__generation:
+                self.__path_to_stat[path] = stat_result
+        return stat_result
+
+    def stat(self, path):
+        """
+        Same as os.stat.
+
+        :param path: The path to the file
+        :type path: str
+        :return: os.stat_result
+        :raises FileNotFoundError: The file doesn't exist
+        """
+        stat_result = self.__stat(path)
+        if stat_result is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        return stat_result
+
+    def exists(self, path):
+        return self.__stat(path) is not None
+
+    def is_file(self, path):
+        stat_result = self.__stat(path)
+        return stat_result is not None and stat.S_ISREG(stat_result.st_mode)
+
+    def get_size(self, path):
+        return self.stat(path).st_size
+
+    def get_mtime(self, path):
+        """
+        Same as :func:`~.wopmars.utils.various.get_mtime`.
+
+        :return: The mtime_epoch_millis and the mtime_human of the file
+        :raises FileNotFoundError: The file doesn't exist
+        """
+        mtime_epoch = self.stat(path).st_mtime
+        return mtime_epoch * 1000, datetime.fromtimestamp(mtime_epoch)
+
+    def prefetch(self, list_paths):
+        """
+        Stat the given paths in parallel and cache the results.
+
+        :param list_paths: The paths to stat
+        :type list_paths: list(str)
+        """
+        with self.__lock:
+            set_paths = set(os.path.abspath(path) for path in list_paths) - set(self.__path_to_stat)
+        if set_paths:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(StatCache.PREFETCH_WORKERS, len(set_paths))) \
+                    as executor:
+                list(executor.map(self.__stat, set_paths))
+
+    def invalidate(self, list_paths):
+        """
+        Forget the given paths, which may have been written.
+
+        :param list_paths: The paths to forget
+        :type list_paths: list(str)
+        """
+        with self.__lock:
+            for path in list_paths:
+                self.__path_to_stat.pop(os.path.abspath(path), None)
+            self.__generation += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__path_to_stat.clear()
+            self.__generation += 1
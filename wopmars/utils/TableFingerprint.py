@@ -0,0 +1,28 @@
+"""
+Module containing the TableFingerprint class.
+"""
+import hashlib
+
+
+class TableFingerprint:
+    """
+    The TableFingerprint is an aggregate function computing a fingerprint of the content of a table which does not depend
+    on the order of the rows: the row count and the sum, modulo 2^64, of the hashes of the rows.
+
+    It is registered in the SQLite connections, so that the database computes wopmars_fingerprint(column1, column2, ...)
+    without loading the rows in Python objects.
+    """
+
+    NAME = "wopmars_fingerprint"
+
+    def __init__(self):
+        self.__count = 0
+        self.__sum = 0
+
+    def step(self, *values):
+        self.__count += 1
+        digest = hashlib.sha256(repr(values).encode("utf-8")).digest()
+        self.__sum = (self.__sum + int.from_bytes(digest[:8], "big")) % 2 ** 64
+
+    def finalize(self):
+        return "{}:{:016x}".format(self.__count, self.__sum)
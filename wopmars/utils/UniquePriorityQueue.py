@@ -0,0 +1,56 @@
+"""
+Module containing the UniquePriorityQueue class.
+"""
+import heapq
+import itertools
+
+from wopmars.utils.UniqueQueue import UniqueQueue
+
+
+class UniquePriorityQueue(UniqueQueue):
+    """
+    The UniquePriorityQueue is an UniqueQueue returning first the element with the highest priority. The elements with
+    the same priority are returned in their order of insertion.
+    """
+
+    def __init__(self, priority, maxsize=0):
+        """
+        :param priority: Function giving the priority of an element when it is put in the queue.
+        :type priority: callable
+        :param maxsize: The maximum size of the queue, 0 for infinite.
+        :type maxsize: int
+        """
+        self.__priority = priority
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        # heap of (-priority, insertion number, element)
+        self.queue = []
+        self.__counter = itertools.count()
+
+    def _put(self, item):
+        """
+        Check if item is already in queue. If not, push it in the heap and return True, else, return False.
+
+        :param item: an item that has to be added to the Queue
+        :return: bool for the success of the put method
+        """
+        if item not in self.queue_set:
+            heapq.heappush(self.queue, (-self.__priority(item), next(self.__counter), item))
+            self.queue_set.add(item)
+            return True
+        return False
+
+    def _get(self):
+        item = heapq.heappop(self.queue)[2]
+        self.queue_set.discard(item)
+        return item
+
+    def get_queue_tuple(self):
+        """
+        Return the content of the queue in a tuple, in the order in which the elements would be returned.
+
+        :return: tuple of the elements in the Queue.
+        """
+        return tuple(entry[2] for entry in sorted(self.queue))
@@ -7,8 +7,15 @@ from queue import Queue
 class UniqueQueue(Queue):
     """
     The UniqueQueue re-implement Queue, modificating its _put method to ensure that each element is unique.
+
+    The elements of the queue are also kept in a set, so that checking if an element is already in the queue does not
+    depend on the size of the queue. The elements must be hashable.
     """
 
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.queue_set = set()
+
     def _put(self, item):
         """
         Check if item is already in queue. If not, append the queue and return True, else, return False.
@@ -16,11 +23,17 @@ class UniqueQueue(Queue):
         :param item: an item that has to be added to the Queue
         :return: bool for the success of the put method
         """
-        if item not in self.queue:
+        if item not in self.queue_set:
             self.queue.append(item)
+            self.queue_set.add(item)
             return True
         return False
 
+    def _get(self):
+        item = self.queue.popleft()
+        self.queue_set.discard(item)
+        return item
+
     def get_queue_tuple(self):
         """
         Return the ordered content of the queue in a tuple.
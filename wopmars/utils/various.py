@@ -1,4 +1,5 @@
 import codecs
+import hashlib
 from datetime import datetime
 import os
 import time
@@ -11,6 +12,14 @@ def get_current_time():
     return timestamp_epoch_millis, timestamp_human
 
 
+def get_checksum(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file_handler:
+        for chunk in iter(lambda: file_handler.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
 def get_mtime(path):
     mtime_epoch = os.path.getmtime(path)  # epoch mtime_epoch_millis in ms
     mtime_epoch_millis = mtime_epoch * 1000  # epoch mtime_epoch_millis in ms